@@ -4,7 +4,9 @@ Test du système d'activité et d'anti-détection
 """
 
 import datetime
+import random
 from src.activity_manager import ActivityManager, ActivitySettings
+from src.clock import VirtualClock
 
 def test_activity_manager():
     print("=== Test du gestionnaire d'activité ===\n")
@@ -46,27 +48,53 @@ def test_activity_manager():
     else:
         print("   Aucune absence simulée dans ce test")
     
-    # Test des différents moments de la journée
+    # Test des différents moments de la journée (horloge virtuelle)
     print(f"\n🕐 Test activité selon l'heure:")
-    test_hours = ["08:00", "12:30", "19:30", "02:00"]
+    expected_periods = {"08:00": "normal", "12:30": "lunch", "19:30": "peak", "02:00": "inactive"}
     
-    for hour_str in test_hours:
+    for hour_str, expected in expected_periods.items():
         hour, minute = map(int, hour_str.split(':'))
-        # Simuler différents moments (approximatif)
-        test_time = datetime.datetime.now().replace(hour=hour, minute=minute)
+        tz = activity_manager.tz
+        # Un mercredi à l'heure testée
+        clock = VirtualClock(start=tz.localize(datetime.datetime(2024, 3, 6, hour, minute)))
+        hour_manager = ActivityManager(clock=clock, rng=random.Random(0))
         
         print(f"   {hour_str}: ", end="")
         
-        # Test approximatif des horaires
-        if 8 <= hour <= 23:
-            if 12 <= hour <= 14:
-                print("🍽️ Pause déj (activité réduite)")
-            elif 19 <= hour <= 22:
-                print("🔥 Heure de pointe (très actif)")
-            else:
-                print("✅ Horaires normaux")
-        else:
+        if not hour_manager.is_active_hours() and not hour_manager._is_lunch_time():
+            period = "inactive"
             print("😴 Hors horaires (inactif)")
+        elif hour_manager._is_lunch_time():
+            period = "lunch"
+            print("🍽️ Pause déj (activité réduite)")
+        elif hour_manager._is_peak_hours():
+            period = "peak"
+            print("🔥 Heure de pointe (très actif)")
+        else:
+            period = "normal"
+            print("✅ Horaires normaux")
+        assert period == expected, f"{hour_str}: {period} au lieu de {expected}"
+    
+    # Niveaux d'activité: hors horaires fixe, pointe = x1.5 (variation 0.9 à 1.3)
+    night = ActivityManager(clock=VirtualClock(start=tz.localize(datetime.datetime(2024, 3, 6, 2, 0))))
+    assert night.get_activity_level() == ActivityManager.OFF_HOURS_ACTIVITY
+    peak = ActivityManager(clock=VirtualClock(start=tz.localize(datetime.datetime(2024, 3, 6, 20, 0))))
+    for _ in range(100):
+        assert 1.5 * 0.9 <= peak.get_activity_level() <= 1.5 * 1.3
+    
+    # Une semaine complète en accéléré
+    print(f"\n📅 Semaine simulée (niveau d'activité moyen par jour):")
+    clock = VirtualClock(start=activity_manager.tz.localize(datetime.datetime(2024, 3, 4, 0, 0)))  # lundi
+    week_manager = ActivityManager(clock=clock, rng=random.Random(0))
+    day_names = ["lun", "mar", "mer", "jeu", "ven", "sam", "dim"]
+    for day in range(7):
+        levels = []
+        for _ in range(24 * 4):
+            levels.append(week_manager.get_activity_level())
+            assert week_manager._is_weekend() == (day >= 5)
+            clock.advance(15 * 60)
+        print(f"   {day_names[day]}: {sum(levels) / len(levels):.2f}")
+        assert ActivityManager.OFF_HOURS_ACTIVITY <= sum(levels) / len(levels) <= 1.5 * 1.3
 
 def test_custom_settings():
     print(f"\n\n=== Test avec settings personnalisées ===\n")
@@ -92,6 +120,32 @@ def test_custom_settings():
     print(f"\n📈 Résultats:")
     for key, value in stats.items():
         print(f"   {key}: {value}")
+    
+    # Vérifications sur une horloge virtuelle
+    tz = activity_manager.tz
+    
+    def manager_at(*moment):
+        clock = VirtualClock(start=tz.localize(datetime.datetime(*moment)))
+        return ActivityManager(custom_settings, rng=random.Random(0), clock=clock)
+    
+    # Pause déj (mercredi 12:30): absent environ 80% du temps
+    lunch = manager_at(2024, 3, 6, 12, 30)
+    absent_ratio = sum(not lunch.is_active_hours() for _ in range(1000)) / 1000
+    print(f"   Absent au déj: {absent_ratio:.0%}")
+    assert 0.7 <= absent_ratio <= 0.9
+    
+    # Avant 09:30 et après 22:00: inactif
+    assert not manager_at(2024, 3, 6, 9, 0).is_active_hours()
+    assert not manager_at(2024, 3, 6, 22, 30).is_active_hours()
+    
+    # Pointe 20:00-21:30 (mercredi) contre samedi 10:00 à 50%
+    peak = manager_at(2024, 3, 6, 20, 30)
+    weekend = manager_at(2024, 3, 9, 10, 0)
+    assert peak._is_peak_hours() and not peak._is_weekend()
+    assert weekend._is_weekend() and not weekend._is_peak_hours()
+    for _ in range(100):
+        assert peak.get_activity_level() >= 1.5 * 0.9
+        assert weekend.get_activity_level() <= 0.5 * 1.3
 
 if __name__ == "__main__":
     test_activity_manager()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests de la passerelle IA (regroupement, découpage par prompt système, renvoi des réponses manquantes)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+from src.ai_gateway import AIGateway, create_shared_gateway
+from src.config import Config
+from src.human_generator import HumanResponseGenerator
+
+
+class _FakeClient:
+    """Client OpenAI factice: répond "re: <dernier message>" à chaque demande, seule ou groupée"""
+
+    def __init__(self, drop=(), broken=False):
+        self.calls = []
+        self.drop = set(drop)
+        self.broken = broken
+        self.active = 0
+        self.max_active = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, max_tokens, temperature, response_format=None):
+        self.calls.append({"messages": messages, "max_tokens": max_tokens, "packed": response_format is not None})
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+
+        if response_format is None:
+            content = f"re: {messages[-1]['content']}"
+        elif self.broken:
+            content = "pas du json"
+        else:
+            answers = {}
+            for section in messages[-1]["content"].split("### Demande ")[1:]:
+                index, conversation = section.split("\n", 1)
+                if int(index) not in self.drop:
+                    answers[index] = f"re: {conversation.strip().splitlines()[-1]}"
+            content = json.dumps(answers)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _request(system, text):
+    return [{"role": "system", "content": system}, {"role": "user", "content": text}]
+
+
+async def _burst(gateway, requests):
+    # La première demande part seule (rien en cours), les suivantes attendent la fenêtre ensemble
+    first = asyncio.ensure_future(gateway.complete(requests[0], max_tokens=10))
+    await asyncio.sleep(0)
+    others = [gateway.complete(messages, max_tokens=10) for messages in requests[1:]]
+    return [await first] + list(await asyncio.gather(*others))
+
+
+def test_pack_requests():
+    client = _FakeClient()
+    gateway = AIGateway(client, batch_window=0.02, pack_requests=True)
+    texts = ["salut", "ça va ?", "tu fais quoi", "bonne nuit"]
+    answers = asyncio.run(_burst(gateway, [_request("persona", text) for text in texts]))
+
+    assert answers == [f"re: {text}" for text in texts]
+    assert gateway.api_calls == 2 and gateway.packed_calls == 1
+    packed = next(call for call in client.calls if call["packed"])
+    # Le prompt système partagé reste en tête (cache de préfixe), la consigne JSON après lui
+    assert packed["messages"][0]["content"].startswith("persona\n\n")
+    assert packed["max_tokens"] == 30
+    assert gateway.get_stats()["requests_per_api_call"] == 2.0
+
+
+def test_split_by_system_prompt():
+    client = _FakeClient()
+    gateway = AIGateway(client, batch_window=0.02, pack_requests=True)
+    requests = [_request("a", "un"), _request("a", "deux"), _request("b", "trois"), _request("a", "quatre")]
+    answers = asyncio.run(_burst(gateway, requests))
+
+    assert answers == ["re: un", "re: deux", "re: trois", "re: quatre"]
+    # "a" groupé (deux, quatre), "b" seul dans son groupe: envoyé sans regroupement
+    assert gateway.packed_calls == 1
+    assert sorted(call["packed"] for call in client.calls) == [False, False, True]
+    packed = next(call for call in client.calls if call["packed"])
+    assert "deux" in packed["messages"][1]["content"] and "quatre" in packed["messages"][1]["content"]
+
+
+def test_retry_missing_answers():
+    client = _FakeClient(drop={2})
+    gateway = AIGateway(client, batch_window=0.02, pack_requests=True)
+    texts = ["zéro", "un", "deux", "trois"]
+    answers = asyncio.run(_burst(gateway, [_request("p", text) for text in texts]))
+
+    # Réponse 2 du lot absente: redemandée seule
+    assert answers == [f"re: {text}" for text in texts]
+    assert [call["packed"] for call in client.calls] == [False, True, False]
+    assert client.calls[-1]["messages"][-1]["content"] == "deux"
+
+    # JSON illisible: tout le lot est redemandé individuellement
+    client = _FakeClient(broken=True)
+    gateway = AIGateway(client, batch_window=0.02, pack_requests=True)
+    answers = asyncio.run(_burst(gateway, [_request("p", text) for text in texts]))
+    assert answers == [f"re: {text}" for text in texts]
+    assert gateway.api_calls == 5 and gateway.errors == 0
+
+
+def test_bounded_concurrency():
+    client = _FakeClient()
+    gateway = AIGateway(client, max_concurrency=2)
+
+    async def run():
+        return await asyncio.gather(*(gateway.complete(_request("p", str(i))) for i in range(6)))
+
+    # Sans regroupement, chaque demande part tout de suite, au plus deux appels à la fois
+    assert asyncio.run(run()) == [f"re: {i}" for i in range(6)]
+    assert gateway.api_calls == 6 and gateway.batches == 6
+    assert client.max_active == 2
+
+
+def test_shared_gateway_per_process():
+    gateway = create_shared_gateway("clé", "modèle", {"pack_requests": True})
+    assert create_shared_gateway("clé", "modèle") is gateway
+    assert gateway.pack_requests
+    assert create_shared_gateway("clé", "autre modèle") is not gateway
+
+    # Deux personas du même processus: une seule passerelle, donc un seul regroupement
+    with tempfile.TemporaryDirectory() as directory:
+        generators = [
+            HumanResponseGenerator(Config(
+                server="irc.example.org", port=6667, ssl=False, nickname=nickname, username=nickname,
+                realname=nickname, channels=["#salon"], response_probability=0.5, min_response_delay=1.0,
+                max_response_delay=2.0, ai_api_key="clé", ai_model="modèle",
+                memory_config={"file": os.path.join(directory, f"{nickname}.json")}))
+            for nickname in ("Pierre", "Julie")]
+        assert generators[0].ai_gateway is gateway and generators[1].ai_gateway is gateway
+        assert generators[0].client is gateway.client
+
+
+if __name__ == "__main__":
+    test_pack_requests()
+    test_split_by_system_prompt()
+    test_retry_missing_answers()
+    test_bounded_concurrency()
+    test_shared_gateway_per_process()
+    print("✅ Tests de la passerelle IA réussis")
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks des fonctions chaudes de génération de texte
+
+Mesure le temps par appel sur un corpus de messages IRC francophones réalistes,
+avec des graines fixes pour des exécutions reproductibles. Les résultats peuvent
+être enregistrés comme référence JSON puis comparés pour repérer les régressions.
+
+    python benchmark.py --save benchmarks/baseline.json
+    python benchmark.py --compare benchmarks/baseline.json --threshold 0.15
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from src.ai_gateway import AIGateway
+from src.config import Config
+from src.irc_bot import IrcHumanizerBot
+from src.history_archive import HistoryArchive
+from src.memory_store import MemoryMessage
+from src.retrieval_engine import RetrievalEngine
+from src.rng import make_rng
+
+# Messages reçus typiques d'un salon francophone
+USER_MESSAGES = [
+    "salut tout le monde",
+    "yo ça va ?",
+    "mdr t'es sérieux là",
+    "quelqu'un a testé le nouveau patch de valorant ?",
+    "je suis de lyon et toi ?",
+    "j'ai 27 ans et je bosse dans le dev",
+    "ptdr il est grillé le mec",
+    "je m'appelle julien au fait",
+    "vous regardez quoi comme série en ce moment ?",
+    "franchement ça me saoule ce taf",
+    "trop bien le concert hier soir !!",
+    "jsp trop quoi faire ce soir",
+    "c'est chaud la météo à marseille",
+    "moi c'est sophie, j'habite à nantes",
+    "lol ok",
+    "t'as vu le match de foot ?",
+    "je galère avec mon code python depuis 2h",
+    "bcp de monde ce soir ^^",
+    "quelqu'un connait un bon resto à paris ?",
+    "bonne nuit les gens",
+    "c'est un bot ce mec ou quoi",
+    "wesh la team",
+    "pourquoi personne répond ?",
+    "j'écoute le dernier album en boucle sur spotify",
+    "on part en vacances demain, trop hâte",
+    "ahah grave",
+    "t'es d'où toi ?",
+    "tu fais quoi dans la vie ?",
+    "ça me rend dingue cette histoire",
+    "excellente nouvelle !!",
+    "je vis à bordeaux depuis 3 ans",
+    "vous jouez à quoi sur ps5 ?",
+]
+
+# Réponses du bot avant stylisation
+BOT_RESPONSES = [
+    "ah ok je vois",
+    "ouais c'est vrai ça",
+    "bonne question ça, je sais pas trop",
+    "parce que c'est toujours comme ça maintenant",
+    "c'est vraiment beaucoup trop compliqué pour moi",
+    "peut-être que quelqu'un sait quelque chose",
+    "je suis d'accord avec toi, c'est très bien",
+    "ah bon? intéressant",
+    "jamais testé mais ça a l'air cool",
+    "après faut voir comment ça se passe",
+    "bah écoute, je crois pas que ce soit possible",
+    "salut ! ça va bien et toi ?",
+]
+
+SENDERS = ["julien", "sophie", "kevin_", "Lea", "max42", "Nico", "camille", "Titi"]
+
+
+class BenchmarkFixture:
+    """Bot et générateur isolés dans un répertoire temporaire, graines fixes"""
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        config = Config(
+            server="irc.example.org", port=6667, ssl=False,
+            nickname="Pierre", username="pierre", realname="Pierre",
+            channels=["#bench"], response_probability=0.3,
+            min_response_delay=0.0, max_response_delay=0.0,
+            ai_api_key="", ai_model="gpt-3.5-turbo",
+            seed=seed,
+            # Écritures synchrones: save_memory mesure le coût réel de la sauvegarde
+            memory_config={"background_save": False}
+        )
+        self.bot = IrcHumanizerBot(config)
+        self.generator = self.bot.human_generator
+        self.personality = self.generator.personality
+        self.memory = self.generator.memory
+
+    def reseed(self):
+        for name, rng in (("generator", self.generator.rng), ("personality", self.personality.rng),
+                          ("memory", self.memory.rng), ("irc", self.bot.rng)):
+            rng.seed(f"{self.seed}:bench:{name}")
+
+    def fill_memory(self, channels: int = 5, messages_per_channel: int = 50):
+        """Remplit la mémoire comme après une soirée active"""
+        self.memory.clear_memory()
+        for c in range(channels):
+            for i in range(messages_per_channel):
+                sender = SENDERS[(i + c) % len(SENDERS)]
+                message = USER_MESSAGES[(i * 7 + c) % len(USER_MESSAGES)]
+                self.memory.add_message(f"#salon{c}", sender, message)
+                if i % 4 == 3:
+                    response = BOT_RESPONSES[i % len(BOT_RESPONSES)]
+                    self.memory.add_message(f"#salon{c}", "Pierre", response, is_bot=True)
+
+    def fill_large(self, total_messages: int = 1_000_000) -> int:
+        """Remplit la mémoire via add_message (statistiques, styles, expiration, extraction comprises)
+
+        Tout reste en mémoire vive: ni sauvegarde ni limite de contextes
+        pendant le remplissage. Retourne le nombre de contextes.
+        """
+        memory = self.memory
+        memory.clear_memory()
+        per_context = memory.max_messages
+        contexts = total_messages // per_context
+        save_every, max_contexts = memory.save_every, memory.max_contexts
+        memory.save_every, memory.max_contexts = float("inf"), None
+        try:
+            for c in range(contexts):
+                for i in range(per_context):
+                    is_bot = i % 4 == 3
+                    sender = "Pierre" if is_bot else SENDERS[(i + c) % len(SENDERS)]
+                    memory.add_message(f"#salon{c}", sender,
+                                       f"{USER_MESSAGES[(i * 7 + c) % len(USER_MESSAGES)]} {c}:{i}", is_bot=is_bot)
+        finally:
+            memory.save_every, memory.max_contexts = save_every, max_contexts
+        return contexts
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Enregistre une fonction de préparation retournant l'opération à mesurer"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("add_human_touches")
+def bench_add_human_touches(fixture):
+    generator = fixture.generator
+    return lambda i: generator._add_human_touches(BOT_RESPONSES[i % len(BOT_RESPONSES)],
+                                                  USER_MESSAGES[i % len(USER_MESSAGES)])
+
+
+@benchmark("apply_sms_abbreviations")
+def bench_apply_sms_abbreviations(fixture):
+    generator = fixture.generator
+    return lambda i: generator._apply_sms_abbreviations(BOT_RESPONSES[i % len(BOT_RESPONSES)])
+
+
+@benchmark("apply_typos")
+def bench_apply_typos(fixture):
+    generator = fixture.generator
+    return lambda i: generator._apply_typos(BOT_RESPONSES[i % len(BOT_RESPONSES)])
+
+
+@benchmark("get_contextual_reaction")
+def bench_get_contextual_reaction(fixture):
+    generator = fixture.generator
+    return lambda i: generator._get_contextual_reaction(USER_MESSAGES[i % len(USER_MESSAGES)])
+
+
+@benchmark("adapt_response_style")
+def bench_adapt_response_style(fixture):
+    personality = fixture.personality
+    return lambda i: personality.adapt_response_style(BOT_RESPONSES[i % len(BOT_RESPONSES)])
+
+
+@benchmark("extract_user_info_new")
+def bench_extract_user_info_new(fixture):
+    """Premier contact: aucune info connue, tous les extracteurs tournent"""
+    memory = fixture.memory
+    memory.clear_memory()
+    return lambda i: memory._extract_user_info(f"user{i}", USER_MESSAGES[i % len(USER_MESSAGES)])
+
+
+@benchmark("extract_user_info_known")
+def bench_extract_user_info_known(fixture):
+    """Habitués: infos déjà connues pour les expéditeurs du salon"""
+    fixture.fill_memory()
+    memory = fixture.memory
+    return lambda i: memory._extract_user_info(SENDERS[i % len(SENDERS)], USER_MESSAGES[i % len(USER_MESSAGES)])
+
+
+@benchmark("get_user_personality")
+def bench_get_user_personality(fixture):
+    fixture.fill_memory()
+    memory = fixture.memory
+    return lambda i: memory.get_user_personality(SENDERS[i % len(SENDERS)])
+
+
+@benchmark("is_bot_mentioned")
+def bench_is_bot_mentioned(fixture):
+    bot = fixture.bot
+    messages = USER_MESSAGES + ["Pierre: t'en penses quoi ?", "salut pierre !", "@Pierre tu viens ?"]
+    return lambda i: bot._is_bot_mentioned(messages[i % len(messages)])
+
+
+@benchmark("get_context_history_1m")
+def bench_get_context_history_1m(fixture):
+    """Derniers messages d'un contexte avec 1M de messages en mémoire"""
+    contexts = fixture.fill_large()
+    memory = fixture.memory
+    targets = [f"#salon{(c * 7919) % contexts}" for c in range(1000)]
+    return lambda i: memory.get_context_history(targets[i % len(targets)], limit=10)
+
+
+@benchmark("archive_query_user_week")
+def bench_archive_query_user_week(fixture):
+    """Ce qu'un utilisateur a dit la semaine passée dans un salon (archive de 200k messages sur 30 jours)"""
+    archive = HistoryArchive("bench_archive", flush_every=10000)
+    archive.clear()
+    total = 200_000
+    started = time.time() - 30 * 86400
+    for i in range(total):
+        msg = MemoryMessage(started + i * 30 * 86400 / total, SENDERS[i % len(SENDERS)],
+                            USER_MESSAGES[i % len(USER_MESSAGES)], False)
+        archive.append(f"channel:#salon{i % 20}", msg)
+    archive.flush()
+    since = datetime.now() - timedelta(days=7)
+    return lambda i: archive.query(f"channel:#salon{i % 20}", sender=SENDERS[(i + 3) % len(SENDERS)],
+                                   since=since, limit=50)
+
+
+@benchmark("search_history")
+def bench_search_history(fixture):
+    """Anciennes lignes pertinentes pour l'IA (index BM25 d'un salon plein)"""
+    fixture.fill_memory(channels=1, messages_per_channel=800)
+    builder = fixture.generator.context_builder
+    builder.update_summaries()
+    return lambda i: builder.search_history("channel:#salon0", USER_MESSAGES[i % len(USER_MESSAGES)],
+                                            SENDERS[i % len(SENDERS)])
+
+
+@benchmark("retrieval_find_reply")
+def bench_retrieval_find_reply(fixture):
+    """Recherche dans un corpus de 200k paires: mots courants très fréquents, sujets rares"""
+    corpus_file = "bench_corpus.jsonl"
+    with open(corpus_file, "w", encoding="utf-8") as f:
+        for i in range(200_000):
+            f.write(json.dumps({"message": f"{USER_MESSAGES[i % len(USER_MESSAGES)]} sujet{i % 5000}",
+                                "reply": BOT_RESPONSES[i % len(BOT_RESPONSES)]}, ensure_ascii=False) + "\n")
+    engine = RetrievalEngine(corpus_file, rng=make_rng(fixture.seed, "bench", "retrieval"))
+    return lambda i: engine.find_reply(f"{USER_MESSAGES[(i * 7) % len(USER_MESSAGES)]} sujet{(i * 37) % 5000}")
+
+
+class _FakeAIClient:
+    """Client OpenAI factice et instantané: seul le coût de la passerelle est mesuré"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, max_tokens, temperature, response_format=None):
+        await asyncio.sleep(0)
+        if response_format is None:
+            content = BOT_RESPONSES[len(messages[-1]["content"]) % len(BOT_RESPONSES)]
+        else:
+            count = messages[-1]["content"].count("### Demande ")
+            content = json.dumps({str(index): BOT_RESPONSES[index % len(BOT_RESPONSES)]
+                                  for index in range(1, count + 1)}, ensure_ascii=False)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _gateway_burst(pack_requests: bool):
+    """Rafale de 8 demandes simultanées (une par persona) via une passerelle partagée"""
+    loop = asyncio.new_event_loop()
+    gateway = AIGateway(_FakeAIClient(), batch_window=0.0, pack_requests=pack_requests)
+    system = {"role": "system", "content": "Tu es Pierre, 27 ans, de Lyon."}
+
+    async def burst(i):
+        return await asyncio.gather(*(
+            gateway.complete([system, {"role": "user", "content": USER_MESSAGES[(i + k) % len(USER_MESSAGES)]}])
+            for k in range(8)))
+
+    return lambda i: loop.run_until_complete(burst(i))
+
+
+@benchmark("ai_gateway_burst")
+def bench_ai_gateway_burst(fixture):
+    return _gateway_burst(pack_requests=False)
+
+
+@benchmark("ai_gateway_burst_packed")
+def bench_ai_gateway_burst_packed(fixture):
+    return _gateway_burst(pack_requests=True)
+
+
+@benchmark("save_memory")
+def bench_save_memory(fixture):
+    fixture.fill_memory()
+    memory = fixture.memory
+    return lambda i: memory.save_memory()
+
+
+# Nombre d'appels par mesure (les opérations lentes en font moins)
+NUMBERS = {"save_memory": 50, "archive_query_user_week": 500}
+
+
+def run_benchmark(name: str, fixture: BenchmarkFixture, number: int, repeat: int) -> dict:
+    """Mesure une opération: médiane et minimum sur plusieurs répétitions"""
+    fixture.reseed()
+    operation = BENCHMARKS[name](fixture)
+    number = NUMBERS.get(name, number)
+
+    # Échauffement
+    for i in range(min(number, 100)):
+        operation(i)
+
+    timings = []
+    for _ in range(repeat):
+        fixture.reseed()
+        started = time.perf_counter()
+        for i in range(number):
+            operation(i)
+        timings.append((time.perf_counter() - started) / number * 1e9)
+
+    return {
+        "ns_per_op": round(statistics.median(timings), 1),
+        "min_ns_per_op": round(min(timings), 1),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def measure_footprint(fixture: BenchmarkFixture, total_messages: int = 200_000) -> dict:
+    """Mémoire allouée par message stocké (enregistrement, texte et deques compris)"""
+    fixture.memory.clear_memory()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        fixture.fill_large(total_messages)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    fixture.memory.clear_memory()
+    return {
+        "bytes_per_message": round(allocated / total_messages, 1),
+        "messages": total_messages,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Retourne les benchmarks plus lents que la référence au-delà du seuil"""
+    regressions = []
+    print(f"\n📊 Comparaison avec la référence (seuil {threshold:.0%}):")
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference:
+            print(f"   {name:<26} (pas de référence)")
+            continue
+        # Le minimum est moins sensible au bruit de la machine que la médiane
+        ratio = result["min_ns_per_op"] / reference["min_ns_per_op"] - 1
+        if ratio > threshold:
+            regressions.append(name)
+            marker = "❌ régression"
+        elif ratio < -threshold:
+            marker = "✅ plus rapide"
+        else:
+            marker = "  stable"
+        print(f"   {name:<26} {reference['min_ns_per_op']:>12.1f} → {result['min_ns_per_op']:>12.1f} ns ({ratio:+.1%}) {marker}")
+    return regressions
+
+
+def compare_footprint(footprint: dict, baseline: dict, threshold: float) -> bool:
+    """True si la mémoire par message dépasse la référence au-delà du seuil"""
+    reference = baseline.get("footprint")
+    if not reference:
+        return False
+    ratio = footprint["bytes_per_message"] / reference["bytes_per_message"] - 1
+    print(f"   {'message_footprint':<26} {reference['bytes_per_message']:>12.1f} → "
+          f"{footprint['bytes_per_message']:>12.1f} octets ({ratio:+.1%})")
+    return ratio > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks des fonctions de génération de texte")
+    parser.add_argument("--filter", help="Ne lancer que les benchmarks dont le nom contient ce texte")
+    parser.add_argument("--number", type=int, default=20000, help="Appels par mesure")
+    parser.add_argument("--repeat", type=int, default=5, help="Nombre de mesures (médiane retenue)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Enregistrer les résultats comme référence JSON")
+    parser.add_argument("--compare", help="Référence JSON à comparer")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Ralentissement toléré (0.10 = 10%%)")
+    parser.add_argument("--list", action="store_true", help="Lister les benchmarks disponibles")
+    args = parser.parse_args()
+
+    if args.list:
+        for name in BENCHMARKS:
+            print(name)
+        return
+
+    names = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+    with_footprint = not args.filter or "footprint" in args.filter
+    if not names and not with_footprint:
+        parser.error(f"Aucun benchmark ne correspond à '{args.filter}'")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    save_path = os.path.abspath(args.save) if args.save else None
+
+    logging.disable(logging.CRITICAL)
+    print(f"=== Micro-benchmarks ({len(names)}) ===\n")
+
+    # Répertoire temporaire: la mémoire du bot ne doit pas toucher bot_memory.json
+    original_dir = os.getcwd()
+    results = {}
+    footprint = None
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            fixture = BenchmarkFixture(args.seed)
+            for name in names:
+                results[name] = run_benchmark(name, fixture, args.number, args.repeat)
+                result = results[name]
+                print(f"⏱️ {name:<26} {result['ns_per_op']:>12.1f} ns/appel "
+                      f"(min {result['min_ns_per_op']:.1f}, {result['number']}x{result['repeat']})")
+            if with_footprint:
+                footprint = measure_footprint(fixture)
+                print(f"📦 {'message_footprint':<26} {footprint['bytes_per_message']:>12.1f} octets/message "
+                      f"({footprint['messages']} messages)")
+        finally:
+            os.chdir(original_dir)
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "results": results,
+                "footprint": footprint,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Référence enregistrée dans {args.save}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if footprint and compare_footprint(footprint, baseline, args.threshold):
+            regressions.append("message_footprint")
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ Aucune régression")
+
+
+if __name__ == "__main__":
+    main()
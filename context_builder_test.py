@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests du constructeur de contexte (résumé et index de recherche des messages évincés)
+"""
+
+import os
+import tempfile
+
+from src.context_builder import ContextBuilder, ContextSummary, HistoryIndex, estimate_tokens
+from src.memory_manager import ConversationMemory
+from src.memory_store import JsonMemoryStore, MemoryMessage
+
+
+def test_summary_render_long_word():
+    # Un mot de 250 caractères dans les sujets: le résumé doit être coupé une seule fois
+    summary = ContextSummary()
+    long_word = "a" * 250
+    for i in range(5):
+        summary.add(MemoryMessage(1700000000.0 + i, f"user{i}", f"{long_word} message {i}"))
+
+    text = summary.render(80)
+    assert text.endswith("...")
+    assert estimate_tokens(text) <= 80
+
+    for max_tokens in (0, 1, 2, 5, 20):
+        assert estimate_tokens(summary.render(max_tokens)) <= max(max_tokens, 2)
+
+
+def _index(lines, window=500):
+    index = HistoryIndex(window=window)
+    for i, (sender, message) in enumerate(lines):
+        index.add(MemoryMessage(1700000000.0 + i, sender, message))
+    return index
+
+
+def test_history_index_bm25_ranking():
+    index = _index([
+        ("alice", "le concert de jazz était génial"),
+        ("bob", "quelqu'un a vu le match hier soir"),
+        ("carl", "jazz jazz jazz toute la journée"),
+        ("dora", "je prépare une recette de crêpes"),
+        ("alice", "le jazz manouche me plaît beaucoup plus que le rock"),
+    ])
+
+    # Le terme rare pèse plus que le terme courant, la fréquence dans la ligne aussi
+    assert index.search("concert jazz", limit=1) == ["alice: le concert de jazz était génial"]
+    assert index.search("jazz", limit=1) == ["carl: jazz jazz jazz toute la journée"]
+
+    # Résultats renvoyés dans l'ordre chronologique, bonus pour l'expéditeur
+    assert index.search("jazz", limit=3) == ["alice: le concert de jazz était génial",
+                                             "carl: jazz jazz jazz toute la journée",
+                                             "alice: le jazz manouche me plaît beaucoup plus que le rock"]
+    assert index.search("jazz", sender="ALICE", limit=1) == ["alice: le concert de jazz était génial"]
+    assert index.search("football") == []
+
+
+def test_history_index_expiry():
+    index = _index([("alice", f"message numéro {i} sur le thème {('vélo', 'piano')[i % 2]}") for i in range(6)],
+                   window=4)
+
+    # Fenêtre de 4 lignes: les deux plus anciennes ne sont plus indexées
+    assert len(index) == 4
+    assert index.first_id == 2
+    assert sorted(index.search("vélo", limit=10)) == ["alice: message numéro 2 sur le thème vélo",
+                                                      "alice: message numéro 4 sur le thème vélo"]
+    assert all(line_id >= 2 for positions in index.postings.values() for line_id in positions)
+    assert index.total_length == sum(indexed.length for indexed in index.lines.values())
+
+    # Un terme qui n'apparaissait que dans les lignes oubliées disparaît de l'index
+    index = _index([("bob", "unique"), ("bob", "autre chose"), ("bob", "encore autre")], window=2)
+    assert "unique" not in index.postings
+    assert index.search("unique") == []
+
+
+
+def _builder(directory, max_tokens, min_recent):
+    memory = ConversationMemory(max_messages_per_context=3, store=JsonMemoryStore(os.path.join(directory, "m.json")))
+    builder = ContextBuilder(memory, max_tokens=max_tokens, summary_tokens=5, min_recent=min_recent)
+    # La ligne sur le jazz sort de la mémoire courte puis du résumé: seul l'index peut la rappeler
+    memory.add_message("#a", "alice", "le concert de jazz samedi était incroyable")
+    for i in range(5):
+        memory.add_message("#a", "bob", f"message récent numéro {i} " + "bla " * 10)
+    return builder
+
+
+def test_build_min_recent_and_separator():
+    jazz = "alice: le concert de jazz samedi était incroyable"
+    with tempfile.TemporaryDirectory() as directory:
+        # Aucune place réservée aux derniers messages: la ligne rappelée tient, aucun récent ensuite
+        text = _builder(directory, max_tokens=25, min_recent=0).build("#a", False, "tu aimes le jazz ?")
+        summary, recalled = text.split("\n")
+        assert recalled == jazz
+        assert "---" not in text
+
+        # Place réservée au dernier message: rappel puis séparateur puis message récent
+        text = _builder(directory, max_tokens=50, min_recent=1).build("#a", False, "tu aimes le jazz ?")
+        older, recent = text.split("\n---\n")
+        assert older.endswith(jazz)
+        assert recent.startswith("bob: message récent numéro 4")
+
+
+if __name__ == "__main__":
+    test_summary_render_long_word()
+    test_history_index_bm25_ranking()
+    test_history_index_expiry()
+    test_build_min_recent_and_separator()
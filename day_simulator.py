@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Simulateur Monte Carlo de journées d'activité pour régler le comportement du bot
+
+Rejoue la chaîne de décision de handle_privmsg (absence, retour, humeur, action,
+interruption, question, status, lurk, should_respond, inattention, anti-détection)
+sur des milliers de journées simulées en parallèle, avec des tirages NumPy groupés.
+Nécessite numpy (pip install numpy).
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.activity_manager import ActivityManager
+from src.config import Config
+from src.human_generator import HumanResponseGenerator
+from src.personality import PersonalityManager
+
+STEP_SECONDS = 10
+STEPS_PER_DAY = 24 * 3600 // STEP_SECONDS
+STEPS_PER_HOUR = 3600 // STEP_SECONDS
+
+# Messages entrants par heure sur un salon moyen (0h → 23h)
+DEFAULT_TRAFFIC = [
+    6, 3, 2, 1, 1, 1, 2, 6, 14, 20, 22, 24,
+    28, 26, 22, 22, 24, 26, 30, 36, 40, 38, 28, 14,
+]
+
+# Tables du bot, indexées pour les tirages vectorisés
+ABSENCE_DURATIONS = list(ActivityManager.ABSENCE_DURATIONS.values())
+
+MOODS = PersonalityManager.MOODS
+MOOD_MODIFIERS = np.array([PersonalityManager.MOOD_MODIFIERS[mood] for mood in MOODS])
+MOOD_TYPING = np.array([HumanResponseGenerator.MOOD_TYPING_MODIFIERS.get(mood, 1.0) for mood in MOODS])
+
+MAX_DAILY_MESSAGES = ActivityManager.MAX_DAILY_MESSAGES
+MAX_HOURLY_MESSAGES = ActivityManager.MAX_HOURLY_MESSAGES
+
+BRANCHES = ["absence", "return", "action", "interruption", "question", "status", "reply"]
+
+
+class DaySimulator:
+    """Simule des journées de trafic à travers la logique de décision du bot"""
+
+    def __init__(self, config: Config, traffic, mention_rate: float = 0.03,
+                 words_per_message: float = 8.0, reply_chars: float = 35.0,
+                 geek_level: float = 0.5, age: int = 30, is_channel: bool = True, seed: int = 0):
+        self.config = config
+        self.activity = ActivityManager(config_data=config.activity_config)
+        self.traffic = np.asarray(traffic, dtype=float)
+        self.mention_rate = mention_rate
+        self.words_per_message = words_per_message
+        self.reply_chars = reply_chars
+        self.geek_level = geek_level
+        self.age = age
+        self.is_channel = is_channel
+        self.rng = np.random.default_rng(seed)
+
+        self._build_time_masks()
+
+    def _build_time_masks(self):
+        """Précalcule, pour chaque pas de temps, les plages horaires de ActivityManager"""
+        settings = self.activity.settings
+        minutes = np.arange(STEPS_PER_DAY) * STEP_SECONDS // 60
+
+        def in_range(start_str, end_str):
+            start = self.activity._parse_time(start_str)
+            end = self.activity._parse_time(end_str)
+            start_minute = start.hour * 60 + start.minute
+            end_minute = end.hour * 60 + end.minute
+            return (minutes >= start_minute) & (minutes <= end_minute)
+
+        self.active_mask = in_range(settings.active_start, settings.active_end)
+        self.lunch_mask = in_range(settings.lunch_start, settings.lunch_end)
+        self.peak_mask = np.zeros(STEPS_PER_DAY, dtype=bool)
+        for peak_range in settings.peak_hours:
+            start_str, end_str = peak_range.split('-')
+            self.peak_mask |= in_range(start_str, end_str)
+        self.hour_of_step = minutes // 60
+
+    def _activity_level(self, step: int, weekend: np.ndarray) -> np.ndarray:
+        """Équivalent vectorisé de ActivityManager.get_activity_level"""
+        n_days = weekend.shape[0]
+        active = np.full(n_days, self.active_mask[step])
+        if self.lunch_mask[step]:
+            active &= self.rng.random(n_days) >= self.activity.settings.lunch_probability
+
+        level = np.where(weekend, self.activity.settings.weekend_activity_modifier, 1.0)
+        if self.peak_mask[step]:
+            level = level * ActivityManager.PEAK_ACTIVITY_MODIFIER
+        level = level * self.rng.uniform(0.9, 1.3, n_days)
+        return np.where(active, level, ActivityManager.OFF_HOURS_ACTIVITY)
+
+    def run(self, n_days: int):
+        """Lance la simulation et retourne les statistiques agrégées"""
+        rng = self.rng
+        n = n_days
+        weekend = (np.arange(n) % 7) >= 5
+
+        # État par journée
+        absent = np.zeros(n, dtype=bool)
+        absence_end = np.zeros(n, dtype=np.int64)
+        lurking = np.zeros(n, dtype=bool)
+        lurk_end = np.zeros(n, dtype=np.int64)
+        last_lurk_check = np.full(n, -10 ** 9, dtype=np.int64)
+        mood = np.full(n, 1, dtype=np.int64)  # "normal"
+        mood_intensity = np.full(n, 0.5)
+        daily_count = np.zeros(n, dtype=np.int64)
+
+        # Fenêtre glissante d'une heure pour la limite horaire
+        hour_window = np.zeros((n, STEPS_PER_HOUR), dtype=np.int64)
+        hour_count = np.zeros(n, dtype=np.int64)
+
+        sent_per_hour = np.zeros((n, 24), dtype=np.int64)
+        branch_counts = {branch: np.zeros(n, dtype=np.int64) for branch in BRANCHES}
+        daily_cap_hit = np.zeros(n, dtype=bool)
+        hourly_cap_hit = np.zeros((n, 24), dtype=bool)
+        reply_delays = []
+
+        arrival_probability = np.clip(self.traffic / STEPS_PER_HOUR, 0.0, 1.0)
+        absence_bounds = np.array(ABSENCE_DURATIONS)
+        lurk_check_steps = 5 * 60 // STEP_SECONDS
+
+        for step in range(STEPS_PER_DAY):
+            hour = self.hour_of_step[step]
+            window_index = step % STEPS_PER_HOUR
+            hour_count -= hour_window[:, window_index]
+            hour_window[:, window_index] = 0
+
+            incoming = rng.random(n) < arrival_probability[hour]
+            if not incoming.any():
+                continue
+
+            sent_now = np.zeros(n, dtype=bool)
+            recorded_now = np.zeros(n, dtype=bool)
+            handled = ~incoming
+
+            # 1. Absence aléatoire
+            starts_absence = ~handled & ~absent & (rng.random(n) <= ActivityManager.ABSENCE_PROBABILITY)
+            if starts_absence.any():
+                reason = rng.integers(0, len(ABSENCE_DURATIONS), n)
+                minutes = rng.integers(absence_bounds[reason, 0], absence_bounds[reason, 1] + 1)
+                absence_end = np.where(starts_absence, step + minutes * 60 // STEP_SECONDS, absence_end)
+                absent |= starts_absence
+                branch_counts["absence"] += starts_absence
+                sent_now |= starts_absence
+                handled |= starts_absence
+
+            # 2. Message de retour
+            returns = ~handled & absent & (step >= absence_end)
+            absent &= ~returns
+            branch_counts["return"] += returns
+            sent_now |= returns
+            handled |= returns
+
+            # 3. Changement d'humeur
+            mood_change = ~handled & (rng.random(n) < PersonalityManager.MOOD_CHANGE_PROBABILITY)
+            mood = np.where(mood_change, rng.integers(0, len(MOODS), n), mood)
+            mood_intensity = np.where(mood_change, rng.uniform(0.3, 1.0, n), mood_intensity)
+
+            # 4. Action /me, 5. interruption
+            for branch, probability in (("action", PersonalityManager.ACTION_PROBABILITY),
+                                        ("interruption", HumanResponseGenerator.INTERRUPTION_PROBABILITY)):
+                fired = ~handled & (rng.random(n) < probability)
+                branch_counts[branch] += fired
+                sent_now |= fired
+                handled |= fired
+
+            if self.is_channel:
+                # 6. Question spontanée, comptée comme réponse
+                question = ~handled & (rng.random(n) <= HumanResponseGenerator.QUESTION_PROBABILITY)
+                branch_counts["question"] += question
+                sent_now |= question
+                recorded_now |= question
+                handled |= question
+
+                # 7. Status spontané (hors absence, pendant les heures actives)
+                status = ~handled & (rng.random(n) <= ActivityManager.STATUS_PROBABILITY) & ~absent
+                if status.any():
+                    active = np.full(n, self.active_mask[step])
+                    if self.lunch_mask[step]:
+                        active &= rng.random(n) >= self.activity.settings.lunch_probability
+                    status &= active
+                branch_counts["status"] += status
+                sent_now |= status
+                recorded_now |= status
+                handled |= status
+
+            # 8-10. Probabilité de réponse (mention, humeur, activité, lurk, anti-détection)
+            candidates = ~handled & ~absent
+            if candidates.any():
+                mentioned = rng.random(n) < self.mention_rate
+                mood_modifier = MOOD_MODIFIERS[mood] * mood_intensity
+                base_probability = np.where(mentioned, 0.8, self.config.response_probability) * mood_modifier
+
+                # Mode lurker
+                lurk_over = lurking & (step >= lurk_end)
+                lurking &= ~lurk_over
+                check_lurk = candidates & ~lurking & (step - last_lurk_check >= lurk_check_steps)
+                last_lurk_check = np.where(check_lurk, step, last_lurk_check)
+                lurk_probability = 0.08 - self._activity_level(step, weekend) * 0.03
+                if self.peak_mask[step]:
+                    lurk_probability = lurk_probability * 0.5
+                lurk_probability = np.where(weekend, lurk_probability * 1.5, lurk_probability)
+                starts_lurk = check_lurk & (rng.random(n) < lurk_probability)
+                lurk_end = np.where(starts_lurk, step + rng.integers(10, 46, n) * 60 // STEP_SECONDS, lurk_end)
+                lurking |= starts_lurk
+
+                adjusted = base_probability * self._activity_level(step, weekend)
+                too_much = (daily_count >= MAX_DAILY_MESSAGES) | (hour_count >= MAX_HOURLY_MESSAGES)
+                daily_cap_hit |= candidates & (daily_count >= MAX_DAILY_MESSAGES)
+                hourly_cap_hit[:, hour] |= candidates & (hour_count >= MAX_HOURLY_MESSAGES)
+                adjusted = np.where(too_much, adjusted * ActivityManager.OVERLOAD_FACTOR, adjusted)
+
+                responds = candidates & ~lurking & (rng.random(n) < adjusted)
+
+                # 11. Inattention dans generate_response (20%, sauf mention)
+                responds &= mentioned | (rng.random(n) >= 0.2)
+
+                if responds.any():
+                    reply_delays.append(self._reply_delays(step, responds, mood, weekend))
+                branch_counts["reply"] += responds
+                sent_now |= responds
+                recorded_now |= responds
+
+            sent_per_hour[:, hour] += sent_now
+            daily_count += recorded_now
+            hour_window[:, window_index] += recorded_now
+            hour_count += recorded_now
+
+        delays = np.concatenate(reply_delays) if reply_delays else np.zeros(0)
+        return self._summarize(n, sent_per_hour, branch_counts, daily_cap_hit, hourly_cap_hit, delays)
+
+    def _reply_delays(self, step: int, responds: np.ndarray, mood: np.ndarray,
+                      weekend: np.ndarray) -> np.ndarray:
+        """Délais (lecture + frappe/activité) des réponses, comme handle_privmsg"""
+        rng = self.rng
+        count = int(responds.sum())
+        moods = mood[responds]
+
+        words = np.maximum(1, rng.poisson(self.words_per_message, count))
+        reading = words / rng.uniform(3.0, 6.0, count) + rng.uniform(0.3, 1.5, count)
+        reading = np.clip(reading, 0.5, 4.0)
+
+        chars = np.maximum(2, rng.poisson(self.reply_chars, count))
+        age_modifier = 1.2 if self.age < 25 else (0.9 if self.age > 35 else 1.0)
+        speed = rng.uniform(3.0, 5.5, count) * (1 + self.geek_level * 0.3) * age_modifier * MOOD_TYPING[moods]
+        typing = chars / speed
+        typing += np.where(chars > 50, rng.uniform(1.0, 3.0, count),
+                           np.where(chars > 20, rng.uniform(0.5, 1.5, count), 0.0))
+        typing = np.clip(typing * rng.uniform(0.7, 1.3, count), 1.0, 15.0)
+
+        activity_level = self._activity_level(step, weekend[responds])
+        modifier = np.where(activity_level > 1.2, 0.7, np.where(activity_level < 0.5, 1.8, 1.0))
+        hour = self.hour_of_step[step]
+        if 6 <= hour <= 9:
+            modifier = modifier * 1.3
+        elif 22 <= hour <= 23:
+            modifier = modifier * 1.5
+        low = self.config.min_response_delay * modifier
+        high = self.config.max_response_delay * modifier
+        distracted = rng.random(count) < 0.05
+        high = np.where(distracted, high * rng.uniform(2.0, 3.5, count), high)
+        activity_delay = rng.uniform(low, high)
+
+        return reading + np.maximum(typing, activity_delay * 0.3)
+
+    @staticmethod
+    def _summarize(n_days, sent_per_hour, branch_counts, daily_cap_hit, hourly_cap_hit, delays):
+        per_day = sent_per_hour.sum(axis=1)
+        summary = {
+            "days": n_days,
+            "messages_per_day_mean": float(per_day.mean()),
+            "messages_per_day_p5": float(np.percentile(per_day, 5)),
+            "messages_per_day_p95": float(np.percentile(per_day, 95)),
+            "messages_per_hour": sent_per_hour.mean(axis=0).round(2).tolist(),
+            "branches_per_day": {branch: float(counts.mean()) for branch, counts in branch_counts.items()},
+            "daily_cap_hit_ratio": float(daily_cap_hit.mean()),
+            "hourly_cap_hit_ratio": float(hourly_cap_hit.any(axis=1).mean()),
+            "hourly_cap_hit_hours_per_day": float(hourly_cap_hit.sum(axis=1).mean()),
+        }
+        if delays.size:
+            summary["reply_delay_seconds"] = {
+                "mean": float(delays.mean()),
+                "p50": float(np.percentile(delays, 50)),
+                "p90": float(np.percentile(delays, 90)),
+                "p99": float(np.percentile(delays, 99)),
+                "max": float(delays.max()),
+            }
+        return summary
+
+
+def _default_config() -> Config:
+    return Config(
+        server="", port=0, ssl=False, nickname="MonHumain", username="", realname="",
+        channels=[], response_probability=0.3, min_response_delay=2.0, max_response_delay=12.0,
+        ai_api_key="", ai_model=""
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation Monte Carlo de journées d'activité du bot")
+    parser.add_argument("--config", help="Fichier de configuration YAML (sinon valeurs par défaut)")
+    parser.add_argument("--days", type=int, default=2000, help="Nombre de journées simulées")
+    parser.add_argument("--traffic", help="24 valeurs séparées par des virgules: messages entrants par heure")
+    parser.add_argument("--traffic-scale", type=float, default=1.0, help="Multiplie le trafic par défaut")
+    parser.add_argument("--mention-rate", type=float, default=0.03, help="Part des messages qui mentionnent le bot")
+    parser.add_argument("--response-probability", type=float, help="Remplace behavior.response_probability")
+    parser.add_argument("--private", action="store_true", help="Simuler un privé (pas de questions/status)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = Config.load_from_file(args.config) if args.config else _default_config()
+    if args.response_probability is not None:
+        config.response_probability = args.response_probability
+
+    traffic = [float(v) for v in args.traffic.split(",")] if args.traffic else DEFAULT_TRAFFIC
+    if len(traffic) != 24:
+        parser.error("--traffic doit contenir 24 valeurs")
+    traffic = [value * args.traffic_scale for value in traffic]
+
+    simulator = DaySimulator(config, traffic, mention_rate=args.mention_rate,
+                             is_channel=not args.private, seed=args.seed)
+
+    print(f"=== Simulation de {args.days} journées ===\n")
+    started = time.perf_counter()
+    stats = simulator.run(args.days)
+    elapsed = time.perf_counter() - started
+
+    print(f"⏱️ Durée: {elapsed:.1f}s ({args.days / elapsed:.0f} journées/s)\n")
+    print("📊 Messages envoyés par jour:")
+    print(f"   moyenne {stats['messages_per_day_mean']:.1f} "
+          f"(p5 {stats['messages_per_day_p5']:.0f}, p95 {stats['messages_per_day_p95']:.0f})")
+
+    print("\n🕐 Messages envoyés par heure (moyenne):")
+    for hour, value in enumerate(stats["messages_per_hour"]):
+        bar = "█" * int(round(value * 4))
+        print(f"   {hour:02d}h {value:5.2f} {bar}")
+
+    print("\n🔀 Branches par jour:")
+    for branch, value in stats["branches_per_day"].items():
+        print(f"   {branch}: {value:.2f}")
+
+    print("\n🛡️ Anti-détection:")
+    print(f"   Limite journalière ({MAX_DAILY_MESSAGES}) atteinte: {stats['daily_cap_hit_ratio']:.1%} des jours")
+    print(f"   Limite horaire ({MAX_HOURLY_MESSAGES}) atteinte: {stats['hourly_cap_hit_ratio']:.1%} des jours "
+          f"({stats['hourly_cap_hit_hours_per_day']:.2f} h/jour)")
+
+    if "reply_delay_seconds" in stats:
+        delays = stats["reply_delay_seconds"]
+        print("\n⌛ Délais de réponse (s):")
+        print(f"   moyenne {delays['mean']:.1f}, p50 {delays['p50']:.1f}, p90 {delays['p90']:.1f}, "
+              f"p99 {delays['p99']:.1f}, max {delays['max']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests de l'archive long terme (requêtes par période et par expéditeur)
+"""
+
+import tempfile
+from datetime import datetime
+
+from src.history_archive import HistoryArchive
+from src.memory_store import MemoryMessage
+
+START = datetime(2025, 1, 1, 12, 0).timestamp()
+
+
+def _archive(directory):
+    archive = HistoryArchive(directory, flush_every=4)
+    for i in range(10):
+        archive.append("channel:#a", MemoryMessage(START + i * 60, ("Alice", "bob")[i % 2], f"salon {i}"))
+    for i in range(3):
+        archive.append("private:bob", MemoryMessage(START + i * 60 + 30, "bob", f"privé {i}"))
+    return archive
+
+
+def test_query_time_range():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = _archive(directory)
+        since = datetime.fromtimestamp(START + 3 * 60)
+        until = datetime.fromtimestamp(START + 6 * 60)
+
+        # since inclus, until exclu, tous contextes confondus et dans l'ordre chronologique
+        results = archive.query(since=since, until=until)
+        assert [(context_id, msg.message) for context_id, msg in results] == [
+            ("channel:#a", "salon 3"), ("channel:#a", "salon 4"), ("channel:#a", "salon 5")]
+
+        results = archive.query("channel:#a", since=since, limit=2)
+        assert [msg.message for _, msg in results] == ["salon 8", "salon 9"]
+        assert archive.query("channel:#a", until=datetime.fromtimestamp(START)) == []
+
+
+def test_query_sender():
+    with tempfile.TemporaryDirectory() as directory:
+        archive = _archive(directory)
+
+        # Pseudos insensibles à la casse, comme sur IRC
+        results = archive.query(sender="alice")
+        assert [msg.message for _, msg in results] == [f"salon {i}" for i in range(0, 10, 2)]
+        assert all(msg.sender == "Alice" for _, msg in results)
+
+        results = archive.query(sender="BOB", since=datetime.fromtimestamp(START + 60))
+        assert [(context_id, msg.message) for context_id, msg in results] == [
+            ("channel:#a", "salon 1"), ("private:bob", "privé 1"), ("private:bob", "privé 2"),
+            ("channel:#a", "salon 3"), ("channel:#a", "salon 5"), ("channel:#a", "salon 7"),
+            ("channel:#a", "salon 9")]
+        assert archive.query("private:bob", sender="alice") == []
+        archive.close()
+
+
+if __name__ == "__main__":
+    test_query_time_range()
+    test_query_sender()
+    print("✅ Tests de l'archive réussis")
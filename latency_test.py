@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests de la mesure des latences par étape et par branche
+"""
+
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from log_replay import LogEvent, LogReplayer
+from src.config import Config
+from src.latency import BUCKETS_MS, LatencyHistogram, LatencyRecorder
+
+MESSAGES = ["salut tout le monde", "Pierre: ça va ?", "quelqu'un joue à zelda ?", "t'es d'où Pierre ?",
+            "je m'appelle julien, j'habite à Lyon", "trop bien le concert hier !!"]
+
+
+def test_histogram_buckets():
+    histogram = LatencyHistogram()
+    for ms in (0.03, 0.07, 0.3, 3, 3, 3, 40, 700):
+        histogram.observe(ms)
+
+    assert histogram.counts[0] == 1 and histogram.counts[1] == 1 and histogram.counts[3] == 1
+    assert histogram.counts[BUCKETS_MS.index(5)] == 3
+    assert sum(histogram.counts) == histogram.count == 8
+    # Percentile = borne du bucket qui le contient, jamais au-delà du maximum observé
+    stats = histogram.to_dict()
+    assert stats["p50_ms"] == 5
+    assert stats["p95_ms"] == stats["p99_ms"] == stats["max_ms"] == 700
+    assert abs(stats["avg_ms"] - histogram.total_ms / 8) < 1e-3
+
+    histogram.observe(60000)
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(100) == 60000
+
+
+def test_disabled_recorder_records_nothing():
+    recorder = LatencyRecorder(enabled=False)
+    with recorder.span("privmsg.parse"):
+        pass
+    recorder.record_branch("canned", recorder.start())
+    assert recorder.start() == 0.0
+    assert recorder.get_stats() == {"enabled": False, "stages": {}, "branches": {}}
+    assert recorder.format_report() == "Mesure des latences désactivée"
+
+    recorder = LatencyRecorder(enabled=True)
+    with recorder.span("styling"):
+        pass
+    recorder.record_branch("canned", recorder.start())
+    assert recorder.stages["styling"].count == 1
+    assert recorder.branches["canned"].count == 1
+    recorder.reset()
+    assert not recorder.stages and not recorder.branches
+
+
+def test_pipeline_stages_and_branches():
+    with tempfile.TemporaryDirectory() as directory:
+        config = Config(server="irc.example.org", port=6667, ssl=False, nickname="Pierre", username="pierre",
+                        realname="Pierre", channels=["#replay"], response_probability=0.5, min_response_delay=1.0,
+                        max_response_delay=5.0, ai_api_key="", ai_model="test", seed=3,
+                        memory_config={"file": os.path.join(directory, "memory.json"), "background_save": False},
+                        monitoring_config={"latency": True})
+        start = datetime(2025, 3, 14, 20, 0)
+        events = [LogEvent(start + timedelta(seconds=30 * i), ("julien", "sophie")[i % 2],
+                           MESSAGES[i % len(MESSAGES)]) for i in range(40)]
+        replayer = LogReplayer(config, events, "#replay", speed=float("inf"))
+        results = asyncio.run(replayer.run())
+        stats = replayer.bot.latency.get_stats()
+
+        # Chaque message traité aboutit à exactement une branche mesurée, comptée comme dans les métriques
+        branches = {name: hist["count"] for name, hist in stats["branches"].items()}
+        assert branches == {**results["replies_by_branch"], **results["ignored_by_reason"]}
+        assert sum(branches.values()) == len(events)
+
+        stages = stats["stages"]
+        assert stages["privmsg.parse"]["count"] == len(events)
+        for stage in ("privmsg.decision", "privmsg.generate", "privmsg.delay", "generate.context", "styling"):
+            assert stages[stage]["count"] > 0, stage
+        # Les pauses simulées passent par l'horloge virtuelle: mesurées mais quasi instantanées
+        assert stages["privmsg.delay"]["max_ms"] < 1000
+
+        report = replayer.bot.latency.format_report("Latences du pipeline:")
+        assert report.startswith("Latences du pipeline:\nÉtapes:")
+        assert "privmsg.parse" in report and "Branches:" in report
+
+
+if __name__ == "__main__":
+    test_histogram_buckets()
+    test_disabled_recorder_records_nothing()
+    test_pipeline_stages_and_branches()
+    print("✅ Tests des latences réussis")
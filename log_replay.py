@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Rejeu d'un log de salon IRC réel à travers le bot, en temps accéléré
+
+Lit un log irssi, weechat ou znc, injecte chaque message dans
+IrcHumanizerBot.handle_message via un faux transport et une horloge virtuelle,
+puis mesure le débit d'ingestion, les décisions de réponse, le CPU consommé
+et la croissance mémoire.
+
+    python log_replay.py logs/#francophonie.log --speed max
+    python log_replay.py weechat.log --format weechat --speed 60 --json resultat.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from src.clock import VirtualClock
+from src.config import Config
+from src.irc_bot import IrcHumanizerBot
+from src.latency import LatencyHistogram
+from src.metrics_server import process_rss_bytes
+
+
+@dataclass
+class LogEvent:
+    """Message d'un log de salon"""
+    timestamp: datetime
+    nick: str
+    text: str
+    is_action: bool = False
+
+
+# irssi: "12:34 <@pseudo> message", "12:34:56 < pseudo> message", "12:34  * pseudo action"
+IRSSI_MESSAGE = re.compile(r"^(\d{2}:\d{2}(?::\d{2})?)\s+<[ @+%&~]?([^>]+)>\s?(.*)$")
+IRSSI_ACTION = re.compile(r"^(\d{2}:\d{2}(?::\d{2})?)\s+\*\s+(\S+)\s?(.*)$")
+IRSSI_OPENED = re.compile(r"^--- Log opened \w{3} (\w{3} \d{1,2} \d{2}:\d{2}:\d{2} \d{4})")
+IRSSI_DAY_CHANGED = re.compile(r"^--- Day changed \w{3} (\w{3} \d{1,2} \d{4})")
+
+# weechat: "2024-01-31 12:34:56\t@pseudo\tmessage" (" *" pour les actions)
+WEECHAT_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\t([^\t]*)\t(.*)$")
+WEECHAT_SKIPPED_PREFIXES = {"-->", "<--", "--", "=!=", ""}
+
+# znc: "[12:34:56] <pseudo> message", "[12:34:56] * pseudo action"
+ZNC_MESSAGE = re.compile(r"^\[(\d{2}:\d{2}:\d{2})\] <([^>]+)> (.*)$")
+ZNC_ACTION = re.compile(r"^\[(\d{2}:\d{2}:\d{2})\] \* (\S+) ?(.*)$")
+
+DATE_IN_FILENAME = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})")
+
+NICK_MODES = "@+%&~"
+
+
+def _with_time(day: datetime, clock_text: str) -> datetime:
+    parts = [int(part) for part in clock_text.split(":")]
+    hour, minute = parts[0], parts[1]
+    second = parts[2] if len(parts) > 2 else 0
+    return day.replace(hour=hour, minute=minute, second=second, microsecond=0)
+
+
+def detect_format(lines: List[str]) -> str:
+    """Devine le format du log à partir des premières lignes"""
+    scores = {"irssi": 0, "weechat": 0, "znc": 0}
+    for line in lines[:200]:
+        if WEECHAT_LINE.match(line):
+            scores["weechat"] += 1
+        elif ZNC_MESSAGE.match(line) or ZNC_ACTION.match(line):
+            scores["znc"] += 1
+        elif IRSSI_MESSAGE.match(line) or IRSSI_OPENED.match(line) or IRSSI_DAY_CHANGED.match(line):
+            scores["irssi"] += 1
+    best = max(scores, key=scores.get)
+    if not scores[best]:
+        raise ValueError("Format de log non reconnu (irssi, weechat ou znc)")
+    return best
+
+
+def parse_irssi(lines: Iterator[str], start_day: datetime) -> Iterator[LogEvent]:
+    day = start_day
+    previous: Optional[datetime] = None
+    for line in lines:
+        opened = IRSSI_OPENED.match(line)
+        if opened:
+            day = datetime.strptime(opened.group(1), "%b %d %H:%M:%S %Y").replace(hour=0, minute=0, second=0)
+            previous = None
+            continue
+        changed = IRSSI_DAY_CHANGED.match(line)
+        if changed:
+            day = datetime.strptime(changed.group(1), "%b %d %Y")
+            previous = None
+            continue
+
+        match = IRSSI_MESSAGE.match(line)
+        is_action = False
+        if not match:
+            match = IRSSI_ACTION.match(line)
+            is_action = True
+        if not match:
+            continue
+
+        timestamp = _with_time(day, match.group(1))
+        # Minuit passé sans ligne "Day changed"
+        if previous and timestamp < previous:
+            day += timedelta(days=1)
+            timestamp += timedelta(days=1)
+        previous = timestamp
+        yield LogEvent(timestamp, match.group(2).strip(), match.group(3), is_action)
+
+
+def parse_weechat(lines: Iterator[str], start_day: datetime) -> Iterator[LogEvent]:
+    for line in lines:
+        match = WEECHAT_LINE.match(line)
+        if not match:
+            continue
+        prefix, text = match.group(2).strip(), match.group(3)
+        if prefix in WEECHAT_SKIPPED_PREFIXES:
+            continue
+        timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S")
+        if prefix == "*":
+            nick, _, action = text.partition(" ")
+            yield LogEvent(timestamp, nick.lstrip(NICK_MODES), action, True)
+        else:
+            yield LogEvent(timestamp, prefix.lstrip(NICK_MODES), text)
+
+
+def parse_znc(lines: Iterator[str], start_day: datetime) -> Iterator[LogEvent]:
+    day = start_day
+    previous: Optional[datetime] = None
+    for line in lines:
+        match = ZNC_MESSAGE.match(line)
+        is_action = False
+        if not match:
+            match = ZNC_ACTION.match(line)
+            is_action = True
+        if not match:
+            continue
+        timestamp = _with_time(day, match.group(1))
+        if previous and timestamp < previous:
+            day += timedelta(days=1)
+            timestamp += timedelta(days=1)
+        previous = timestamp
+        yield LogEvent(timestamp, match.group(2).lstrip(NICK_MODES), match.group(3), is_action)
+
+
+PARSERS = {"irssi": parse_irssi, "weechat": parse_weechat, "znc": parse_znc}
+
+
+def load_events(path: str, log_format: str = "auto", start_day: Optional[datetime] = None) -> List[LogEvent]:
+    """Lit un fichier de log et retourne ses messages dans l'ordre"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\r\n") for line in f]
+
+    if log_format == "auto":
+        log_format = detect_format(lines)
+
+    if start_day is None:
+        # Date dans le nom du fichier (znc: #salon_20240131.log), sinon aujourd'hui
+        found = DATE_IN_FILENAME.search(os.path.basename(path))
+        start_day = datetime(*map(int, found.groups())) if found else datetime.now()
+    start_day = start_day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return list(PARSERS[log_format](iter(lines), start_day))
+
+
+class FakeWriter:
+    """Remplace le StreamWriter: garde les lignes envoyées par le bot"""
+
+    def __init__(self):
+        self.sent: List[str] = []
+
+    def write(self, data: bytes):
+        self.sent.append(data.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+class LogReplayer:
+    """Rejoue des messages de log dans le bot avec une horloge virtuelle"""
+
+    def __init__(self, config: Config, events: List[LogEvent], channel: str, speed: float,
+                 maintenance_every: int = 100, sample_every: int = 1000):
+        self.events = events
+        self.channel = channel
+        self.maintenance_every = maintenance_every
+        self.sample_every = sample_every
+
+        start = events[0].timestamp if events else datetime.now()
+        self.clock = VirtualClock(start=start, speed=speed)
+        self.bot = IrcHumanizerBot(config, clock=self.clock)
+        self.writer = FakeWriter()
+        self.bot.writer = self.writer
+        self.bot.connected = True
+
+        self.handle_latency = LatencyHistogram()
+        self.rss_samples: List[int] = []
+
+    def _raw_line(self, event: LogEvent) -> str:
+        text = f"\x01ACTION {event.text}\x01" if event.is_action else event.text
+        return f":{event.nick}!{event.nick}@replay PRIVMSG {self.channel} :{text}"
+
+    def _maintenance(self):
+        """Travail normalement fait par les tâches de fond (non lancées: elles feraient défiler le temps)"""
+        generator = self.bot.human_generator
+        generator.context_builder.update_summaries(max_items=200)
+        generator.memory.expire_old_messages(budget=0.005)
+        if generator.response_pool:
+            generator.response_pool.refill(generator.response_pool.items_per_tick)
+
+    async def run(self) -> dict:
+        rss_start = process_rss_bytes()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        self.rss_samples.append(rss_start)
+
+        for index, event in enumerate(self.events, 1):
+            # Attendre l'heure du message (immédiat en mode max, ignoré si le bot est en retard)
+            wait = event.timestamp.timestamp() - self.clock.time()
+            if wait > 0:
+                await self.clock.sleep(wait)
+
+            started = time.perf_counter()
+            await self.bot.handle_message(self._raw_line(event))
+            self.handle_latency.observe((time.perf_counter() - started) * 1000.0)
+
+            if index % self.maintenance_every == 0:
+                self._maintenance()
+            if index % self.sample_every == 0:
+                self.rss_samples.append(process_rss_bytes())
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        rss_end = process_rss_bytes()
+        self.rss_samples.append(rss_end)
+
+        count = len(self.events)
+        virtual_span = (self.events[-1].timestamp - self.events[0].timestamp).total_seconds() if count else 0.0
+        return {
+            "messages": count,
+            "wall_seconds": round(wall, 3),
+            "virtual_seconds": round(virtual_span, 1),
+            "messages_per_second": round(count / wall, 1) if wall else 0,
+            "cpu_seconds": round(cpu, 3),
+            "cpu_us_per_message": round(cpu / count * 1e6, 1) if count else 0,
+            "handle_message_ms": self.handle_latency.to_dict(),
+            "replies_by_branch": dict(self.bot.replies_by_branch),
+            "ignored_by_reason": dict(self.bot.ignored_by_reason),
+            "lines_sent": len(self.writer.sent),
+            "rss_start_bytes": rss_start,
+            "rss_end_bytes": rss_end,
+            "rss_peak_bytes": max(self.rss_samples),
+            "rss_growth_bytes": rss_end - rss_start,
+            "memory": self.bot.human_generator.memory.get_stats(),
+        }
+
+
+def _default_config(nickname: str) -> Config:
+    return Config(
+        server="irc.example.org", port=6667, ssl=False,
+        nickname=nickname, username=nickname.lower(), realname=nickname,
+        channels=["#replay"], response_probability=0.3,
+        min_response_delay=1.0, max_response_delay=5.0,
+        ai_api_key="", ai_model="gpt-3.5-turbo"
+    )
+
+
+def _format_bytes(value: int) -> str:
+    return f"{value / (1024 * 1024):.1f} Mo"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu d'un log de salon IRC dans le bot")
+    parser.add_argument("log", help="Fichier de log (irssi, weechat ou znc)")
+    parser.add_argument("--format", choices=["auto", "irssi", "weechat", "znc"], default="auto")
+    parser.add_argument("--date", help="Date du début du log (AAAA-MM-JJ) si absente du log")
+    parser.add_argument("--channel", default="#replay", help="Salon simulé")
+    parser.add_argument("--speed", default="max",
+                        help="Accélération du temps (ex: 60) ou 'max' pour aller le plus vite possible")
+    parser.add_argument("--config", help="Fichier de configuration YAML (clé IA ignorée)")
+    parser.add_argument("--nickname", default="Pierre", help="Pseudo du bot si pas de config")
+    parser.add_argument("--limit", type=int, help="Nombre maximum de messages rejoués")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+
+    speed = float("inf") if args.speed == "max" else float(args.speed)
+    if speed <= 0:
+        parser.error("--speed doit être positif")
+
+    start_day = datetime.strptime(args.date, "%Y-%m-%d") if args.date else None
+    events = load_events(args.log, args.format, start_day)
+    if args.limit:
+        events = events[:args.limit]
+    if not events:
+        parser.error("Aucun message trouvé dans le log")
+
+    config = Config.load_from_file(args.config) if args.config else _default_config(args.nickname)
+    # Pas d'appels réseau pendant un rejeu
+    config.ai_api_key = ""
+    config.seed = args.seed
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    logging.disable(logging.CRITICAL)
+    print(f"=== Rejeu de {len(events)} messages ({events[0].timestamp:%Y-%m-%d %H:%M} → "
+          f"{events[-1].timestamp:%Y-%m-%d %H:%M}) ===\n")
+
+    # Répertoire temporaire: la mémoire du bot ne doit pas toucher bot_memory.json
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            replayer = LogReplayer(config, events, args.channel, speed)
+            results = asyncio.run(replayer.run())
+            replayer.bot.human_generator.memory.close()
+        finally:
+            os.chdir(original_dir)
+
+    latency = results["handle_message_ms"]
+    print(f"⏱️ Durée réelle: {results['wall_seconds']:.2f}s pour {results['virtual_seconds'] / 3600:.1f}h de log")
+    print(f"📥 Débit: {results['messages_per_second']:.0f} messages/s")
+    print(f"⚙️ CPU: {results['cpu_seconds']:.2f}s ({results['cpu_us_per_message']:.0f} µs/message)")
+    print(f"   handle_message: moy {latency['avg_ms']:.3f}ms, p95<={latency['p95_ms']}ms, max {latency['max_ms']}ms")
+
+    print("\n🔀 Décisions:")
+    for branch, count in sorted(results["replies_by_branch"].items(), key=lambda item: -item[1]):
+        print(f"   {branch}: {count}")
+    for reason, count in sorted(results["ignored_by_reason"].items()):
+        print(f"   (sans réponse) {reason}: {count}")
+
+    print("\n🧠 Mémoire:")
+    print(f"   RSS: {_format_bytes(results['rss_start_bytes'])} → {_format_bytes(results['rss_end_bytes'])} "
+          f"(pic {_format_bytes(results['rss_peak_bytes'])}, croissance {_format_bytes(results['rss_growth_bytes'])})")
+    print(f"   Conversations: {results['memory']['total_contexts']} contextes, "
+          f"{results['memory']['total_messages']} messages")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Résultats enregistrés dans {args.json}")
+
+
+if __name__ == "__main__":
+    main()
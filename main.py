@@ -32,10 +32,18 @@ async def main():
         if bot:
             asyncio.create_task(bot.disconnect())
     
+    def latency_handler(signum, frame):
+        if bot:
+            bot.dump_latency()
+    
     # Gérer les signaux d'arrêt proprement
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    # SIGUSR1: rapport des latences dans les logs
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, latency_handler)
+    
     try:
         # Charger la configuration
         config = Config.load_from_file('config.yaml')
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests de la mémoire conversationnelle
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+from src.clock import VirtualClock
+from src.memory_manager import CASUAL_INDICATORS, ConversationMemory
+from src.memory_store import JournalMemoryStore, JsonMemoryStore, SqliteMemoryStore
+from src.user_facts import SharedUserFacts
+
+# Lignes d'utilisateurs et infos retenues par l'extraction d'origine (avant l'extraction partagée)
+FACT_LINES = {
+    "alice": ["salut, je m'appelle alice", "j'ai 25 ans et je joue à la ps5", "je vis à Lyon, j'adore le foot",
+              "j'écoute de la musique", "je m'appelle bob en fait"],
+    "bob": ["j'habite à Lyon", "j'habite à Paris et j'adore le football et la musique", "je suis de marseille"],
+    "carl": ["je suis bien content", "moi c'est Karim, 17 ans", "j'ai 150 ans", "je regarde netflix en mangeant"],
+    "dora": ["je suis de paris mais je vis à toulouse", "un film au cinéma à nantes", "je suis très fatiguée"],
+}
+EXPECTED_FACTS = {
+    "alice": {"first_name": "Alice", "age": 25, "location": "Lyon", "interests": ["gaming", "music"]},
+    "bob": {"location": "Lyon", "interests": ["music", "sport"]},
+    "carl": {"first_name": "Karim", "age": 17, "interests": ["movies"]},
+    "dora": {"location": "Paris", "interests": ["movies"]},
+}
+
+
+def _scanned_style(memory, username):
+    """Profil calculé en relisant tout l'historique (ancienne méthode)"""
+    messages = [msg.message for conversation in memory.conversations.values() for msg in conversation
+                if msg.sender == username and not msg.is_bot]
+    total = len(messages)
+    return {
+        "total_messages": total,
+        "avg_message_length": sum(len(message) for message in messages) / total,
+        "casualness_score": sum(1 for message in messages for indicator in CASUAL_INDICATORS
+                                if indicator in message.lower()) / total,
+        "question_ratio": sum(1 for message in messages if "?" in message) / total,
+    }
+
+
+def test_user_style_matches_full_scan():
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(max_messages_per_context=4,
+                                    store=JsonMemoryStore(os.path.join(directory, "memory.json")))
+        lines = ["salut mdr", "tu fais quoi ?", "jsp lol ^^", "ok", "on se voit demain ?", "bcp de boulot :("]
+        for i, line in enumerate(lines):
+            memory.add_message("#a", "alice", line)
+            memory.add_message("#b" if i % 2 else "#a", "alice", line.upper())
+            memory.add_message("#a", "Bot", "réponse du bot", is_bot=True)
+
+        # Les messages sortis des deques ne comptent plus, les messages du bot jamais
+        style = memory.get_user_personality("alice")
+        expected = _scanned_style(memory, "alice")
+        for key, value in expected.items():
+            assert abs(style[key] - value) < 1e-9, (key, style[key], value)
+        assert style["sample_messages"] == ["ON SE VOIT DEMAIN ?", "bcp de boulot :(", "BCP DE BOULOT :("]
+        assert memory.get_user_personality("Bot") == {}
+        assert memory.get_user_personality("nobody") == {}
+
+
+
+def test_expire_old_messages():
+    clock = VirtualClock(start=datetime(2025, 1, 1, 12, 0))
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(store=JsonMemoryStore(os.path.join(directory, "memory.json")), clock=clock)
+        memory.add_message("#old", "alice", "premier")
+        clock.advance(86400)
+        memory.add_message("#mixed", "bob", "ancien")
+        clock.advance(7 * 86400)
+        memory.add_message("#mixed", "bob", "récent")
+        memory.add_message("#new", "carl", "tout neuf")
+
+        # Plus de 6 jours: le contexte #old disparaît, #mixed perd son premier message
+        assert memory.expire_old_messages(days_old=6) == 2
+        assert "channel:#old" not in memory.conversations
+        assert [msg.message for msg in memory.get_context_history("#mixed")] == ["récent"]
+        assert [msg.message for msg in memory.get_context_history("#new")] == ["tout neuf"]
+        assert memory.expire_old_messages(days_old=6) == 0
+
+        # Budget écoulé: rien n'est retiré, le reste attend le passage suivant
+        clock.advance(30 * 86400)
+        assert memory.expire_old_messages(days_old=6, budget=0) == 0
+        assert memory.expire_old_messages(days_old=6) == 2
+        assert not memory.conversations
+
+
+
+def test_spill_and_reload():
+    with tempfile.TemporaryDirectory() as directory:
+        memory = ConversationMemory(store=SqliteMemoryStore(os.path.join(directory, "memory.db")),
+                                    max_contexts=2, max_users=2)
+        memory.add_message("#a", "alice", "je m'appelle alice")
+        memory.add_message("#a", "bob", "salut alice")
+        memory.add_message("#b", "carl", "coucou")
+        memory.add_message("#c", "dora", "hello")
+
+        # #a et les premiers utilisateurs sont sortis de la mémoire vive vers le stockage
+        assert "channel:#a" not in memory.conversations
+        assert "channel:#a" in memory._spilled_contexts
+        assert "alice" not in memory.users_info
+        assert memory.spills >= 2
+
+        history = memory.get_context_history("#a")
+        assert [(msg.sender, msg.message) for msg in history] == [("alice", "je m'appelle alice"),
+                                                                  ("bob", "salut alice")]
+        assert memory.get_user_info("alice")["first_name"] == "Alice"
+        assert memory.reloads >= 2
+        assert "channel:#a" not in memory._spilled_contexts
+        memory.close()
+
+
+
+def _facts(info):
+    return {key: value for key, value in info.items() if not key.endswith("_mentioned_at")}
+
+
+def test_find_facts_parity():
+    with tempfile.TemporaryDirectory() as directory:
+        shared = SharedUserFacts()
+        memories = [
+            ConversationMemory(store=JsonMemoryStore(os.path.join(directory, "plain.json"))),
+            # Deux personas sur le même réseau: la seconde reprend les extractions de la première
+            ConversationMemory(store=JsonMemoryStore(os.path.join(directory, "a.json")), shared_facts=shared),
+            ConversationMemory(store=JsonMemoryStore(os.path.join(directory, "b.json")), shared_facts=shared),
+        ]
+        for memory in memories:
+            for username, lines in FACT_LINES.items():
+                for line in lines:
+                    memory.add_message("#salon", username, line)
+
+        for memory in memories:
+            for username, expected in EXPECTED_FACTS.items():
+                facts = _facts(memory.get_user_info(username))
+                assert facts == expected, (username, facts)
+
+        total_lines = sum(len(lines) for lines in FACT_LINES.values())
+        assert shared.extractions == total_lines
+        assert shared.cache_hits == total_lines
+
+
+def test_shared_facts_survive_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.json")
+        memory = ConversationMemory(store=JsonMemoryStore(path), shared_facts=SharedUserFacts())
+        for line in FACT_LINES["alice"]:
+            memory.add_message("#salon", "alice", line)
+        memory.save_memory()
+
+        # Nouveau processus: les faits partagés repartent des fiches enregistrées par la persona
+        shared = SharedUserFacts()
+        memory = ConversationMemory(store=JsonMemoryStore(path), shared_facts=shared, fresh=False)
+        memory.load_memory()
+        assert _facts(memory.get_user_info("alice")) == EXPECTED_FACTS["alice"]
+        assert shared.get("alice")["first_name"] == "Alice"
+        assert "first_name" not in memory.users_info["alice"]
+
+
+
+def test_limits_need_a_reloadable_store():
+    with tempfile.TemporaryDirectory() as directory:
+        stores = [JsonMemoryStore(os.path.join(directory, "memory.json")),
+                  JournalMemoryStore(os.path.join(directory, "memory.journal"), fsync=False)]
+        # Le prochain instantané complet effacerait les éléments évincés: limites refusées
+        for store in stores:
+            for limits in ({"max_contexts": 10}, {"max_users": 10}):
+                try:
+                    ConversationMemory(store=store, **limits)
+                except ValueError:
+                    continue
+                raise AssertionError(f"{type(store).__name__} accepte {limits}")
+            ConversationMemory(store=store).close()
+
+
+if __name__ == "__main__":
+    test_user_style_matches_full_scan()
+    test_expire_old_messages()
+    test_spill_and_reload()
+    test_find_facts_parity()
+    test_shared_facts_survive_restart()
+    test_limits_need_a_reloadable_store()
+    print("✅ Tests de la mémoire réussis")
@@ -1,67 +1,150 @@
 #!/usr/bin/env python3
 """
 Outil pour visualiser les statistiques de mémoire du bot
+
+Lecture seule: le stockage (JSON, SQLite ou journal) et l'archive long terme
+sont parcourus en une seule passe, sans créer de ConversationMemory (dont le
+constructeur efface la mémoire). Les agrégats sont proportionnels au nombre de
+contextes et d'utilisateurs, pas au nombre de messages.
+
+Lecture vraiment en flux pour SQLite, l'archive et les segments du journal.
+Le fichier JSON est chargé en entier (json.load), comme l'instantané compacté
+du journal (borné par la mémoire vive du bot): pour de gros volumes, utiliser
+le stockage sqlite ou journal.
 """
 
-import json
-from src.memory_manager import ConversationMemory
+import argparse
+import heapq
+import os
+from datetime import datetime
 
-def main():
-    print("=== Statistiques de mémoire IrcHumanizer ===\n")
-    
-    memory = ConversationMemory()
-    stats = memory.get_stats()
-    
-    print(f"📊 Résumé général:")
-    print(f"  - Total contextes: {stats['total_contexts']}")
-    print(f"  - Total messages: {stats['total_messages']}")
-    print(f"  - Salons: {stats['channel_contexts']}")
-    print(f"  - Conversations privées: {stats['private_contexts']}")
-    print(f"  - Taille fichier: {stats['memory_file_size']} bytes\n")
-    
-    print("📋 Détail des contextes:")
-    
-    for context_id, messages in memory.conversations.items():
-        message_count = len(messages)
-        if message_count == 0:
-            continue
-            
+from src.config import Config
+from src.history_archive import HistoryArchive
+from src.memory_manager import CASUAL_INDICATORS
+from src.memory_store import create_memory_store
+
+
+class StreamStats:
+    """Agrégats calculés message par message"""
+
+    def __init__(self):
+        self.total_messages = 0
+        # {context_id: [nombre, dernier message]}
+        self.contexts = {}
+        # {expéditeur: [messages, longueur totale, indicateurs décontractés, questions]}
+        self.users = {}
+
+    def add(self, context_id: str, msg):
+        self.total_messages += 1
+
+        context = self.contexts.get(context_id)
+        if context is None:
+            self.contexts[context_id] = [1, msg]
+        else:
+            context[0] += 1
+            if msg.ts >= context[1].ts:
+                context[1] = msg
+
+        # Ignorer les messages du bot
+        if msg.is_bot:
+            return
+        user = self.users.get(msg.sender)
+        if user is None:
+            user = self.users[msg.sender] = [0, 0, 0, 0]
+        message_lower = msg.message.lower()
+        user[0] += 1
+        user[1] += len(msg.message)
+        user[2] += sum(1 for indicator in CASUAL_INDICATORS if indicator in message_lower)
+        if "?" in msg.message:
+            user[3] += 1
+
+    def top_contexts(self, count: int):
+        return heapq.nlargest(count, self.contexts.items(), key=lambda item: item[1][0])
+
+    def top_users(self, count: int):
+        return heapq.nlargest(count, self.users.items(), key=lambda item: item[1][0])
+
+
+def print_stats(title: str, stats: StreamStats, size_bytes: int, known_users: int, top: int):
+    channel_contexts = sum(1 for context_id in stats.contexts if context_id.startswith("channel:"))
+    private_contexts = sum(1 for context_id in stats.contexts if context_id.startswith("private:"))
+
+    print(f"📊 {title}:")
+    print(f"  - Total contextes: {len(stats.contexts)}")
+    print(f"  - Total messages: {stats.total_messages}")
+    print(f"  - Salons: {channel_contexts}")
+    print(f"  - Conversations privées: {private_contexts}")
+    if known_users is not None:
+        print(f"  - Utilisateurs connus: {known_users}")
+    print(f"  - Taille sur disque: {size_bytes} bytes\n")
+
+    if not stats.total_messages:
+        return
+
+    print("📋 Contextes les plus actifs:")
+    for context_id, (message_count, last_msg) in stats.top_contexts(top):
         context_type = "💬 Privé" if context_id.startswith("private:") else "📢 Salon"
-        context_name = context_id.split(":", 1)[1]
-        
+        context_name = context_id.split(":", 1)[-1]
         print(f"  {context_type} '{context_name}': {message_count} messages")
-        
-        # Afficher les derniers messages pour aperçu
-        if message_count > 0:
-            last_msg = list(messages)[-1]
-            timestamp = last_msg["timestamp"][:16].replace("T", " ")
-            sender = last_msg["sender"]
-            content = last_msg["message"][:50] + "..." if len(last_msg["message"]) > 50 else last_msg["message"]
-            print(f"    Dernier: {timestamp} <{sender}> {content}")
-        
-        print()
-    
-    # Analyse des utilisateurs les plus actifs
+
+        # Dernier message pour aperçu
+        timestamp = last_msg.timestamp.strftime("%Y-%m-%d %H:%M")
+        content = last_msg.message[:50] + "..." if len(last_msg.message) > 50 else last_msg.message
+        print(f"    Dernier: {timestamp} <{last_msg.sender}> {content}")
+    print()
+
     print("👥 Utilisateurs les plus actifs:")
-    user_counts = {}
-    
-    for context_id, messages in memory.conversations.items():
-        for msg in messages:
-            sender = msg["sender"]
-            if not msg.get("is_bot", False):  # Ignorer les messages du bot
-                user_counts[sender] = user_counts.get(sender, 0) + 1
-    
-    # Trier par nombre de messages
-    sorted_users = sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    for i, (user, count) in enumerate(sorted_users, 1):
-        personality = memory.get_user_personality(user)
-        casualness = personality.get("casualness_score", 0)
-        casual_indicator = "😎" if casualness > 0.3 else "🤓"
-        
-        print(f"  {i:2d}. {casual_indicator} {user}: {count} messages")
-    
-    print("\n=== Fin des statistiques ===")
+    for i, (user, (count, total_length, casual_count, questions)) in enumerate(stats.top_users(top), 1):
+        casual_indicator = "😎" if casual_count / count > 0.3 else "🤓"
+        print(f"  {i:2d}. {casual_indicator} {user}: {count} messages "
+              f"(~{total_length // count} car., {questions * 100 // count}% de questions)")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistiques de la mémoire du bot (lecture seule)")
+    parser.add_argument("--config", default="config.yaml",
+                        help="Fichier de configuration YAML (section memory), valeurs par défaut s'il est absent")
+    parser.add_argument("--backend", choices=["json", "sqlite", "journal"], help="Remplace memory.backend")
+    parser.add_argument("--file", help="Remplace memory.file")
+    parser.add_argument("--archive", help="Répertoire de l'archive long terme (par défaut celui de la config)")
+    parser.add_argument("--top", type=int, default=10, help="Nombre de contextes et d'utilisateurs affichés")
+    args = parser.parse_args()
+
+    memory_config = {}
+    if os.path.exists(args.config):
+        memory_config = dict(Config.load_from_file(args.config).memory_config or {})
+    if args.backend:
+        memory_config['backend'] = args.backend
+    if args.file:
+        memory_config['file'] = args.file
+
+    print("=== Statistiques de mémoire IrcHumanizer ===\n")
+
+    store = create_memory_store(memory_config, read_only=True)
+    if memory_config.get('backend', 'json') == 'json':
+        print("ℹ️ Stockage JSON: fichier chargé en entier (préférer sqlite ou journal pour de gros volumes)\n")
+    try:
+        started = datetime.now()
+        stats = StreamStats()
+        for context_id, msg in store.iter_messages():
+            stats.add(context_id, msg)
+        known_users = sum(1 for _, info in store.iter_users() if info)
+        print_stats(f"Stockage {type(store).__name__} ({store.path})", stats, store.size_bytes(), known_users, args.top)
+    finally:
+        store.close()
+
+    archive_config = memory_config.get('archive') or {}
+    archive_directory = args.archive or (archive_config.get('directory', "archive")
+                                         if archive_config.get('enabled', False) else None)
+    if archive_directory and os.path.isdir(archive_directory):
+        archive = HistoryArchive(archive_directory)
+        stats = StreamStats()
+        for context_id, msg in archive.iter_messages():
+            stats.add(context_id, msg)
+        print_stats(f"Archive long terme ({archive_directory})", stats, archive.size_bytes(), None, args.top)
+
+    print(f"=== Fin des statistiques ({(datetime.now() - started).total_seconds():.1f}s) ===")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
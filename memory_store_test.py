@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests des stockages de la mémoire (SQLite, journal) et du writer d'arrière-plan
+"""
+
+import os
+import tempfile
+import threading
+
+from src.memory_store import BackgroundWriter, JournalMemoryStore, MemoryMessage, MemoryStore, SqliteMemoryStore
+
+
+def _messages(context_id, count, start=1700000000.0):
+    return [(context_id, MemoryMessage(start + i, f"user{i % 3}", f"message {i}", is_bot=i % 4 == 0))
+            for i in range(count)]
+
+
+def _rows(messages):
+    return [msg.to_row() for msg in messages]
+
+
+def test_sqlite_round_trip():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.db")
+        new_messages = _messages("channel:#a", 5) + _messages("private:bob", 3, start=1700001000.0)
+        users = {"bob": {"first_name": "Bob", "interests": ["music", "sport"]}}
+
+        store = SqliteMemoryStore(path)
+        store.save(None, None, new_messages, users)
+        store.close()
+
+        store = SqliteMemoryStore(path)
+        conversations, users_info = store.load(4)
+        # Les derniers messages de chaque contexte, dans l'ordre chronologique
+        assert _rows(conversations["channel:#a"]) == _rows(msg for _, msg in new_messages[1:5])
+        assert _rows(conversations["private:bob"]) == _rows(msg for _, msg in new_messages[5:])
+        assert users_info == users
+
+        assert _rows(store.load_context("channel:#a", 2)) == _rows(msg for _, msg in new_messages[3:5])
+        assert store.load_user("bob") == users["bob"]
+        assert store.load_user("nobody") is None
+        assert sorted(store.iter_users()) == sorted(users.items())
+        assert len(list(store.iter_messages())) == 8
+        store.close()
+
+
+def test_journal_round_trip_with_compaction():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.journal")
+        store = JournalMemoryStore(path, compact_threshold=1, fsync=False)
+
+        first = _messages("channel:#a", 4)
+        store.save(None, None, first, {"bob": {"age": 30}})
+        # Instantané de l'état complet: les segments qu'il couvre disparaissent
+        store.compact({"channel:#a": [msg for _, msg in first]}, {"bob": {"age": 30}}, wait=True)
+        assert store.compactions == 1
+        assert os.path.exists(store.snapshot_path)
+        assert [generation for generation, _ in store._segments()] == []
+
+        second = _messages("channel:#a", 2, start=1700000100.0)
+        store.save(None, None, second, {"alice": {"location": "Lyon"}})
+        store.close()
+
+        store = JournalMemoryStore(path, compact_threshold=1, fsync=False)
+        conversations, users_info = store.load(10)
+        assert _rows(conversations["channel:#a"]) == _rows(msg for _, msg in first + second)
+        assert users_info == {"bob": {"age": 30}, "alice": {"location": "Lyon"}}
+        assert len(list(store.iter_messages())) == 6
+        store.close()
+
+
+def test_journal_replays_truncated_last_line():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "memory.journal")
+        store = JournalMemoryStore(path, fsync=False)
+        messages = _messages("channel:#a", 3)
+        store.save(None, None, messages, {})
+
+        # Arrêt brutal au milieu d'une écriture
+        with open(store._segment_path(store.generation), "a", encoding="utf-8") as f:
+            f.write('{"type": "message", "context": "channel:#a", "data": [17000')
+
+        conversations, _ = JournalMemoryStore(path, fsync=False).load(10)
+        assert _rows(conversations["channel:#a"]) == _rows(msg for _, msg in messages)
+
+
+class _SlowStore(MemoryStore):
+    """Stockage en mémoire dont chaque écriture attend un feu vert"""
+
+    def __init__(self):
+        super().__init__("")
+        self.saved = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def save(self, conversations, users_info, new_messages, dirty_users):
+        self.started.set()
+        self.release.wait(5)
+        self.saved.extend(new_messages)
+
+
+def test_background_writer_flush():
+    store = _SlowStore()
+    store.release.set()
+    writer = BackgroundWriter(store, delay=60.0)
+    messages = _messages("channel:#a", 3)
+    writer.submit(messages[:2], {})
+    writer.submit(messages[2:], {})
+
+    # flush() n'attend pas le délai de regroupement et revient une fois tout écrit
+    assert writer.flush(timeout=5)
+    assert store.saved == messages
+    assert writer.writes == 1
+    assert not writer.pending
+    writer.close(timeout=5)
+
+
+def test_background_writer_discard():
+    store = _SlowStore()
+    writer = BackgroundWriter(store, delay=0.0)
+    messages = _messages("channel:#a", 4)
+    writer.submit(messages[:2], {})
+    assert store.started.wait(5)
+
+    # Écriture en cours: discard() l'attend mais abandonne ce qui a été déposé ensuite
+    writer.submit(messages[2:], {"bob": {"age": 30}})
+    threading.Timer(0.05, store.release.set).start()
+    writer.discard()
+    assert store.saved == messages[:2]
+    assert not writer.pending
+
+    assert writer.flush(timeout=5)
+    assert store.saved == messages[:2]
+    writer.close(timeout=5)
+
+
+if __name__ == "__main__":
+    test_sqlite_round_trip()
+    test_journal_round_trip_with_compaction()
+    test_journal_replays_truncated_last_line()
+    test_background_writer_flush()
+    test_background_writer_discard()
+    print("✅ Tests des stockages réussis")
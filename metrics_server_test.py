@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests de la page de métriques (format texte Prometheus)
+"""
+
+import logging
+import os
+import re
+import tempfile
+
+from src.config import Config
+from src.irc_bot import IrcHumanizerBot
+
+SAMPLE_LINE = re.compile(r'^(irchumanizer_\w+)(\{(\w+="(?:[^"\\]|\\.)*",?)+\})? (-?[0-9.e+-]+|\+Inf)$')
+
+
+def _bot(directory):
+    config = Config(server="irc.example.org", port=6667, ssl=False, nickname="Pierre", username="pierre",
+                    realname="Pierre", channels=["#salon"], response_probability=0.5, min_response_delay=1.0,
+                    max_response_delay=2.0, ai_api_key="", ai_model="test", seed=1,
+                    memory_config={"file": os.path.join(directory, "memory.json")},
+                    monitoring_config={"http": {"enabled": True, "port": 0}, "latency": True})
+    return IrcHumanizerBot(config)
+
+
+def test_render_metrics_format():
+    with tempfile.TemporaryDirectory() as directory:
+        bot = _bot(directory)
+        server = bot.metrics_server
+        bot.inbound_by_command["PRIVMSG"] += 3
+        bot.replies_by_branch['réponse "IA"'] += 2
+        bot.ignored_by_reason["probability"] += 1
+
+        # Une erreur journalisée par n'importe quel composant est comptée
+        logging.getLogger().addHandler(server.error_counter)
+        try:
+            logging.getLogger("src.memory_manager").error("erreur de test")
+        finally:
+            logging.getLogger().removeHandler(server.error_counter)
+
+        text = server.render_metrics()
+        assert text.endswith("\n")
+
+        samples = {}
+        declared = {}
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                name = line.split(" ")[2]
+                assert name not in declared, f"{name} déclarée deux fois"
+                declared[name] = None
+            elif line.startswith("# TYPE "):
+                _, _, name, kind = line.split(" ")
+                assert name in declared and kind in ("gauge", "counter", "histogram")
+                declared[name] = kind
+            else:
+                match = SAMPLE_LINE.match(line)
+                assert match, f"ligne invalide: {line!r}"
+                base = re.sub(r"_(bucket|sum|count)$", "", match.group(1))
+                assert match.group(1) in declared or declared.get(base) == "histogram", line
+                samples[line.rsplit(" ", 1)[0]] = float(line.rsplit(" ", 1)[1])
+
+        assert samples["irchumanizer_up"] == 0.0
+        assert samples['irchumanizer_inbound_lines_total{command="PRIVMSG"}'] == 3.0
+        assert samples['irchumanizer_replies_total{branch="réponse \\"IA\\""}'] == 2.0
+        assert samples['irchumanizer_ignored_total{reason="probability"}'] == 1.0
+        assert samples['irchumanizer_errors_total{component="memory_manager"}'] == 1.0
+        assert samples['irchumanizer_queue_depth{queue="context_summaries"}'] == 0.0
+        assert samples["irchumanizer_process_resident_memory_bytes"] > 0
+        assert declared["irchumanizer_memory_total_contexts"] == "gauge"
+        assert any(name.startswith("irchumanizer_activity_") for name in declared)
+
+
+if __name__ == "__main__":
+    test_render_metrics_format()
+    print("✅ Tests des métriques réussis")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests de la réserve de réponses préparées
+"""
+
+import os
+import tempfile
+
+from src.config import Config
+from src.human_generator import HumanResponseGenerator
+
+
+def _generator(directory, seed=1):
+    config = Config(server="irc.example.org", port=6667, ssl=False, nickname="Pierre", username="pierre",
+                    realname="Pierre", channels=["#salon"], response_probability=0.5, min_response_delay=1.0,
+                    max_response_delay=2.0, ai_api_key="", ai_model="test", seed=seed, warm_pool=True,
+                    memory_config={"file": os.path.join(directory, "memory.json")})
+    return HumanResponseGenerator(config)
+
+
+def test_take_and_refill():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = _generator(directory).response_pool
+        assert pool.take("casual") is None
+        assert pool.misses == 1
+
+        # L'humeur courante d'abord, une réserve complète par source
+        mood = pool.personality.profile.current_mood
+        assert pool.refill(2 * pool.pool_size) == 2 * pool.pool_size
+        assert len(pool.pools[mood]["casual"]) == pool.pool_size
+        assert len(pool.pools[mood]["question"]) == pool.pool_size
+        assert pool.size() == 2 * pool.pool_size
+
+        ready = pool.pools[mood]["casual"][0]
+        assert pool.take("casual") == ready
+        assert pool.hits == 1
+        assert len(pool.pools[mood]["casual"]) == pool.pool_size - 1
+
+        # Contexte tendu: les variantes préparées ne conviennent pas
+        assert pool.take("question", "t'es un bot ou quoi") is None
+        assert len(pool.pools[mood]["question"]) == pool.pool_size
+
+        # Une réaction inconnue devient une source, remplie au tour suivant
+        assert pool.take("reaction:ah cool !") is None
+        pool.refill(100)
+        assert len(pool.pools[mood]["reaction:ah cool !"]) == pool.reaction_pool_size
+        assert pool.refill(100) == 0
+
+
+def test_refill_keeps_decision_streams():
+    with tempfile.TemporaryDirectory() as directory:
+        generator = _generator(directory)
+        decisions = generator.rng.getstate()
+        personality = generator.personality.rng.getstate()
+
+        # Le remplissage tourne quand le bot est inactif: il ne doit rien tirer des autres flux
+        generator.response_pool.refill(50)
+        assert generator.rng.getstate() == decisions
+        assert generator.personality.rng.getstate() == personality
+
+        # Même graine, mêmes variantes
+        other = _generator(directory).response_pool
+        other.refill(50)
+        assert other.pools == generator.response_pool.pools
+
+
+def test_invalidation():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = _generator(directory).response_pool
+        personality = pool.personality
+        pool.refill(100)
+        previous = personality.profile.current_mood
+
+        # Seule la réserve de l'humeur quittée est périmée
+        personality.MOOD_CHANGE_PROBABILITY = 1.0
+        while personality.profile.current_mood == previous:
+            personality.update_mood()
+        current = personality.profile.current_mood
+        assert pool.size() == 4 * 2 * pool.pool_size
+        assert not any(pool.pools[previous].values())
+        assert pool.take("casual") is not None
+
+        # Profil modifié: tout est jeté au prochain take()
+        personality.profile.writing_styles = ["old_school"]
+        assert pool.take("casual") is None
+        assert pool.size() == 0
+        assert current == personality.profile.current_mood
+
+
+if __name__ == "__main__":
+    test_take_and_refill()
+    test_refill_keeps_decision_streams()
+    test_invalidation()
+    print("✅ Tests de la réserve de réponses réussis")
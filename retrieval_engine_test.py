@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests du moteur de réponses par recherche (index disque et paires apprises)
+"""
+
+import json
+import os
+import random
+import tempfile
+
+from src.retrieval_engine import RetrievalEngine
+
+
+def _write_corpus(path, pairs):
+    with open(path, "w", encoding="utf-8") as f:
+        for message, reply in pairs:
+            f.write(json.dumps({"message": message, "reply": reply}, ensure_ascii=False) + "\n")
+
+
+def test_index_build_and_lookup():
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.jsonl")
+        _write_corpus(corpus, [("salut tout le monde", "salut toi"), ("quelqu'un joue à zelda ?", "moi je suis dessus"),
+                               ("ligne sans réponse", ""), ("tu aimes zelda", "grave, le meilleur")])
+        with open(corpus, "a", encoding="utf-8") as f:
+            f.write("pas du json\n")
+
+        engine = RetrievalEngine(corpus, min_score=0.3, rng=random.Random(0))
+        assert os.path.exists(f"{corpus}.idx")
+        # Lignes invalides ou sans réponse ignorées
+        assert engine.get_stats() == {"disk_pairs": 3, "learned_pairs": 0, "vocabulary_size": 7}
+        assert engine._lookup_token("zelda")[1] == 2
+        assert engine._lookup_token("salut")[1] == 1
+        assert engine._lookup_token("absent") is None
+
+        assert engine.find_reply("qui joue à zelda") == "moi je suis dessus"
+        assert engine.find_reply("salut le monde") == "salut toi"
+        assert engine.find_reply("rien à voir") is None
+
+        # Corpus modifié: l'index périmé est reconstruit à l'ouverture
+        _write_corpus(corpus, [("on mange une pizza ?", "ok pour une pizza")])
+        engine = RetrievalEngine(corpus, rng=random.Random(0))
+        assert engine.disk_pairs == 1
+        assert engine.find_reply("tu mange une pizza") == "ok pour une pizza"
+
+
+def test_frequent_tokens_keep_old_pairs():
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.jsonl")
+        pairs = [("pizza ce soir", "grave partant pour une pizza")]
+        pairs += [(f"pizza au fromage {i}", f"miam {i}") for i in range(30)]
+        pairs += [(f"soir de match {i}", f"allez {i}") for i in range(30)]
+        _write_corpus(corpus, pairs)
+
+        # "pizza" tient dans le budget et est parcouru en entier; "soir" ne fournit que ses
+        # paires récentes comme candidates mais la vieille paire est bien notée sur les deux mots
+        engine = RetrievalEngine(corpus, max_postings=8, scan_budget=40, rng=random.Random(0))
+        assert engine.find_reply("pizza ce soir") == "grave partant pour une pizza"
+
+        # Sans budget, seules les paires récentes des deux mots sont examinées
+        engine = RetrievalEngine(corpus, max_postings=8, scan_budget=0, rng=random.Random(0))
+        assert engine.find_reply("pizza ce soir") != "grave partant pour une pizza"
+
+
+def test_learned_overlay():
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.jsonl")
+        history = os.path.join(directory, "learned.jsonl")
+        _write_corpus(corpus, [("tu joues à quoi", "à zelda en ce moment")])
+
+        engine = RetrievalEngine(corpus, history_file=history, history_flush_every=2, rng=random.Random(0))
+        engine.add_pair("vous regardez le match ce soir ?", "ouais devant la télé")
+        engine.add_pair("même message", "même message")
+        assert engine.total_pairs == 2
+        assert engine.find_reply("le match de ce soir") == "ouais devant la télé"
+        assert engine.find_reply("tu joues à quoi") == "à zelda en ce moment"
+
+        # Écriture groupée dans l'historique, relu au démarrage suivant
+        assert not os.path.exists(history)
+        engine.add_pair("qui joue ce soir", "moi je joue à zelda")
+        engine.flush_history()
+        engine = RetrievalEngine(corpus, history_file=history, rng=random.Random(0))
+        assert engine.get_stats()["learned_pairs"] == 2
+        assert engine.find_reply("qui joue ce soir") == "moi je joue à zelda"
+
+        # Mémoire bornée: la moitié la plus ancienne est oubliée d'un coup
+        engine = RetrievalEngine(max_learned_pairs=4, rng=random.Random(0))
+        for i in range(5):
+            engine.add_pair(f"question numéro {i}", f"réponse {i}")
+        assert [reply for _, reply, _ in engine._learned_pairs] == ["réponse 2", "réponse 3", "réponse 4"]
+        assert engine.find_reply("question numéro 0") != "réponse 0"
+        assert engine.find_reply("question numéro 3") == "réponse 3"
+
+
+if __name__ == "__main__":
+    test_index_build_and_lookup()
+    test_frequent_tokens_keep_old_pairs()
+    test_learned_overlay()
+    print("✅ Tests du moteur de réponses réussis")
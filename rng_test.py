@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests de reproductibilité: même graine et mêmes messages, mêmes décisions
+"""
+
+import asyncio
+import os
+import tempfile
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+from log_replay import LogEvent, LogReplayer
+from src.config import Config
+from src.rng import make_rng
+
+MESSAGES = ["salut tout le monde", "Pierre: ça va ?", "quelqu'un joue à zelda ?", "mdr t'es sérieux",
+            "je m'appelle julien, j'habite à Lyon", "pierre tu fais quoi ce soir ?", "trop bien le concert hier !!",
+            "c'est un bot ce mec ou quoi", "bonne nuit les gens", "t'es d'où Pierre ?"]
+START = datetime(2025, 3, 14, 20, 0)
+
+
+def _events(count=60):
+    return [LogEvent(START + timedelta(seconds=25 * i), ("julien", "sophie", "max42")[i % 3],
+                     MESSAGES[(i * 7) % len(MESSAGES)]) for i in range(count)]
+
+
+def _replay(directory, seed, nickname="Pierre"):
+    config = Config(server="irc.example.org", port=6667, ssl=False, nickname=nickname, username=nickname.lower(),
+                    realname=nickname, channels=["#replay"], response_probability=0.5, min_response_delay=1.0,
+                    max_response_delay=5.0, ai_api_key="", ai_model="test", seed=seed,
+                    memory_config={"file": os.path.join(directory, f"{nickname}-{seed}.json"),
+                                   "background_save": False})
+    replayer = LogReplayer(config, _events(), "#replay", speed=float("inf"))
+    results = asyncio.run(replayer.run())
+    return replayer, results
+
+
+def test_same_seed_same_decisions():
+    with tempfile.TemporaryDirectory() as first_dir, tempfile.TemporaryDirectory() as second_dir:
+        first, first_results = _replay(first_dir, seed=7)
+        second, second_results = _replay(second_dir, seed=7)
+
+        # Même persona générée, mêmes branches, mêmes lignes envoyées au même instant virtuel
+        assert asdict(first.bot.human_generator.personality.profile) == \
+            asdict(second.bot.human_generator.personality.profile)
+        assert first.writer.sent and first.writer.sent == second.writer.sent
+        assert first_results["replies_by_branch"] == second_results["replies_by_branch"]
+        assert first_results["ignored_by_reason"] == second_results["ignored_by_reason"]
+        assert first.clock.time() == second.clock.time()
+
+        other, _ = _replay(first_dir, seed=8)
+        assert asdict(other.bot.human_generator.personality.profile) != \
+            asdict(first.bot.human_generator.personality.profile)
+
+
+def test_streams_are_independent():
+    # Un flux par persona et par sous-système, tous dérivés de la même graine
+    assert make_rng(7, "Pierre", "generator").random() == make_rng(7, "Pierre", "generator").random()
+    assert make_rng(7, "Pierre", "generator").random() != make_rng(7, "Julie", "generator").random()
+    assert make_rng(7, "Pierre", "generator").random() != make_rng(7, "Pierre", "memory").random()
+    assert make_rng(None, "Pierre").random() != make_rng(None, "Pierre").random()
+
+    # Consommer un flux ne décale pas les autres
+    memory = make_rng(7, "Pierre", "memory")
+    expected = [memory.random() for _ in range(5)]
+    generator, memory = make_rng(7, "Pierre", "generator"), make_rng(7, "Pierre", "memory")
+    for _ in range(100):
+        generator.random()
+    assert [memory.random() for _ in range(5)] == expected
+
+
+if __name__ == "__main__":
+    test_same_seed_same_decisions()
+    test_streams_are_independent()
+    print("✅ Tests de reproductibilité réussis")
@@ -3,6 +3,7 @@ import random
 import pytz
 from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
+from .clock import Clock, REAL_CLOCK
 
 @dataclass
 class ActivitySettings:
@@ -32,7 +33,31 @@ class ActivitySettings:
 class ActivityManager:
     """Gestionnaire d'activité et d'anti-détection"""
     
-    def __init__(self, settings: Optional[ActivitySettings] = None, config_data: Optional[Dict] = None):
+    # Tables de décision (reprises telles quelles par day_simulator.py)
+    OFF_HOURS_ACTIVITY = 0.3      # Moins actif hors heures mais pas inactif
+    PEAK_ACTIVITY_MODIFIER = 1.5
+    MAX_DAILY_MESSAGES = 150      # Max messages par jour
+    MAX_HOURLY_MESSAGES = 20      # Max messages par heure
+    OVERLOAD_FACTOR = 0.3         # Probabilité réduite au-delà des limites
+    ABSENCE_PROBABILITY = 0.01    # 1% de chance (réduit)
+    STATUS_PROBABILITY = 0.005    # 0.5% pour éviter le spam
+    
+    # Durées d'absence possibles (en minutes)
+    ABSENCE_DURATIONS = {
+        "mange un truc": (5, 15),
+        "va aux toilettes": (2, 5),
+        "prend une pause": (10, 30),
+        "sort fumer une clope": (5, 10),
+        "va chercher un café": (3, 8),
+        "répond au téléphone": (5, 15),
+        "doit partir 5 min": (5, 20),
+        "brb": (5, 25),
+    }
+    
+    def __init__(self, settings: Optional[ActivitySettings] = None, config_data: Optional[Dict] = None,
+                 rng: Optional[random.Random] = None, clock: Optional[Clock] = None):
+        self.rng = rng or random.Random()
+        self.clock = clock or REAL_CLOCK
         if config_data:
             self.settings = self._create_settings_from_config(config_data)
         else:
@@ -74,22 +99,22 @@ class ActivityManager:
     
     def _get_current_time(self) -> datetime.datetime:
         """Retourne l'heure actuelle dans le timezone configuré"""
-        return datetime.datetime.now(self.tz)
+        return self.clock.now(self.tz)
     
-    def is_active_hours(self) -> bool:
-        """Vérifie si c'est dans les heures d'activité"""
-        now = self._get_current_time()
-        current_time = now.time()
-        
-        # Vérifier les horaires généraux
+    def _in_schedule(self) -> bool:
+        """Vérifie les horaires généraux (sans la pause déjeuner)"""
+        current_time = self._get_current_time().time()
         start_time = self._parse_time(self.settings.active_start)
         end_time = self._parse_time(self.settings.active_end)
-        
-        if not (start_time <= current_time <= end_time):
+        return start_time <= current_time <= end_time
+    
+    def is_active_hours(self) -> bool:
+        """Vérifie si c'est dans les heures d'activité"""
+        if not self._in_schedule():
             return False
         
         # Vérifier si c'est l'heure de déjeuner
-        if self._is_lunch_time() and random.random() < self.settings.lunch_probability:
+        if self._is_lunch_time() and self.rng.random() < self.settings.lunch_probability:
             return False
         
         return True
@@ -123,8 +148,15 @@ class ActivityManager:
     def get_activity_level(self) -> float:
         """Retourne le niveau d'activité actuel (0.0 à 2.0)"""
         if not self.is_active_hours():
-            return 0.3  # Moins actif hors heures mais pas inactif
+            return self.OFF_HOURS_ACTIVITY
         
+        # Ajouter une variation aléatoire (plus permissive)
+        variation = self.rng.uniform(0.9, 1.3)
+        
+        return self._base_activity() * variation
+    
+    def _base_activity(self) -> float:
+        """Niveau d'activité pendant les heures actives, avant variation aléatoire"""
         base_activity = 1.0
         
         # Modifier selon le weekend
@@ -133,12 +165,9 @@ class ActivityManager:
         
         # Modifier selon les heures de pointe
         if self._is_peak_hours():
-            base_activity *= 1.5
+            base_activity *= self.PEAK_ACTIVITY_MODIFIER
         
-        # Ajouter une variation aléatoire (plus permissive)
-        variation = random.uniform(0.9, 1.3)
-        
-        return base_activity * variation
+        return base_activity
     
     def should_respond(self, base_probability: float) -> bool:
         """Détermine si le bot devrait répondre selon l'activité"""
@@ -154,9 +183,9 @@ class ActivityManager:
         
         # Anti-détection: ne pas répondre trop souvent
         if self._is_responding_too_much():
-            adjusted_probability *= 0.3  # Réduire drastiquement
+            adjusted_probability *= self.OVERLOAD_FACTOR  # Réduire drastiquement
         
-        return random.random() < adjusted_probability
+        return self.rng.random() < adjusted_probability
     
     def _is_responding_too_much(self) -> bool:
         """Détecte si on répond trop souvent (anti-détection)"""
@@ -167,11 +196,7 @@ class ActivityManager:
             self.daily_message_count = 0
             self.last_message_date = now.date()
         
-        # Limites anti-détection
-        max_daily_messages = 150  # Max messages par jour
-        max_hourly_messages = 20  # Max messages par heure
-        
-        if self.daily_message_count >= max_daily_messages:
+        if self.daily_message_count >= self.MAX_DAILY_MESSAGES:
             return True
         
         # Vérifier messages de la dernière heure
@@ -181,7 +206,7 @@ class ActivityManager:
             if t > one_hour_ago
         ]
         
-        return len(recent_responses) >= max_hourly_messages
+        return len(recent_responses) >= self.MAX_HOURLY_MESSAGES
     
     def record_response(self):
         """Enregistre qu'une réponse a été envoyée"""
@@ -196,25 +221,13 @@ class ActivityManager:
     
     def simulate_random_absence(self) -> Optional[str]:
         """Simule une absence aléatoire avec raison"""
-        if self.is_simulating_absence or random.random() > 0.01:  # 1% de chance (réduit)
+        if self.is_simulating_absence or self.rng.random() > self.ABSENCE_PROBABILITY:
             return None
         
         now = self._get_current_time()
         
-        # Durées d'absence possibles (en minutes)
-        absence_durations = {
-            "mange un truc": (5, 15),
-            "va aux toilettes": (2, 5), 
-            "prend une pause": (10, 30),
-            "sort fumer une clope": (5, 10),
-            "va chercher un café": (3, 8),
-            "répond au téléphone": (5, 15),
-            "doit partir 5 min": (5, 20),
-            "brb": (5, 25),
-        }
-        
-        reason, (min_duration, max_duration) = random.choice(list(absence_durations.items()))
-        duration = random.randint(min_duration, max_duration)
+        reason, (min_duration, max_duration) = self.rng.choice(list(self.ABSENCE_DURATIONS.items()))
+        duration = self.rng.randint(min_duration, max_duration)
         
         self.is_simulating_absence = True
         self.absence_end_time = now + datetime.timedelta(minutes=duration)
@@ -250,7 +263,7 @@ class ActivityManager:
             "ça y est je suis là",
         ]
         
-        return random.choice(return_messages)
+        return self.rng.choice(return_messages)
     
     def simulate_lurker_mode(self) -> bool:
         """Simule un mode observateur où le bot lit sans répondre"""
@@ -284,9 +297,9 @@ class ActivityManager:
         if self._is_weekend():
             lurk_probability *= 1.5
             
-        if random.random() < lurk_probability:
+        if self.rng.random() < lurk_probability:
             # Durée du mode lurk (en minutes)
-            lurk_duration_minutes = random.randint(10, 45)  # 10-45 minutes
+            lurk_duration_minutes = self.rng.randint(10, 45)  # 10-45 minutes
             
             self.is_lurking = True
             self.lurk_end_time = now + datetime.timedelta(minutes=lurk_duration_minutes)
@@ -296,8 +309,8 @@ class ActivityManager:
     
     def get_spontaneous_status(self) -> Optional[str]:
         """Génère un status update spontané selon l'activité et l'heure"""
-        # Très faible probabilité (0.5%) pour éviter le spam
-        if random.random() > 0.005:
+        # Très faible probabilité pour éviter le spam
+        if self.rng.random() > self.STATUS_PROBABILITY:
             return None
             
         # Pas de status si en absence
@@ -444,18 +457,18 @@ class ActivityManager:
         all_status = activity_status[:]
         
         # Ajouter status temporels (60% de chance)
-        if time_based_status and random.random() < 0.6:
+        if time_based_status and self.rng.random() < 0.6:
             all_status.extend(time_based_status)
             
         # Ajouter status du jour (30% de chance)
-        if weekday_status and random.random() < 0.3:
+        if weekday_status and self.rng.random() < 0.3:
             all_status.extend(weekday_status)
             
         # Ajouter status d'humeur (40% de chance)
-        if mood_status and random.random() < 0.4:
+        if mood_status and self.rng.random() < 0.4:
             all_status.extend(mood_status)
         
-        return random.choice(all_status) if all_status else None
+        return self.rng.choice(all_status) if all_status else None
     
     def get_adaptive_delay(self, base_min: float, base_max: float) -> float:
         """Calcule un délai adaptatif basé sur l'heure et l'activité"""
@@ -482,10 +495,61 @@ class ActivityManager:
         adjusted_max = base_max * modifier
         
         # Parfois beaucoup plus long (5% de chance) - humain distrait/interrompu
-        if random.random() < 0.05:
-            adjusted_max *= random.uniform(2.0, 3.5)  # Peut aller jusqu'à ~40s dans le pire cas
+        if self.rng.random() < 0.05:
+            adjusted_max *= self.rng.uniform(2.0, 3.5)  # Peut aller jusqu'à ~40s dans le pire cas
+        
+        return self.rng.uniform(adjusted_min, adjusted_max)
+    
+    def get_state(self) -> Dict:
+        """Compteurs et minuteries en cours (redémarrage à chaud)"""
+        def when(value):
+            return value.isoformat() if value else None
+        
+        return {
+            "last_response_times": [t.isoformat() for t in self.last_response_times],
+            "daily_message_count": self.daily_message_count,
+            "last_message_date": when(self.last_message_date),
+            "is_simulating_absence": self.is_simulating_absence,
+            "absence_end_time": when(self.absence_end_time),
+            "absence_reason": self.absence_reason,
+            "is_lurking": self.is_lurking,
+            "lurk_end_time": when(self.lurk_end_time),
+            "last_lurk_check": when(self.last_lurk_check)
+        }
+    
+    def restore_state(self, state: Dict):
+        """Reprend les compteurs et minuteries enregistrés (une absence finie pendant l'arrêt se termine au prochain contrôle)"""
+        def when(value):
+            return datetime.datetime.fromisoformat(value) if value else None
+        
+        self.last_response_times = [datetime.datetime.fromisoformat(t) for t in state.get("last_response_times", [])]
+        self.daily_message_count = state.get("daily_message_count", 0)
+        last_message_date = state.get("last_message_date")
+        self.last_message_date = datetime.date.fromisoformat(last_message_date) if last_message_date else None
+        self.is_simulating_absence = state.get("is_simulating_absence", False)
+        self.absence_end_time = when(state.get("absence_end_time"))
+        self.absence_reason = state.get("absence_reason")
+        self.is_lurking = state.get("is_lurking", False)
+        self.lurk_end_time = when(state.get("lurk_end_time"))
+        self.last_lurk_check = when(state.get("last_lurk_check"))
+    
+    def get_snapshot(self) -> Dict:
+        """État d'activité sans effet de bord (aucun tirage aléatoire): lisible par la supervision"""
+        now = self._get_current_time()
+        in_schedule = self._in_schedule()
         
-        return random.uniform(adjusted_min, adjusted_max)
+        return {
+            "current_time": now.strftime("%H:%M"),
+            "in_schedule": in_schedule,
+            "is_lunch_time": self._is_lunch_time(),
+            "base_activity_level": self._base_activity() if in_schedule else self.OFF_HOURS_ACTIVITY,
+            "daily_messages": self.daily_message_count,
+            "is_absent": self.is_simulating_absence,
+            "absence_reason": self.absence_reason,
+            "is_lurking": self.is_lurking,
+            "is_peak_hours": self._is_peak_hours(),
+            "is_weekend": self._is_weekend()
+        }
     
     def get_stats(self) -> Dict:
         """Retourne des statistiques d'activité"""
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import time
+import openai
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class _PendingRequest:
+    """Demande de génération en attente d'envoi"""
+    messages: List[Dict[str, str]]
+    max_tokens: int
+    temperature: float
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class AIGateway:
+    """Passerelle IA: regroupe les demandes sur une courte fenêtre et les envoie avec un parallélisme borné
+
+    Sans regroupement en une seule requête (pack_requests), attendre ne fait
+    rien gagner: chaque demande part tout de suite, le sémaphore borne le
+    parallélisme. Avec regroupement, une demande arrivée quand rien n'est en
+    attente ni en cours part aussi tout de suite; la fenêtre ne sert que
+    sous charge, quand d'autres demandes peuvent la rejoindre.
+    """
+
+    def __init__(self, client, model: str = "gpt-3.5-turbo", batch_window: float = 0.05,
+                 max_batch_size: int = 8, max_concurrency: int = 4, pack_requests: bool = False):
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.model = model
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.pack_requests = pack_requests
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self._pending: List[_PendingRequest] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._inflight: set = set()
+
+        # Statistiques
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self.completed = 0
+        self.errors = 0
+        self.api_calls = 0
+        self.packed_calls = 0
+        self.batches = 0
+        self.total_wait = 0.0
+        self.total_latency = 0.0
+
+    @classmethod
+    def from_config(cls, client, model: str, config_data: Optional[Dict] = None) -> 'AIGateway':
+        """Crée la passerelle depuis la section 'ai.batching' de la config YAML"""
+        config_data = config_data or {}
+        return cls(
+            client,
+            model=model,
+            batch_window=config_data.get('window_ms', 50) / 1000.0,
+            max_batch_size=config_data.get('max_batch_size', 8),
+            max_concurrency=config_data.get('max_concurrency', 4),
+            pack_requests=config_data.get('pack_requests', False)
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int = 120,
+                       temperature: float = 0.9) -> Optional[str]:
+        """Demande une complétion; la réponse arrive quand le lot contenant la demande est traité"""
+        loop = asyncio.get_running_loop()
+        request = _PendingRequest(messages, max_tokens, temperature, loop.create_future())
+        self._pending.append(request)
+        self.requests += 1
+
+        if not self.pack_requests or len(self._pending) >= self.max_batch_size or (
+                len(self._pending) == 1 and not self._inflight):
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        return await request.future
+
+    def _flush(self):
+        """Envoie le lot courant"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self.batches += 1
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[_PendingRequest]):
+        now = time.monotonic()
+        for request in batch:
+            self.total_wait += now - request.queued_at
+
+        if self.pack_requests and len(batch) > 1:
+            # Regrouper les demandes de même température et de même prompt système dans un seul appel
+            groups: Dict[tuple, List[_PendingRequest]] = {}
+            for request in batch:
+                groups.setdefault((request.temperature, self._system_prompt(request)), []).append(request)
+            await asyncio.gather(*(self._send_packed(group) for group in groups.values()))
+        else:
+            await asyncio.gather(*(self._send_single(request) for request in batch))
+
+    async def _send_single(self, request: _PendingRequest):
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                self.api_calls += 1
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=request.messages,
+                    max_tokens=request.max_tokens,
+                    temperature=request.temperature
+                )
+                self._resolve(request, response.choices[0].message.content, started)
+            except Exception as e:
+                self.errors += 1
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    @staticmethod
+    def _system_prompt(request: _PendingRequest) -> str:
+        messages = request.messages
+        return messages[0]['content'] if messages and messages[0]['role'] == "system" else ""
+
+    async def _send_packed(self, group: List[_PendingRequest]):
+        """Envoie plusieurs demandes indépendantes dans une seule requête structurée
+
+        Les demandes d'un groupe partagent leur prompt système: il reste en tête
+        de la requête, tel quel, pour que le cache de préfixe de l'API serve
+        aussi les appels groupés. Seule la consigne de format JSON est ajoutée
+        après lui; les parties variables vont dans le message utilisateur.
+        """
+        if len(group) == 1:
+            await self._send_single(group[0])
+            return
+
+        system_prompt = self._system_prompt(group[0])
+        sections = []
+        for index, request in enumerate(group, 1):
+            conversation = "\n".join(f"[{msg['role']}]\n{msg['content']}" for msg in request.messages
+                                     if msg['role'] != "system")
+            sections.append(f"### Demande {index}\n{conversation}")
+
+        packing_instructions = (
+            "Tu reçois plusieurs demandes indépendantes. Traite chacune séparément. "
+            "Réponds uniquement avec un objet JSON {\"1\": \"réponse 1\", \"2\": \"réponse 2\", ...}."
+        )
+        packed_messages = [
+            {"role": "system", "content": f"{system_prompt}\n\n{packing_instructions}" if system_prompt
+                else packing_instructions},
+            {"role": "user", "content": "\n\n".join(sections)}
+        ]
+
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                self.api_calls += 1
+                self.packed_calls += 1
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=packed_messages,
+                    max_tokens=sum(request.max_tokens for request in group),
+                    temperature=group[0].temperature,
+                    response_format={"type": "json_object"}
+                )
+                answers = json.loads(response.choices[0].message.content)
+            except Exception as e:
+                self.logger.warning(f"Requête groupée impossible ({e}), envoi individuel")
+                answers = {}
+
+        missing = []
+        for index, request in enumerate(group, 1):
+            answer = answers.get(str(index)) if isinstance(answers, dict) else None
+            if isinstance(answer, str) and answer.strip():
+                self._resolve(request, answer, started)
+            else:
+                missing.append(request)
+
+        # Les réponses manquantes sont redemandées individuellement
+        if missing:
+            await asyncio.gather(*(self._send_single(request) for request in missing))
+
+    def _resolve(self, request: _PendingRequest, text: Optional[str], started: float):
+        self.completed += 1
+        self.total_latency += time.monotonic() - started
+        if not request.future.done():
+            request.future.set_result(text)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Retourne des statistiques de débit de la passerelle"""
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "requests": self.requests,
+            "completed": self.completed,
+            "errors": self.errors,
+            "api_calls": self.api_calls,
+            "packed_calls": self.packed_calls,
+            "queue_depth": self.queue_depth,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "requests_per_api_call": round(self.completed / self.api_calls, 2) if self.api_calls else 0,
+            "avg_queue_wait_ms": round(self.total_wait / self.requests * 1000, 1) if self.requests else 0,
+            "avg_call_latency_ms": round(self.total_latency / self.completed * 1000, 1) if self.completed else 0,
+            "throughput_per_min": round(self.completed / elapsed * 60, 2),
+        }
+
+
+# Une passerelle par (clé API, modèle) et par processus: toutes les personas regroupent leurs demandes
+_SHARED: Dict[Tuple[str, str], AIGateway] = {}
+
+
+def create_shared_gateway(api_key: str, model: str, config_data: Optional[Dict] = None) -> AIGateway:
+    """Passerelle commune aux personas du processus (la première section 'ai.batching' lue s'applique)"""
+    key = (api_key, model)
+    if key not in _SHARED:
+        _SHARED[key] = AIGateway.from_config(openai.AsyncOpenAI(api_key=api_key), model, config_data)
+    return _SHARED[key]
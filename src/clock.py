@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, tzinfo
+from typing import List, Optional, Tuple
+
+
+class Clock:
+    """Horloge réelle (heure système et vraies attentes)"""
+
+    def now(self, tz: Optional[tzinfo] = None) -> datetime:
+        """Comme datetime.now(tz)"""
+        return datetime.now(tz)
+
+    def time(self) -> float:
+        """Timestamp epoch en secondes"""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Horloge monotone en secondes"""
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        """Attend le délai demandé"""
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """Horloge virtuelle pour simulations, rejeu et benchmarks
+
+    - speed=None : le temps n'avance que via advance() / advance_to(), les sleep() attendent
+    - speed=1000 : le temps virtuel avance 1000x plus vite que le temps réel
+    - speed=float('inf') : chaque sleep() avance l'horloge et rend la main immédiatement
+    """
+
+    def __init__(self, start: Optional[datetime] = None, speed: Optional[float] = None):
+        self._start_timestamp = (start or datetime.now()).timestamp()
+        self.speed = speed
+        self._offset = 0.0
+        self._real_start = time.monotonic()
+        self._sleepers: List[Tuple[float, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def is_manual(self) -> bool:
+        return self.speed is None
+
+    @property
+    def is_instant(self) -> bool:
+        return self.speed is not None and self.speed == float('inf')
+
+    def elapsed(self) -> float:
+        """Secondes virtuelles écoulées depuis le départ"""
+        if self.speed is None or self.is_instant:
+            return self._offset
+        return self._offset + (time.monotonic() - self._real_start) * self.speed
+
+    def now(self, tz: Optional[tzinfo] = None) -> datetime:
+        return datetime.fromtimestamp(self.time(), tz)
+
+    def time(self) -> float:
+        return self._start_timestamp + self.elapsed()
+
+    def monotonic(self) -> float:
+        return self.elapsed()
+
+    def advance(self, seconds: float):
+        """Fait avancer le temps virtuel et réveille les sleep() arrivés à échéance"""
+        if seconds < 0:
+            raise ValueError("Le temps ne peut pas reculer")
+        self._offset += seconds
+        self._wake_sleepers()
+
+    def advance_to(self, moment: datetime):
+        """Avance jusqu'à une date donnée"""
+        self.advance(max(0.0, moment.timestamp() - self.time()))
+
+    def _wake_sleepers(self):
+        current = self.elapsed()
+        while self._sleepers and self._sleepers[0][0] <= current:
+            _, _, future = heapq.heappop(self._sleepers)
+            if not future.done():
+                future.set_result(None)
+
+    async def sleep(self, seconds: float):
+        seconds = max(0.0, seconds)
+
+        if self.is_instant:
+            self._offset += seconds
+            self._wake_sleepers()
+            await asyncio.sleep(0)
+            return
+
+        if self.speed is not None:
+            await asyncio.sleep(seconds / self.speed)
+            return
+
+        # Mode manuel: attendre qu'advance() atteigne l'échéance
+        if seconds == 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self._offset + seconds, next(self._counter), future))
+        await future
+
+    async def run_for(self, seconds: float, step: float = 1.0):
+        """Mode manuel: fait défiler le temps par pas en laissant tourner la boucle entre chaque pas"""
+        target = self._offset + seconds
+        while self._offset < target:
+            self.advance(min(step, target - self._offset))
+            await asyncio.sleep(0)
+
+
+# Horloge par défaut partagée
+REAL_CLOCK = Clock()
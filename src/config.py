@@ -26,15 +26,43 @@ class Config:
     ai_api_key: str
     ai_model: str
     
+    # Budget de tokens pour l'historique envoyé à l'IA
+    ai_max_context_tokens: int = 400
+    
+    # Regroupement des requêtes IA (optionnel)
+    ai_batching: Optional[Dict[str, Any]] = None
+    
+    # Recherche d'anciennes lignes pertinentes pour l'IA (optionnel)
+    ai_history_search: Optional[Dict[str, Any]] = None
+    
     # Paramètres avec valeurs par défaut
     auto_personality_identity: bool = True
     
+    # Préparer les réponses prédéfinies pendant les temps morts
+    warm_pool: bool = False
+    
+    # Redémarrage à chaud: garder la même persona, son humeur, son activité et sa mémoire
+    warm_restart: bool = False
+    state_file: str = "bot_state.json"
+    
+    # Graine aléatoire pour des exécutions reproductibles (optionnelle)
+    seed: Optional[int] = None
+    
     # Configuration personnalité (optionnelle)
     personality_config: Optional[Dict[str, Any]] = None
     
     # Configuration activité (optionnelle)
     activity_config: Optional[Dict[str, Any]] = None
     
+    # Configuration du moteur de réponses par recherche (optionnelle)
+    retrieval_config: Optional[Dict[str, Any]] = None
+    
+    # Configuration du stockage de la mémoire (optionnelle)
+    memory_config: Optional[Dict[str, Any]] = None
+    
+    # Configuration de la supervision (latences, métriques)
+    monitoring_config: Optional[Dict[str, Any]] = None
+    
     @classmethod
     def load_from_file(cls, config_path: str) -> 'Config':
         """Charge la configuration depuis un fichier YAML"""
@@ -58,13 +86,23 @@ class Config:
             realname=data['irc']['realname'],
             channels=data['irc']['channels'],
             auto_personality_identity=data['irc'].get('auto_personality_identity', True),
+            seed=data['behavior'].get('seed'),
+            warm_pool=data['behavior'].get('warm_pool', False),
+            warm_restart=data['behavior'].get('warm_restart', False),
+            state_file=data['behavior'].get('state_file', "bot_state.json"),
             response_probability=data['behavior'].get('response_probability', 0.3),
             min_response_delay=data['behavior'].get('min_response_delay', 1.0),
             max_response_delay=data['behavior'].get('max_response_delay', 5.0),
             ai_api_key=data['ai'].get('api_key', ''),
             ai_model=data['ai'].get('model', 'gpt-3.5-turbo'),
+            ai_max_context_tokens=data['ai'].get('max_context_tokens', 400),
+            ai_batching=data['ai'].get('batching'),
+            ai_history_search=data['ai'].get('history_search'),
             personality_config=data.get('personality'),
-            activity_config=data.get('activity')
+            activity_config=data.get('activity'),
+            retrieval_config=data.get('retrieval'),
+            memory_config=data.get('memory'),
+            monitoring_config=data.get('monitoring')
         )
     
     @staticmethod
@@ -0,0 +1,343 @@
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict, deque
+from typing import Dict, List, Optional, Set
+
+from .memory_manager import ConversationMemory
+from .memory_store import MemoryMessage
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Mots ignorés pour la pertinence et les résumés
+STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "de", "du", "et", "a", "à", "en",
+    "je", "tu", "il", "elle", "on", "ce", "ca", "ça", "est", "que", "qui", "pas",
+    "ne", "me", "te", "se", "y", "au", "aux", "pour", "sur", "dans", "avec",
+    "mais", "ou", "oui", "non", "nan", "ouais", "bah", "ben", "lol", "mdr", "c",
+    "j", "t", "l", "d", "qu", "s", "n", "m", "suis", "es", "fait", "plus", "moi",
+    "toi", "comme",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation rapide du nombre de tokens (~3 caractères par token pour du français IRC)"""
+    return len(text) // 3 + 1
+
+
+def _terms(text: str) -> List[str]:
+    return [word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 2 and word not in STOPWORDS]
+
+
+def _keywords(text: str) -> Set[str]:
+    return set(_terms(text))
+
+
+class ContextSummary:
+    """Résumé glissant des messages sortis de la mémoire courte d'un contexte"""
+
+    def __init__(self, max_keywords: int = 200):
+        self.max_keywords = max_keywords
+        self.message_count = 0
+        self.participants: Counter = Counter()
+        self.keywords: Counter = Counter()
+        self.last_lines: deque = deque(maxlen=2)
+
+    def add(self, msg: MemoryMessage):
+        """Intègre un message au résumé (coût constant)"""
+        self.message_count += 1
+        if not msg.is_bot:
+            self.participants[msg.sender] += 1
+        self.keywords.update(_keywords(msg.message))
+        self.last_lines.append(f"{msg.sender}: {msg.message}")
+
+        # Garder le compteur de mots-clés borné
+        if len(self.keywords) > self.max_keywords * 2:
+            self.keywords = Counter(dict(self.keywords.most_common(self.max_keywords)))
+
+    def render(self, max_tokens: int) -> str:
+        """Texte du résumé, tronqué au budget de tokens"""
+        if not self.message_count:
+            return ""
+
+        people = ", ".join(name for name, _ in self.participants.most_common(4)) or "quelques personnes"
+        topics = ", ".join(word for word, _ in self.keywords.most_common(6))
+
+        text = f"Plus tôt ({self.message_count} messages): {people}"
+        if topics:
+            text += f" ont parlé de {topics}"
+        text += "."
+
+        for line in self.last_lines:
+            candidate = f"{text}\n{line}"
+            if estimate_tokens(candidate) > max_tokens:
+                break
+            text = candidate
+
+        # Une seule coupe: len(texte) <= max_tokens * 3 - 1 tient toujours dans le budget
+        if estimate_tokens(text) > max_tokens:
+            text = text[:max(0, max_tokens * 3 - 4)] + "..."
+
+        return text
+
+
+class _IndexedLine:
+    """Message indexé: ligne formatée, expéditeur et fréquence des termes"""
+
+    __slots__ = ("line", "sender", "terms", "length")
+
+    def __init__(self, line: str, sender: str, terms: Counter):
+        self.line = line
+        self.sender = sender.lower()
+        self.terms = terms
+        self.length = sum(terms.values())
+
+
+class HistoryIndex:
+    """Index inversé incrémental des derniers messages évincés d'un contexte (classement BM25)
+
+    Les numéros de messages sont croissants et les listes de positions
+    (terme -> numéros) sont donc triées: oublier le message le plus ancien
+    revient à retirer le premier élément de chacune de ses listes.
+    """
+
+    def __init__(self, window: int = 500, k1: float = 1.2, b: float = 0.75, max_postings: int = 64):
+        self.window = window
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings
+
+        self.lines: Dict[int, _IndexedLine] = {}
+        self.postings: Dict[str, deque] = {}
+        self.first_id = 0
+        self.next_id = 0
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def add(self, msg: MemoryMessage):
+        """Indexe un message (coût proportionnel à son nombre de mots)"""
+        terms = Counter(_terms(msg.message))
+        if not terms:
+            return
+
+        line_id = self.next_id
+        self.next_id += 1
+        indexed = _IndexedLine(f"{msg.sender}: {msg.message}", msg.sender, terms)
+        self.lines[line_id] = indexed
+        self.total_length += indexed.length
+        for term in terms:
+            positions = self.postings.get(term)
+            if positions is None:
+                positions = self.postings[term] = deque()
+            positions.append(line_id)
+
+        if len(self.lines) > self.window:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        indexed = self.lines.pop(self.first_id)
+        self.first_id += 1
+        self.total_length -= indexed.length
+        for term in indexed.terms:
+            positions = self.postings[term]
+            positions.popleft()
+            if not positions:
+                del self.postings[term]
+
+    def search(self, query: str, sender: Optional[str] = None, limit: int = 3,
+               budget: Optional[float] = None) -> List[str]:
+        """Lignes les plus pertinentes pour la requête (BM25, bonus pour l'expéditeur), dans l'ordre chronologique
+
+        Les termes sont traités du plus rare au plus fréquent; au-delà du budget
+        (secondes), la recherche s'arrête avec les scores déjà calculés.
+        """
+        if not self.lines:
+            return []
+
+        query_terms = {term for term in _terms(query) if term in self.postings}
+        if not query_terms:
+            return []
+
+        deadline = time.perf_counter() + budget if budget is not None else None
+        count = len(self.lines)
+        average_length = self.total_length / count
+        k1, b = self.k1, self.b
+        scores: Dict[int, float] = {}
+
+        for term in sorted(query_terms, key=lambda term: len(self.postings[term])):
+            positions = self.postings[term]
+            frequency = len(positions)
+            if scores and frequency > count // 2:
+                # Terme présent dans plus de la moitié des lignes: n'apporte presque rien
+                break
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            # Les plus récents d'abord, nombre de positions borné pour les termes courants
+            for scanned, line_id in enumerate(reversed(positions)):
+                if scanned >= self.max_postings:
+                    break
+                if deadline is not None and not scanned % 16 and scanned and time.perf_counter() > deadline:
+                    break
+                indexed = self.lines[line_id]
+                tf = indexed.terms[term]
+                norm = k1 * (1 - b + b * indexed.length / average_length)
+                scores[line_id] = scores.get(line_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+        if sender:
+            sender = sender.lower()
+            for line_id in scores:
+                if self.lines[line_id].sender == sender:
+                    scores[line_id] *= 1.5
+
+        best = sorted(scores, key=scores.get, reverse=True)[:limit]
+        return [self.lines[line_id].line for line_id in sorted(best)]
+
+
+class ContextBuilder:
+    """Construit l'historique envoyé à l'IA dans un budget de tokens fixe"""
+
+    def __init__(self, memory: ConversationMemory, max_tokens: int = 400, summary_tokens: int = 80,
+                 min_recent: int = 3, relevant_lines: int = 3, index_window: int = 500,
+                 search_budget: float = 0.0002):
+        self.logger = logging.getLogger(__name__)
+        self.memory = memory
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.min_recent = min_recent
+        self.relevant_lines = relevant_lines
+        self.index_window = index_window
+        self.search_budget = search_budget
+
+        # Résumés et index de recherche par contexte, alimentés par les messages évincés de la mémoire
+        self.summaries: Dict[str, ContextSummary] = defaultdict(ContextSummary)
+        self.indexes: Dict[str, HistoryIndex] = {}
+        self._pending: deque = deque()
+
+        memory.eviction_listeners.append(self._on_evicted)
+        memory.spill_listeners.append(self.forget)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def _on_evicted(self, context_id: str, msg: MemoryMessage):
+        """Reçoit un message sorti de la mémoire courte (traité plus tard, en tâche de fond)"""
+        self._pending.append((context_id, msg))
+
+    def update_summaries(self, context_id: Optional[str] = None, max_items: Optional[int] = None) -> int:
+        """Intègre les messages évincés en attente aux résumés"""
+        processed = 0
+
+        if context_id is not None:
+            # Mise à jour ciblée: seulement les messages de ce contexte
+            remaining = deque()
+            while self._pending:
+                pending_context, msg = self._pending.popleft()
+                if pending_context == context_id:
+                    self._integrate(context_id, msg)
+                    processed += 1
+                else:
+                    remaining.append((pending_context, msg))
+            self._pending = remaining
+            return processed
+
+        while self._pending and (max_items is None or processed < max_items):
+            pending_context, msg = self._pending.popleft()
+            self._integrate(pending_context, msg)
+            processed += 1
+
+        return processed
+
+    def _integrate(self, context_id: str, msg: MemoryMessage):
+        """Ajoute un message évincé au résumé et à l'index de recherche de son contexte"""
+        self.summaries[context_id].add(msg)
+        if self.relevant_lines > 0:
+            index = self.indexes.get(context_id)
+            if index is None:
+                index = self.indexes[context_id] = HistoryIndex(window=self.index_window)
+            index.add(msg)
+
+    async def run(self, interval: float = 5.0, batch_size: int = 200):
+        """Tâche de fond: met à jour les résumés par petits lots"""
+        while True:
+            try:
+                self.update_summaries(max_items=batch_size)
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la mise à jour des résumés: {e}")
+            await self.memory.clock.sleep(interval)
+
+    def forget(self, context_id: str):
+        """Oublie le résumé et l'index d'un contexte"""
+        self.summaries.pop(context_id, None)
+        self.indexes.pop(context_id, None)
+
+    def search_history(self, context_id: str, message: str, sender: Optional[str] = None) -> List[str]:
+        """Anciennes lignes du contexte les plus pertinentes pour le message (hors mémoire courte)"""
+        index = self.indexes.get(context_id)
+        if index is None:
+            return []
+        return index.search(message, sender=sender, limit=self.relevant_lines, budget=self.search_budget)
+
+    def build(self, target: str, is_private: bool, message: str, sender: Optional[str] = None) -> str:
+        """Construit l'historique: résumé des anciens échanges, anciennes lignes pertinentes + lignes récentes et pertinentes"""
+        context_id = self.memory._get_context_id(target, is_private)
+        lines = list(self.memory.get_formatted_lines(context_id))
+
+        budget = self.max_tokens
+
+        # Résumé des échanges plus anciens (si présent)
+        if any(pending_context == context_id for pending_context, _ in self._pending):
+            self.update_summaries(context_id)
+        summary = self.summaries.get(context_id)
+        summary_text = summary.render(self.summary_tokens) if summary else ""
+        if summary_text:
+            budget -= estimate_tokens(summary_text)
+
+        # Anciennes lignes pertinentes (index BM25), après la place réservée aux derniers messages
+        recalled = []
+        if self.relevant_lines > 0:
+            reserved = sum(estimate_tokens(line) for line in lines[max(0, len(lines) - self.min_recent):])
+            already_shown = summary.last_lines if summary else ()
+            for line in self.search_history(context_id, message, sender):
+                cost = estimate_tokens(line)
+                if line not in already_shown and cost <= budget - reserved:
+                    recalled.append(line)
+                    budget -= cost
+        older = "\n".join(part for part in [summary_text] + recalled if part)
+
+        if not lines:
+            return older
+
+        costs = [estimate_tokens(line) for line in lines]
+        selected = set()
+
+        # Toujours les derniers messages en priorité
+        for index in range(len(lines) - 1, max(len(lines) - 1 - self.min_recent, -1), -1):
+            if costs[index] > budget:
+                break
+            selected.add(index)
+            budget -= costs[index]
+
+        # Puis les lignes plus anciennes, les plus pertinentes et récentes d'abord
+        message_keywords = _keywords(message)
+        candidates = []
+        for index in range(len(lines)):
+            if index in selected:
+                continue
+            overlap = len(message_keywords & _keywords(lines[index])) if message_keywords else 0
+            recency = index / len(lines)
+            candidates.append((overlap * 2 + recency, index))
+
+        for _, index in sorted(candidates, reverse=True):
+            if costs[index] <= budget:
+                selected.add(index)
+                budget -= costs[index]
+
+        history = "\n".join(lines[index] for index in sorted(selected))
+        if older and history:
+            return f"{older}\n---\n{history}"
+        return older or history
@@ -0,0 +1,210 @@
+import logging
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from .memory_store import MemoryMessage
+
+# Entrée d'index: timestamp, position et longueur dans le fichier de données, hash de l'expéditeur
+INDEX_RECORD = struct.Struct("<dQII")
+
+
+def sender_hash(sender: str) -> int:
+    """Hash d'un pseudo (insensible à la casse, comme sur IRC)"""
+    return zlib.crc32(sender.lower().encode("utf-8"))
+
+
+class HistoryArchive:
+    """Archive long terme des messages sortis de la mémoire courte
+
+    Un fichier de données en ajout seul par contexte (une ligne par message:
+    bot, expéditeur, texte) et un index binaire à enregistrements fixes
+    (INDEX_RECORD). Un contexte perd ses messages dans l'ordre chronologique,
+    donc l'index de chaque contexte est trié par temps: les requêtes font une
+    recherche dichotomique dans l'index projeté en mémoire (mmap), filtrent par
+    hash d'expéditeur puis ne lisent que les lignes retenues.
+    """
+
+    def __init__(self, directory: str = "archive", flush_every: int = 64):
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.flush_every = flush_every
+
+        # Messages pas encore écrits: {context_id: [MemoryMessage, ...]}
+        self._buffer: Dict[str, List[MemoryMessage]] = {}
+        self._buffered = 0
+
+        self.archived = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config_data: Optional[Dict] = None) -> 'HistoryArchive':
+        """Crée l'archive depuis la section 'memory.archive' de la config YAML"""
+        config_data = config_data or {}
+        return cls(
+            directory=config_data.get('directory', "archive"),
+            flush_every=config_data.get('flush_every', 64)
+        )
+
+    def _paths(self, context_id: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, quote(context_id, safe=""))
+        return f"{base}.log", f"{base}.idx"
+
+    def append(self, context_id: str, msg: MemoryMessage):
+        """Archive un message (appelé par ConversationMemory quand il sort de la mémoire courte)"""
+        self._buffer.setdefault(context_id, []).append(msg)
+        self._buffered += 1
+        if self._buffered >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Écrit les messages en attente (données puis index, pour qu'un index ne pointe jamais dans le vide)"""
+        buffer, self._buffer = self._buffer, {}
+        self._buffered = 0
+
+        for context_id, messages in buffer.items():
+            data_path, index_path = self._paths(context_id)
+            try:
+                with open(data_path, "ab") as data_file:
+                    offset = data_file.tell()
+                    entries = []
+                    chunks = []
+                    for msg in messages:
+                        text = msg.message.replace("\t", " ").replace("\n", " ")
+                        line = f"{int(msg.is_bot)}\t{msg.sender}\t{text}\n".encode("utf-8")
+                        entries.append(INDEX_RECORD.pack(msg.ts, offset, len(line), sender_hash(msg.sender)))
+                        chunks.append(line)
+                        offset += len(line)
+                    data_file.write(b"".join(chunks))
+
+                with open(index_path, "ab") as index_file:
+                    index_file.write(b"".join(entries))
+                self.archived += len(messages)
+            except OSError as e:
+                self.logger.error(f"Erreur lors de l'archivage de {context_id}: {e}")
+
+    @staticmethod
+    def _first_at_or_after(index: mmap.mmap, count: int, ts: float) -> int:
+        """Premier enregistrement dont le timestamp est >= ts (recherche dichotomique)"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_RECORD.unpack_from(index, middle * INDEX_RECORD.size)[0] < ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _query_context(self, context_id: str, sender: Optional[str], since: Optional[float],
+                       until: Optional[float], limit: int) -> List[MemoryMessage]:
+        data_path, index_path = self._paths(context_id)
+        if not os.path.exists(index_path) or not os.path.exists(data_path):
+            return []
+
+        with open(index_path, "rb") as index_file, open(data_path, "rb") as data_file:
+            count = os.fstat(index_file.fileno()).st_size // INDEX_RECORD.size
+            data_size = os.fstat(data_file.fileno()).st_size
+            if not count or not data_size:
+                return []
+
+            with mmap.mmap(index_file.fileno(), count * INDEX_RECORD.size, access=mmap.ACCESS_READ) as index, \
+                    mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # Ignorer une fin d'écriture interrompue (arrêt brutal)
+                while count:
+                    _, offset, length, _ = INDEX_RECORD.unpack_from(index, (count - 1) * INDEX_RECORD.size)
+                    if offset + length <= data_size:
+                        break
+                    count -= 1
+
+                start = self._first_at_or_after(index, count, since) if since is not None else 0
+                end = self._first_at_or_after(index, count, until) if until is not None else count
+                wanted_hash = sender_hash(sender) if sender is not None else None
+                wanted_sender = sender.lower() if sender is not None else None
+
+                # Du plus récent au plus ancien, jusqu'à la limite
+                results = []
+                for position in range(end - 1, start - 1, -1):
+                    ts, offset, length, record_hash = INDEX_RECORD.unpack_from(index, position * INDEX_RECORD.size)
+                    if wanted_hash is not None and record_hash != wanted_hash:
+                        continue
+                    fields = data[offset:offset + length].decode("utf-8", "replace").rstrip("\n").split("\t", 2)
+                    if len(fields) != 3:
+                        continue
+                    is_bot, record_sender, text = fields
+                    if wanted_sender is not None and record_sender.lower() != wanted_sender:
+                        continue
+                    results.append(MemoryMessage(ts, record_sender, text, is_bot == "1"))
+                    if len(results) >= limit:
+                        break
+
+        results.reverse()
+        return results
+
+    def iter_messages(self) -> Iterator[Tuple[str, MemoryMessage]]:
+        """Tous les messages archivés, contexte par contexte, en flux (mémoire constante)"""
+        for context_id in self.contexts():
+            data_path, index_path = self._paths(context_id)
+            try:
+                with open(index_path, "rb") as index_file, open(data_path, "rb") as data_file:
+                    data_size = os.fstat(data_file.fileno()).st_size
+                    for record in iter(lambda: index_file.read(INDEX_RECORD.size), b""):
+                        if len(record) < INDEX_RECORD.size:
+                            break
+                        ts, offset, length, _ = INDEX_RECORD.unpack(record)
+                        if offset + length > data_size:
+                            break
+                        data_file.seek(offset)
+                        fields = data_file.read(length).decode("utf-8", "replace").rstrip("\n").split("\t", 2)
+                        if len(fields) == 3:
+                            yield context_id, MemoryMessage(ts, fields[1], fields[2], fields[0] == "1")
+            except OSError as e:
+                self.logger.error(f"Erreur lors de la lecture de l'archive {context_id}: {e}")
+
+    def contexts(self) -> List[str]:
+        """Contextes présents dans l'archive"""
+        return sorted(unquote(name[:-4]) for name in os.listdir(self.directory) if name.endswith(".idx"))
+
+    def query(self, context_id: Optional[str] = None, sender: Optional[str] = None,
+              since: Optional[datetime] = None, until: Optional[datetime] = None,
+              limit: int = 100) -> List[Tuple[str, MemoryMessage]]:
+        """Messages archivés (contexte et/ou expéditeur, entre since et until), les plus récents en dernier"""
+        self.flush()
+        since_ts = since.timestamp() if since else None
+        until_ts = until.timestamp() if until else None
+
+        context_ids = [context_id] if context_id is not None else self.contexts()
+        results = []
+        for archived_context in context_ids:
+            try:
+                messages = self._query_context(archived_context, sender, since_ts, until_ts, limit)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Erreur lors de la lecture de l'archive {archived_context}: {e}")
+                continue
+            results.extend((archived_context, msg) for msg in messages)
+
+        results.sort(key=lambda item: item[1].ts)
+        return results[-limit:]
+
+    def size_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "archived": self.archived,
+            "buffered": self._buffered,
+            "size_bytes": self.size_bytes(),
+        }
+
+    def clear(self):
+        self._buffer, self._buffered = {}, 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith((".log", ".idx")):
+                os.remove(entry.path)
+        self.logger.info(f"Archive {self.directory} effacée")
+
+    def close(self):
+        self.flush()
@@ -1,36 +1,133 @@
-import random
 import re
-import openai
+import random
 import logging
-from typing import Optional, List
+from typing import Dict, Optional, List
 from .memory_manager import ConversationMemory
-from .personality import PersonalityManager
+from .memory_store import create_memory_store
+from .history_archive import HistoryArchive
+from .user_facts import create_shared_user_facts
+from .personality import PersonalityManager, PersonalityProfile
+from .retrieval_engine import RetrievalEngine
+from .context_builder import ContextBuilder
+from .ai_gateway import AIGateway, create_shared_gateway
+from .rng import make_rng
+from .clock import Clock, REAL_CLOCK
+from .response_pool import ResponsePool
+from .latency import LatencyRecorder
 
 class HumanResponseGenerator:
     """Générateur de réponses humaines avec fautes et imperfections"""
     
-    def __init__(self, config=None):
+    INTERRUPTION_PROBABILITY = 0.008  # 0.8% de chance
+    QUESTION_PROBABILITY = 0.02       # 2% pour éviter le spam
+    # L'humeur affecte la vitesse de frappe (1.0 pour les autres humeurs)
+    MOOD_TYPING_MODIFIERS = {
+        "excited": 1.3,  # Tape vite quand excité
+        "tired": 0.7,    # Tape lent quand fatigué
+        "bad": 0.8,      # Un peu plus lent si mauvaise humeur
+    }
+    
+    def __init__(self, config=None, ai_gateway: Optional[AIGateway] = None, clock: Optional[Clock] = None,
+                 warm_state: Optional[Dict] = None):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.clock = clock or REAL_CLOCK
+        
+        # Mesure des latences par étape (désactivée par défaut, coût quasi nul)
+        monitoring_config = (config.monitoring_config if config else None) or {}
+        self.latency = LatencyRecorder(enabled=monitoring_config.get('latency', False))
+        self.last_branch: Optional[str] = None
+        
+        # Flux aléatoires propres à cette persona (reproductibles si une graine est configurée)
+        seed = config.seed if config else None
+        persona = config.nickname if config else "Bot"
+        self.rng = make_rng(seed, persona, "generator")
         
         # Initialiser la mémoire conversationnelle
-        self.memory = ConversationMemory()
+        memory_config = (config.memory_config if config else None) or {}
+        shared_config = memory_config.get('shared_users') or {}
+        shared_facts = None
+        if shared_config.get('enabled', False):
+            # Faits utilisateur communs à toutes les personas du réseau
+            shared_facts = create_shared_user_facts(shared_config, network=config.server if config else "",
+                                                    clock=self.clock)
+        store = create_memory_store(memory_config, clock=self.clock)
+        # Limites de la mémoire vive seulement si le stockage peut relire ce qui a été évincé
+        self.memory = ConversationMemory(
+            rng=make_rng(seed, persona, "memory"),
+            clock=self.clock,
+            store=store,
+            background_save=memory_config.get('background_save', True),
+            save_delay=memory_config.get('save_delay', 2.0),
+            max_age_days=memory_config.get('max_age_days', 7),
+            max_contexts=memory_config.get('max_contexts', 2000 if store.can_reload else None),
+            max_users=memory_config.get('max_users', 10000 if store.can_reload else None),
+            fresh=warm_state is None,
+            shared_facts=shared_facts
+        )
+        
+        # Redémarrage à chaud: instantané de la mémoire vive s'il est présent, sinon le stockage
+        if warm_state:
+            if warm_state.get("memory"):
+                self.memory.restore_state(warm_state["memory"])
+            else:
+                self.memory.load_memory()
+        
+        # Archive long terme des messages sortis de la mémoire courte (optionnelle)
+        archive_config = memory_config.get('archive') or {}
+        self.archive = HistoryArchive.from_config(archive_config) if archive_config.get('enabled', False) else None
+        if self.archive:
+            self.memory.eviction_listeners.append(self.archive.append)
+        
+        # Historique pour l'IA dans un budget de tokens, avec résumé et recherche dans les échanges plus anciens
+        search_config = (config.ai_history_search if config else None) or {}
+        self.context_builder = ContextBuilder(
+            self.memory,
+            max_tokens=config.ai_max_context_tokens if config else 400,
+            relevant_lines=search_config.get('max_lines', 3),
+            index_window=search_config.get('window', 500),
+            search_budget=search_config.get('budget_us', 200) / 1_000_000
+        )
         
         # Initialiser la personnalité
         personality_config = config.personality_config if config else None
-        self.personality = PersonalityManager(config_data=personality_config)
-        self.logger.info(f"Personnalité générée: {self.personality.profile.name}, {self.personality.profile.age} ans, {self.personality.profile.location['city']}")
+        if warm_state:
+            # Redémarrage à chaud: même profil et même humeur qu'avant l'arrêt
+            self.personality = PersonalityManager(custom_profile=PersonalityProfile(**warm_state["profile"]),
+                                                  rng=make_rng(seed, persona, "personality"))
+        else:
+            self.personality = PersonalityManager(config_data=personality_config, rng=make_rng(seed, persona, "personality"))
+        self.logger.info(f"Personnalité {'reprise' if warm_state else 'générée'}: {self.personality.profile.name}, {self.personality.profile.age} ans, {self.personality.profile.location['city']}")
         
-        # Initialiser OpenAI si une clé API est fournie
-        if config and config.ai_api_key:
-            self.client = openai.AsyncOpenAI(api_key=config.ai_api_key)
+        # Initialiser OpenAI si une clé API est fournie (passerelle partagée possible entre personas)
+        if ai_gateway:
+            self.ai_gateway = ai_gateway
+            self.client = ai_gateway.client
+            self.use_ai = True
+            self.logger.info("Passerelle IA partagée")
+        elif config and config.ai_api_key:
+            # Même clé et même modèle: une seule passerelle par processus, sinon rien à regrouper
+            self.ai_gateway = create_shared_gateway(config.ai_api_key, config.ai_model, config.ai_batching)
+            self.client = self.ai_gateway.client
             self.use_ai = True
             self.logger.info("API OpenAI configurée")
         else:
             self.client = None
+            self.ai_gateway = None
             self.use_ai = False
             self.logger.info("Utilisation des réponses prédéfinies")
         
+        # Moteur de réponses par recherche dans un corpus d'échanges réels (optionnel)
+        retrieval_config = config.retrieval_config if config else None
+        if retrieval_config and retrieval_config.get('enabled', True):
+            self.retrieval = RetrievalEngine.from_config(retrieval_config, rng=make_rng(seed, persona, "retrieval"))
+            self.logger.info(f"Moteur de recherche de réponses configuré ({self.retrieval.total_pairs} paires)")
+        else:
+            self.retrieval = None
+        
+        # Prompt système mis en cache: (signature de la personnalité, texte)
+        self._system_prompt_cache = None
+        
         # Réponses de base pour la démonstration et fallback
         self.casual_responses = [
             "ah ok je vois",
@@ -115,6 +212,12 @@ class HumanResponseGenerator:
             "bjr tout le monde",
         ]
         
+        # Réserve de réponses prédéfinies préparées pendant les temps morts (optionnelle)
+        self.last_activity = self.clock.monotonic()
+        self.response_pool = None
+        if config and config.warm_pool:
+            self.response_pool = ResponsePool(self, rng=make_rng(seed, persona, "response_pool"))
+        
         # Fautes de frappe courantes
         self.typo_replacements = {
             'que': ['ke', 'qu'],
@@ -142,6 +245,9 @@ class HumanResponseGenerator:
     async def generate_response(self, message: str, sender: str, target: str, is_mentioned: bool = False) -> Optional[str]:
         """Génère une réponse humaine basée sur le message reçu"""
         message_lower = message.lower()
+        self.last_activity = self.clock.monotonic()
+        self.last_branch = None
+        latency = self.latency
         
         # Ignorer les messages du bot, les commandes, et les réactions IRC
         if message.startswith('!') or message.startswith('/') or 'REACT' in message:
@@ -149,94 +255,99 @@ class HumanResponseGenerator:
         
         # Récupérer contexte récent pour détecter ambiances tendues
         is_private = not target.startswith('#')
-        recent_history = self.memory.get_context_history(target, is_private, limit=5)
-        recent_context = " ".join([msg["message"] for msg in recent_history[-3:]])
+        # Contexte et auteur évincés de la mémoire vive: relus hors de la boucle asyncio
+        await self.memory.preload(target, is_private, (sender,))
+        with latency.span("generate.context"):
+            recent_history = self.memory.get_context_history(target, is_private, limit=5)
+            recent_context = " ".join([msg.message for msg in recent_history[-3:]])
         
         # Parfois ne pas répondre du tout (simulation d'inattention) - mais pas si mentionné
-        if not is_mentioned and random.random() < 0.2:
+        if not is_mentioned and self.rng.random() < 0.2:
             return None
         
         # Déterminer si c'est un message privé
         is_private = not target.startswith('#')
         
-        # Ajouter le message à la mémoire
-        self.memory.add_message(target, sender, message, is_private)
+        with latency.span("generate.memory"):
+            # Apprendre l'échange réel (message précédent d'un autre → ce message)
+            if self.retrieval and recent_history:
+                previous = recent_history[-1]
+                if previous.sender != sender and not previous.is_bot:
+                    self.retrieval.add_pair(previous.message, message)
+            
+            # Ajouter le message à la mémoire
+            self.memory.add_message(target, sender, message, is_private)
         
         # Chance de salut personnalisé (5% si pas mentionné, 20% si mentionné)  
         greeting_chance = 0.2 if is_mentioned else 0.05
-        if random.random() < greeting_chance:
-            friendly_greeting = self.memory.get_friendly_greeting(sender)
+        if self.rng.random() < greeting_chance:
+            with latency.span("detect.friendly_greeting"):
+                friendly_greeting = self.memory.get_friendly_greeting(sender)
             if friendly_greeting:
-                final_greeting = self.personality.adapt_response_style(friendly_greeting)
-                final_greeting = self.personality.adapt_response_with_mood(final_greeting)
-                final_greeting = self._add_human_touches(final_greeting, recent_context)
-                self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                      final_greeting, is_private, is_bot=True)
-                return final_greeting
+                final_greeting = self._style_canned(friendly_greeting, recent_context)
+                return self._remember_reply(target, final_greeting, is_private, "friendly_greeting")
         
         # Réponse spéciale si mentionné (priorité)
         if is_mentioned:
-            mention_response = self._get_mention_response(message, sender)
+            with latency.span("detect.mention"):
+                mention_response = self._get_mention_response(message, sender)
             if mention_response:
-                final_response = self.personality.adapt_response_style(mention_response)
-                final_response = self.personality.adapt_response_with_mood(final_response)
-                final_response = self._add_human_touches(final_response, recent_context)
-                self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                      final_response, is_private, is_bot=True)
-                return final_response
+                final_response = self._style_canned(mention_response, recent_context)
+                return self._remember_reply(target, final_response, is_private, "mention")
         
         # Réaction contextuelle rapide (priorité haute)
-        contextual_reaction = self._get_contextual_reaction(message)
+        with latency.span("detect.reaction"):
+            contextual_reaction = self._get_contextual_reaction(message)
         if contextual_reaction:
-            final_reaction = self.personality.adapt_response_style(contextual_reaction)
-            final_reaction = self.personality.adapt_response_with_mood(final_reaction)
-            final_reaction = self._add_human_touches(final_reaction, recent_context)
-            self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                  final_reaction, is_private, is_bot=True)
-            return final_reaction
+            final_reaction = self._take_canned(f"reaction:{contextual_reaction}", contextual_reaction, recent_context)
+            return self._remember_reply(target, final_reaction, is_private, "reaction")
         
         # Traitement spécial des messages privés
         if is_private:
-            private_response = self._handle_private_message(message, sender)
+            with latency.span("detect.private"):
+                private_response = self._handle_private_message(message, sender)
             if private_response:
-                final_response = self.personality.adapt_response_style(private_response)
-                final_response = self.personality.adapt_response_with_mood(final_response)
-                final_response = self._add_human_touches(final_response, recent_context)
-                self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                      final_response, is_private, is_bot=True)
-                return final_response
+                final_response = self._style_canned(private_response, recent_context)
+                return self._remember_reply(target, final_response, is_private, "private")
         
         # Vérifier les questions de géolocalisation (priorité haute)
-        location_response = self.personality.should_respond_to_location_question(message)
+        with latency.span("detect.location"):
+            location_response = self.personality.should_respond_to_location_question(message)
         if location_response:
             # Adapter selon la personnalité et ajouter à la mémoire
-            final_response = self.personality.adapt_response_style(location_response)
-            final_response = self._add_human_touches(final_response)
-            self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                  final_response, is_private, is_bot=True)
-            return final_response
+            with latency.span("styling"):
+                final_response = self.personality.adapt_response_style(location_response)
+                final_response = self._add_human_touches(final_response)
+            return self._remember_reply(target, final_response, is_private, "location")
         
         # Vérifier les questions d'âge
-        age_response = self.personality.get_age_appropriate_response(message)
+        with latency.span("detect.age"):
+            age_response = self.personality.get_age_appropriate_response(message)
         if age_response:
-            final_response = self.personality.adapt_response_style(age_response)
-            final_response = self._add_human_touches(final_response)
-            self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                  final_response, is_private, is_bot=True)
-            return final_response
+            with latency.span("styling"):
+                final_response = self.personality.adapt_response_style(age_response)
+                final_response = self._add_human_touches(final_response)
+            return self._remember_reply(target, final_response, is_private, "age")
+        
+        # Réponse trouvée dans le corpus d'échanges réels (sans réseau)
+        if self.retrieval:
+            with latency.span("retrieval"):
+                retrieved_response = self.retrieval.find_reply(message)
+            if retrieved_response:
+                with latency.span("styling"):
+                    final_response = self.personality.adapt_response_style(retrieved_response)
+                    final_response = self._add_human_touches(final_response, recent_context)
+                return self._remember_reply(target, final_response, is_private, "retrieval")
         
         # Utiliser l'IA si disponible, sinon les réponses prédéfinies
         if self.use_ai:
             try:
-                ai_response = await self._get_ai_response(message, sender, target, is_private)
+                with latency.span("ai"):
+                    ai_response = await self._get_ai_response(message, sender, target, is_private)
                 if ai_response:
                     # Adapter selon la personnalité, humeur et ajouter à la mémoire
-                    human_response = self.personality.adapt_response_style(ai_response)
-                    human_response = self.personality.adapt_response_with_mood(human_response)
-                    human_response = self._add_human_touches(human_response, recent_context)
-                    self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                          human_response, is_private, is_bot=True)
-                    return human_response
+                    human_response = self._style_canned(ai_response, recent_context)
+                    return self._remember_reply(target, human_response, is_private, "ai")
             except Exception as e:
                 self.logger.error(f"Erreur API IA: {e}")
                 # Fallback vers réponses prédéfinies
@@ -245,90 +356,68 @@ class HumanResponseGenerator:
         # Détection de salutations
         greetings_keywords = ['salut', 'hello', 'bonjour', 'bonsoir', 'coucou', 'hi', 'hey']
         if any(greeting in message_lower for greeting in greetings_keywords):
-            response = random.choice(self.personality.profile.greetings)
+            response = self.rng.choice(self.personality.profile.greetings)
             if sender:
                 response += f" {sender}"
-            # Appliquer personnalité + humeur + touches humaines
-            response = self.personality.adapt_response_style(response)
-            response = self.personality.adapt_response_with_mood(response)
-            response = self._add_human_touches(response, recent_context)
-            self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                                  response, is_private, is_bot=True)
-            return response
+            # Appliquer personnalité + humeur + touches humaines (pseudo compris, jamais préparé à l'avance)
+            response = self._style_canned(response, recent_context)
+            return self._remember_reply(target, response, is_private, "canned")
         
         # Détection de questions
         if '?' in message or any(word in message_lower for word in ['comment', 'pourquoi', 'quand', 'où', 'qui', 'quoi']):
-            base_response = random.choice(self.question_responses)
+            kind, responses = "question", self.question_responses
         else:
-            base_response = random.choice(self.casual_responses)
-        
-        # Appliquer personnalité + humeur + touches humaines
-        response = self.personality.adapt_response_style(base_response)
-        response = self.personality.adapt_response_with_mood(response)
-        response = self._add_human_touches(response, recent_context)
+            kind, responses = "casual", self.casual_responses
         
-        # Ajouter à la mémoire
-        self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
-                              response, is_private, is_bot=True)
+        # Variante déjà préparée, sinon personnalité + humeur + touches humaines
+        response = self.response_pool.take(kind, recent_context) if self.response_pool else None
+        if not response:
+            response = self._style_canned(self.rng.choice(responses), recent_context)
         
+        return self._remember_reply(target, response, is_private, "canned")
+    
+    def _remember_reply(self, target: str, response: str, is_private: bool, branch: str) -> str:
+        """Ajoute la réponse du bot à la mémoire et note la branche qui l'a produite"""
+        self.last_branch = branch
+        with self.latency.span("generate.memory"):
+            self.memory.add_message(target, self.config.nickname if self.config else "Bot", 
+                                  response, is_private, is_bot=True)
         return response
     
     async def _get_ai_response(self, message: str, sender: str, target: str, is_private: bool) -> Optional[str]:
         """Génère une réponse via l'API OpenAI"""
         try:
-            # Récupérer l'historique de la conversation
-            context_history = self.memory.format_history_for_ai(target, is_private, limit=6)
+            # Récupérer l'historique de la conversation (récent + pertinent, dans le budget de tokens)
+            context_history = self.context_builder.build(target, is_private, message, sender)
             
             # Analyser la personnalité de l'utilisateur
             user_personality = self.memory.get_user_personality(sender)
             
-            # Construire le prompt avec contexte et personnalité
+            # Préfixe stable (mis en cache) puis parties variables à la fin
             context_type = "conversation privée" if is_private else f"salon {target}"
-            personality_context = self.personality.get_personality_context()
             
-            system_prompt = f"""Tu es un utilisateur IRC réel. Voici ta personnalité:
-
-{personality_context}
-
-Tu participes à une {context_type} et réponds naturellement.
-- Utilise un langage simple, familier, avec parfois du langage SMS
-- Reste bref (max 1-2 phrases) 
-- Sois humain et spontané selon ta personnalité
-- Ne sois pas trop poli ou formel
-- Tiens compte de l'historique pour répondre de manière cohérente
-- Si on te demande ton âge, ta ville, tes goûts, réponds selon ta personnalité
-- Adapte ton niveau de langage selon ton score de décontraction
-- IMPORTANT: Ne commence JAMAIS ton message par ton propre pseudo (ex: "Camille_42:"), écris directement ton message"""
-            
-            # Construire les messages avec historique
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Ajouter l'historique si disponible
+            user_content = f"{self.personality.get_mood_context()}\nTu participes à une {context_type}.\n\n"
             if context_history:
-                messages.append({
-                    "role": "user", 
-                    "content": f"Historique récent:\n{context_history}\n\n---\nNouveau message de {sender}: {message}"
-                })
+                user_content += f"Historique récent:\n{context_history}\n\n---\nNouveau message de {sender}: {message}"
             else:
-                messages.append({
-                    "role": "user", 
-                    "content": f"Message de {sender}: {message}"
-                })
+                user_content += f"Message de {sender}: {message}"
             
             # Ajouter info sur la personnalité de l'utilisateur si disponible
             if user_personality and user_personality.get("total_messages", 0) > 3:
                 casualness = user_personality.get("casualness_score", 0)
                 if casualness > 0.3:
-                    messages[0]["content"] += f"\n\nNote: {sender} utilise un style décontracté avec des abréviations."
+                    user_content += f"\n\nNote: {sender} utilise un style décontracté avec des abréviations."
+            
+            messages = [
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": user_content}
+            ]
             
-            response = await self.client.chat.completions.create(
-                model=self.config.ai_model if self.config else "gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=120,
-                temperature=0.9
-            )
+            ai_text = await self.ai_gateway.complete(messages, max_tokens=120, temperature=0.9)
+            if not ai_text:
+                return None
             
-            ai_text = response.choices[0].message.content.strip()
+            ai_text = ai_text.strip()
             
             # Supprimer le pseudo si l'IA l'ajoute par erreur
             nickname = self.config.nickname if self.config else "Bot"
@@ -347,14 +436,61 @@ Tu participes à une {context_type} et réponds naturellement.
             self.logger.error(f"Erreur lors de l'appel à l'API OpenAI: {e}")
             return None
     
-    def _add_human_touches(self, text: str, recent_context: str = "") -> str:
+    def _get_system_prompt(self) -> str:
+        """Retourne le prompt système, identique octet pour octet tant que la personnalité ne change pas"""
+        signature = self.personality.get_profile_signature()
+        if self._system_prompt_cache and self._system_prompt_cache[0] == signature:
+            return self._system_prompt_cache[1]
+        
+        personality_context = self.personality.get_personality_context()
+        
+        system_prompt = f"""Tu es un utilisateur IRC réel. Voici ta personnalité:
+
+{personality_context}
+
+Tu participes à des conversations IRC et réponds naturellement.
+- Utilise un langage simple, familier, avec parfois du langage SMS
+- Reste bref (max 1-2 phrases) 
+- Sois humain et spontané selon ta personnalité
+- Ne sois pas trop poli ou formel
+- Tiens compte de l'historique pour répondre de manière cohérente
+- Si on te demande ton âge, ta ville, tes goûts, réponds selon ta personnalité
+- Adapte ton niveau de langage selon ton score de décontraction
+- IMPORTANT: Ne commence JAMAIS ton message par ton propre pseudo (ex: "Camille_42:"), écris directement ton message"""
+        
+        self._system_prompt_cache = (signature, system_prompt)
+        return system_prompt
+    
+    def _style_canned(self, text: str, recent_context: str = "", mood: Optional[str] = None,
+                      rng: Optional[random.Random] = None) -> str:
+        """Applique personnalité + humeur + touches humaines à une réponse prédéfinie"""
+        rng = rng or self.rng
+        with self.latency.span("styling"):
+            result = self.personality.adapt_response_style(text, rng)
+            result = self.personality.adapt_response_with_mood(result, mood, rng)
+            return self._add_human_touches(result, recent_context, rng)
+    
+    def _take_canned(self, key: str, text: str, recent_context: str = "") -> str:
+        """Variante préparée d'une réponse prédéfinie si disponible, sinon stylisée maintenant"""
+        if self.response_pool:
+            ready = self.response_pool.take(key, recent_context)
+            if ready:
+                return ready
+        return self._style_canned(text, recent_context)
+    
+    def _is_tense(self, text: str) -> bool:
+        """Détecte un contexte tendu/conflictuel"""
+        tense_keywords = ["grillé", "griller", "accuse", "menteur", "fake", "bot", "faux", "arnaque", "suspect", "attention", "méfie"]
+        text_lower = text.lower()
+        return any(keyword in text_lower for keyword in tense_keywords)
+    
+    def _add_human_touches(self, text: str, recent_context: str = "", rng: Optional[random.Random] = None) -> str:
         """Ajoute des imperfections humaines au texte"""
+        rng = rng or self.rng
         result = text
         
         # Détecter contexte tendu/conflictuel pour adapter le style
-        tense_keywords = ["grillé", "griller", "accuse", "menteur", "fake", "bot", "faux", "arnaque", "suspect", "attention", "méfie"]
-        is_tense_context = any(keyword in text.lower() for keyword in tense_keywords) or \
-                          any(keyword in recent_context.lower() for keyword in tense_keywords)
+        is_tense_context = self._is_tense(text) or self._is_tense(recent_context)
         
         # Si contexte tendu, réduire les touches joyeuses
         if is_tense_context:
@@ -362,60 +498,61 @@ Tu participes à une {context_type} et réponds naturellement.
             return result
         
         # Appliquer des fautes de frappe aléatoires (plus fréquent pour naturel)
-        if random.random() < 0.4:  # 40% de chance d'avoir des fautes
-            result = self._apply_typos(result)
+        if rng.random() < 0.4:  # 40% de chance d'avoir des fautes
+            result = self._apply_typos(result, rng)
         
         # Appliquer style SMS/IRC agressif (abréviations)
-        if random.random() < 0.6:  # 60% de chance d'abréger
-            result = self._apply_sms_abbreviations(result)
+        if rng.random() < 0.6:  # 60% de chance d'abréger
+            result = self._apply_sms_abbreviations(result, rng)
         
         # Parfois oublier une majuscule en début de phrase
-        if random.random() < 0.6:
+        if rng.random() < 0.6:
             result = result[0].lower() + result[1:] if len(result) > 1 else result.lower()
         
         # Suppression ponctuation excessive (style IRC naturel)
-        if random.random() < 0.6 and result.endswith(('.', '!', '?')):
+        if rng.random() < 0.6 and result.endswith(('.', '!', '?')):
             result = result[:-1]
         
         # Suppression spécifique points d'interrogation (très courant sur IRC)
-        if random.random() < 0.5:
+        if rng.random() < 0.5:
             result = result.replace('?', '')
         
         # Ajouter parfois des points de suspension
-        if random.random() < 0.2:
+        if rng.random() < 0.2:
             result += "..."
         
         # Parfois simuler une auto-correction
-        if random.random() < 0.05:
+        if rng.random() < 0.05:
             corrections = [
                 "*correction", "*enfin", "*je veux dire", "*pardon"
             ]
-            result += " " + random.choice(corrections)
+            result += " " + rng.choice(corrections)
         
         # Ajouter parfois des répétitions de lettres
-        if random.random() < 0.15:
-            result = self._add_letter_repetitions(result)
+        if rng.random() < 0.15:
+            result = self._add_letter_repetitions(result, rng)
         
         # Parfois ajouter des hésitations et pensées
-        if random.random() < 0.15:
+        if rng.random() < 0.15:
             hesitations = ['euh', 'hmm', 'bah', 'ben', 'alors...', 'voyons...', 'attends...', 'heuuu']
-            hesitation = random.choice(hesitations)
-            if random.random() < 0.5:
+            hesitation = rng.choice(hesitations)
+            if rng.random() < 0.5:
                 result = hesitation + " " + result
             else:
                 result = result + " " + hesitation
         
         return result
     
-    def _apply_typos(self, text: str) -> str:
+    def _apply_typos(self, text: str, rng: Optional[random.Random] = None) -> str:
         """Applique des fautes de frappe courantes"""
+        rng = rng or self.rng
         result = text
         
         for correct, typos in self.typo_replacements.items():
             if correct in result.lower():
                 # Probabilité d'appliquer la faute
-                if random.random() < 0.5:
-                    typo = random.choice(typos)
+                if rng.random() < 0.5:
+                    typo = rng.choice(typos)
                     # Conserver la casse
                     if correct in result:
                         result = result.replace(correct, typo)
@@ -426,15 +563,16 @@ Tu participes à une {context_type} et réponds naturellement.
         
         return result
     
-    def _add_letter_repetitions(self, text: str) -> str:
+    def _add_letter_repetitions(self, text: str, rng: Optional[random.Random] = None) -> str:
         """Ajoute des répétitions de lettres (ex: ouaaaai)"""
+        rng = rng or self.rng
         # Lettres pouvant être répétées
         repeatable = ['a', 'e', 'i', 'o', 'u', 'h']
         
         for i, char in enumerate(text.lower()):
-            if char in repeatable and random.random() < 0.3:
+            if char in repeatable and rng.random() < 0.3:
                 # Répéter 1 à 3 fois
-                repetitions = random.randint(1, 3)
+                repetitions = rng.randint(1, 3)
                 text = text[:i+1] + char * repetitions + text[i+1:]
                 break  # Une seule répétition par message
         
@@ -491,26 +629,26 @@ Tu participes à une {context_type} et réponds naturellement.
         # Vérifier les mots-clés négatifs
         for keyword, reactions in negative_keywords.items():
             if keyword in message_lower:
-                if random.random() < 0.4:  # 40% de chance de réagir
-                    return random.choice(reactions)
+                if self.rng.random() < 0.4:  # 40% de chance de réagir
+                    return self.rng.choice(reactions)
         
         # Vérifier les mots-clés positifs  
         for keyword, reactions in positive_keywords.items():
             if keyword in message_lower:
-                if random.random() < 0.35:  # 35% de chance de réagir
-                    return random.choice(reactions)
+                if self.rng.random() < 0.35:  # 35% de chance de réagir
+                    return self.rng.choice(reactions)
         
         # Vérifier les mots-clés de surprise
         for keyword, reactions in surprise_keywords.items():
             if keyword in message_lower:
-                if random.random() < 0.3:  # 30% de chance de réagir
-                    return random.choice(reactions)
+                if self.rng.random() < 0.3:  # 30% de chance de réagir
+                    return self.rng.choice(reactions)
         
         # Vérifier les mots-clés d'accord/désaccord
         for keyword, reactions in agreement_keywords.items():
             if keyword in message_lower:
-                if random.random() < 0.25:  # 25% de chance de réagir
-                    return random.choice(reactions)
+                if self.rng.random() < 0.25:  # 25% de chance de réagir
+                    return self.rng.choice(reactions)
         
         return None
     
@@ -520,14 +658,14 @@ Tu participes à une {context_type} et réponds naturellement.
             return 0.1
             
         # Vitesse de lecture (mots par seconde)
-        reading_speed = random.uniform(3.0, 6.0)  # 3-6 mots/sec
+        reading_speed = self.rng.uniform(3.0, 6.0)  # 3-6 mots/sec
         word_count = len(incoming_message.split())
         
         # Délai minimum pour "traiter" le message
         base_reading_time = word_count / reading_speed
         
         # Ajouter temps de "réflexion"
-        thinking_time = random.uniform(0.3, 1.5)
+        thinking_time = self.rng.uniform(0.3, 1.5)
         
         # Délai total de lecture + réflexion
         total_delay = base_reading_time + thinking_time
@@ -542,7 +680,7 @@ Tu participes à une {context_type} et réponds naturellement.
         # Vitesse de frappe simulée (caractères par seconde)
         # Utilisateurs moyens : 3-5 caractères/seconde
         # Plus lent sur mobile, plus rapide si habitué au clavier
-        base_typing_speed = random.uniform(3.0, 5.5)  # chars/sec
+        base_typing_speed = self.rng.uniform(3.0, 5.5)  # chars/sec
         
         # Facteur selon la personnalité
         if hasattr(self, 'personality') and self.personality:
@@ -557,14 +695,7 @@ Tu participes à une {context_type} et réponds naturellement.
                 age_modifier = 0.9  # -10% plus lent
                 
             # L'humeur affecte la vitesse
-            mood = self.personality.profile.current_mood
-            mood_modifier = 1.0
-            if mood == "excited":
-                mood_modifier = 1.3  # Tape vite quand excité
-            elif mood == "tired":
-                mood_modifier = 0.7  # Tape lent quand fatigué
-            elif mood == "bad":
-                mood_modifier = 0.8  # Un peu plus lent si mauvaise humeur
+            mood_modifier = self.MOOD_TYPING_MODIFIERS.get(self.personality.profile.current_mood, 1.0)
                 
             base_typing_speed *= geek_modifier * age_modifier * mood_modifier
         
@@ -574,14 +705,14 @@ Tu participes à une {context_type} et réponds naturellement.
         
         # Ajouter des pauses de réflexion pour les messages longs
         if char_count > 50:
-            thinking_pause = random.uniform(1.0, 3.0)
+            thinking_pause = self.rng.uniform(1.0, 3.0)
             base_delay += thinking_pause
         elif char_count > 20:
-            thinking_pause = random.uniform(0.5, 1.5)  
+            thinking_pause = self.rng.uniform(0.5, 1.5)  
             base_delay += thinking_pause
         
         # Variation aléatoire (+/-30%)
-        variation = random.uniform(0.7, 1.3)
+        variation = self.rng.uniform(0.7, 1.3)
         final_delay = base_delay * variation
         
         # Délai minimum et maximum raisonnables
@@ -631,14 +762,14 @@ Tu participes à une {context_type} et réponds naturellement.
             mood_responses = direct_responses.copy()
         
         # Utiliser les réponses selon l'humeur 70% du temps, sinon réponses directes
-        if random.random() < 0.7 and mood != "neutral":
+        if self.rng.random() < 0.7 and mood != "neutral":
             responses = mood_responses
         else:
             responses = direct_responses
         
         # Parfois ajouter le nom de l'expéditeur (30% du temps)
-        response = random.choice(responses)
-        if random.random() < 0.3 and sender:
+        response = self.rng.choice(responses)
+        if self.rng.random() < 0.3 and sender:
             # Variations avec le nom
             name_variations = [
                 f"{response} {sender}",
@@ -646,13 +777,13 @@ Tu participes à une {context_type} et réponds naturellement.
                 f"{sender} ? {response.lower()}",
                 f"Hey {sender}, {response.lower()}"
             ]
-            response = random.choice(name_variations)
+            response = self.rng.choice(name_variations)
         
         return response
     
     def get_spontaneous_interruption(self) -> Optional[str]:
         """Génère des interruptions/distractions spontanées"""
-        if random.random() > 0.008:  # 0.8% de chance
+        if self.rng.random() > self.INTERRUPTION_PROBABILITY:
             return None
             
         interruptions = [
@@ -667,7 +798,7 @@ Tu participes à une {context_type} et réponds naturellement.
             "ah c'est l'heure de manger"
         ]
         
-        return random.choice(interruptions)
+        return self.rng.choice(interruptions)
 
     def get_spontaneous_question(self, target: str) -> Optional[str]:
         """Génère une question spontanée pour relancer la conversation"""
@@ -675,8 +806,8 @@ Tu participes à une {context_type} et réponds naturellement.
         if not target.startswith('#'):
             return None
             
-        # Très faible probabilité (2%) pour éviter le spam
-        if random.random() > 0.02:
+        # Très faible probabilité pour éviter le spam
+        if self.rng.random() > self.QUESTION_PROBABILITY:
             return None
             
         profile = self.personality.profile if self.personality else None
@@ -768,8 +899,7 @@ Tu participes à une {context_type} et réponds naturellement.
             ]
         
         # Questions selon l'heure
-        from datetime import datetime
-        now = datetime.now()
+        now = self.clock.now()
         time_questions = []
         
         if 6 <= now.hour <= 10:
@@ -809,19 +939,19 @@ Tu participes à une {context_type} et réponds naturellement.
         all_questions = general_questions[:]
         
         # Ajouter questions selon intérêts (30% de chance)
-        if interest_questions and random.random() < 0.3:
+        if interest_questions and self.rng.random() < 0.3:
             for questions_list in interest_questions.values():
                 all_questions.extend(questions_list)
         
         # Ajouter questions selon humeur (40% de chance)  
-        if mood_questions and random.random() < 0.4:
+        if mood_questions and self.rng.random() < 0.4:
             all_questions.extend(mood_questions)
         
         # Ajouter questions selon heure (50% de chance)
-        if time_questions and random.random() < 0.5:
+        if time_questions and self.rng.random() < 0.5:
             all_questions.extend(time_questions)
         
-        return random.choice(all_questions) if all_questions else None
+        return self.rng.choice(all_questions) if all_questions else None
     
     def _handle_private_message(self, message: str, sender: str) -> Optional[str]:
         """Traite spécialement les messages privés avec un ton plus personnel"""
@@ -842,7 +972,7 @@ Tu participes à une {context_type} et réponds naturellement.
                 "Hello ! Besoin de parler ?",
                 "Coucou ! Tu vas bien ?"
             ]
-            return random.choice(welcomes)
+            return self.rng.choice(welcomes)
         
         # Questions fréquentes en privé
         if any(word in message_lower for word in ["aide", "help", "problème", "souci", "bug"]):
@@ -855,7 +985,7 @@ Tu participes à une {context_type} et réponds naturellement.
                 "Allez, dis-moi tout !",
                 "Je suis là pour ça, raconte !"
             ]
-            return random.choice(help_responses)
+            return self.rng.choice(help_responses)
         
         # Confidences/secrets
         if any(word in message_lower for word in ["secret", "confier", "dire à personne", "entre nous", "confidentiel"]):
@@ -868,7 +998,7 @@ Tu participes à une {context_type} et réponds naturellement.
                 "Entre nous, pas de souci",
                 "Confiance totale, je t'écoute"
             ]
-            return random.choice(confidence_responses)
+            return self.rng.choice(confidence_responses)
         
         # Questions personnelles sur le bot
         if any(word in message_lower for word in ["tu es qui", "comment tu t'appelles", "ton nom", "qui es-tu"]):
@@ -882,7 +1012,7 @@ Tu participes à une {context_type} et réponds naturellement.
                     f"C'est {profile.name}, ravi de te rencontrer !",
                     f"Moi ? {profile.name}, et toi comment tu t'appelles ?"
                 ]
-                return random.choice(identity_responses)
+                return self.rng.choice(identity_responses)
         
         # Demandes d'informations personnelles
         if any(word in message_lower for word in ["d'où tu viens", "tu habites où", "ta ville", "tu viens d'où"]):
@@ -896,7 +1026,7 @@ Tu participes à une {context_type} et réponds naturellement.
                     f"Native de {city} ! Tu viens d'où toi ?",
                     f"Petite {city.lower()}aise ! Et toi tu es d'où ?"
                 ]
-                return random.choice(location_responses)
+                return self.rng.choice(location_responses)
         
         # Salutations privées plus chaleureuses
         if any(word in message_lower for word in ["salut", "hello", "coucou", "hey", "yo", "bonjour", "bonsoir"]):
@@ -913,7 +1043,7 @@ Tu participes à une {context_type} et réponds naturellement.
                     f"Salut {name} ! Content de te revoir !",
                     f"Coucou {name} ! Ça fait plaisir !"
                 ]
-                return random.choice(personal_greetings)
+                return self.rng.choice(personal_greetings)
             else:
                 warm_greetings = [
                     "Salut ! Ça me fait plaisir de te revoir !",
@@ -924,7 +1054,7 @@ Tu participes à une {context_type} et réponds naturellement.
                     "Salut ! Tu fais quoi de beau ?",
                     "Coucou ! Des nouvelles ?"
                 ]
-                return random.choice(warm_greetings)
+                return self.rng.choice(warm_greetings)
         
         # Au revoir en privé
         if any(word in message_lower for word in ["au revoir", "bye", "ciao", "à plus", "salut", "bonne nuit", "bonne soirée"]):
@@ -938,7 +1068,7 @@ Tu participes à une {context_type} et réponds naturellement.
                 "Ciao ! À la prochaine !",
                 "Au revoir ! Ça m'a fait plaisir !"
             ]
-            return random.choice(farewell_responses)
+            return self.rng.choice(farewell_responses)
         
         # Réponses générales plus personnelles pour le privé
         personal_responses = [
@@ -955,13 +1085,14 @@ Tu participes à une {context_type} et réponds naturellement.
         ]
         
         # 70% de chance de répondre avec une réponse personnelle
-        if random.random() < 0.7:
-            return random.choice(personal_responses)
+        if self.rng.random() < 0.7:
+            return self.rng.choice(personal_responses)
             
         return None  # Laisser l'IA ou les réponses normales prendre le relais
     
-    def _apply_sms_abbreviations(self, text: str) -> str:
+    def _apply_sms_abbreviations(self, text: str, rng: Optional[random.Random] = None) -> str:
         """Applique des abréviations SMS/IRC typiques pour un style plus naturel"""
+        rng = rng or self.rng
         
         # Abréviations courantes IRC/SMS (très utilisées)
         common_abbreviations = {
@@ -1034,11 +1165,11 @@ Tu participes à une {context_type} et réponds naturellement.
         
         # Appliquer 2-3 abréviations maximum par message pour rester naturel
         abbreviations_applied = 0
-        max_abbreviations = random.randint(2, 4)
+        max_abbreviations = rng.randint(2, 4)
         
         # Parcourir les abréviations dans un ordre aléatoire
         items = list(common_abbreviations.items())
-        random.shuffle(items)
+        rng.shuffle(items)
         
         for original, replacements in items:
             if abbreviations_applied >= max_abbreviations:
@@ -1046,24 +1177,24 @@ Tu participes à une {context_type} et réponds naturellement.
                 
             if original in result:
                 # Choisir une abréviation aléatoire
-                replacement = random.choice(replacements)
+                replacement = rng.choice(replacements)
                 # Appliquer seulement 30% du temps même si le mot est présent
-                if random.random() < 0.3:
+                if rng.random() < 0.3:
                     result = result.replace(original, replacement, 1)  # Une seule occurrence
                     abbreviations_applied += 1
         
         # Suppression voyelles aléatoire (style SMS extrême) - très rare
-        if random.random() < 0.1:  # 10% de chance
+        if rng.random() < 0.1:  # 10% de chance
             words = result.split()
             if len(words) > 1:  # Au moins 2 mots
-                word_to_shorten = random.choice(words)
+                word_to_shorten = rng.choice(words)
                 if len(word_to_shorten) > 4:  # Mots assez longs
                     # Supprimer quelques voyelles (pas toutes)
                     vowels = 'aeiou'
                     shortened = ''
                     vowel_removed = False
                     for char in word_to_shorten:
-                        if char in vowels and not vowel_removed and random.random() < 0.3:
+                        if char in vowels and not vowel_removed and rng.random() < 0.3:
                             vowel_removed = True
                             continue  # Supprimer cette voyelle
                         shortened += char
@@ -1,27 +1,74 @@
 import asyncio
 import logging
-import random
 import socket
 import ssl
+from collections import defaultdict
+from dataclasses import asdict
 from typing import Optional
 from .config import Config
 from .human_generator import HumanResponseGenerator
 from .activity_manager import ActivityManager
+from .rng import make_rng
+from .clock import Clock, REAL_CLOCK
+from .runtime_state import RuntimeStateFile
 
 class IrcHumanizerBot:
     """Bot IRC principal qui imite un utilisateur humain"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, clock: Optional[Clock] = None):
         self.config = config
+        self.clock = clock or REAL_CLOCK
         self.logger = logging.getLogger(__name__)
         self.reader: Optional[asyncio.StreamReader] = None
         self.writer: Optional[asyncio.StreamWriter] = None
         self.connected = False
-        self.human_generator = HumanResponseGenerator(config)
-        self.activity_manager = ActivityManager(config_data=config.activity_config)
+        self.rng = make_rng(config.seed, config.nickname, "irc")
+        
+        # Redémarrage à chaud: reprendre la persona enregistrée au dernier arrêt (si présente)
+        self.state_file = RuntimeStateFile(config.state_file) if config.warm_restart else None
+        warm_state = self.state_file.load() if self.state_file else None
+        
+        self.human_generator = HumanResponseGenerator(config, clock=self.clock, warm_state=warm_state)
+        self.latency = self.human_generator.latency
+        self.activity_manager = ActivityManager(
+            config_data=config.activity_config,
+            rng=make_rng(config.seed, config.nickname, "activity"),
+            clock=self.clock
+        )
+        
+        # Pseudo choisi lors d'une exécution précédente (même persona = même pseudo)
+        self.persona_nickname = None
+        if warm_state:
+            self.activity_manager.restore_state(warm_state.get("activity", {}))
+            self.persona_nickname = warm_state.get("nickname")
+            self.logger.info(f"Redémarrage à chaud: persona {self.persona_nickname or config.nickname} reprise")
+            if warm_state.get("memory"):
+                # L'instantané de la mémoire ne sert qu'une fois: après un arrêt brutal, le stockage fait foi
+                self.state_file.save({key: value for key, value in warm_state.items() if key != "memory"})
+        self.background_tasks = []
+        
+        # Compteurs exposés par le point d'accès de métriques
+        self.inbound_by_command = defaultdict(int)
+        self.replies_by_branch = defaultdict(int)
+        self.ignored_by_reason = defaultdict(int)
+        monitoring_config = config.monitoring_config or {}
+        http_config = monitoring_config.get('http') or {}
+        self.metrics_server = None
+        if http_config.get('enabled', False):
+            # Importé seulement si activé (aiohttp côté serveur, mesures propres à la plateforme)
+            from .metrics_server import MetricsServer
+            self.metrics_server = MetricsServer.from_config(self, http_config)
         
     async def start(self):
         """Démarre le bot et maintient la connexion"""
+        self.start_background_tasks()
+        if self.metrics_server:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                self.logger.error(f"Impossible de démarrer le serveur de métriques: {e}")
+                self.metrics_server = None
+        
         while True:
             try:
                 await self.connect()
@@ -29,7 +76,21 @@ class IrcHumanizerBot:
             except Exception as e:
                 self.logger.error(f"Erreur de connexion: {e}")
                 self.logger.info("Reconnexion dans 30 secondes...")
-                await asyncio.sleep(30)
+                await self.clock.sleep(30)
+    
+    def start_background_tasks(self):
+        """Lance les tâches de fond (une seule fois)"""
+        if self.background_tasks:
+            return
+        
+        self.background_tasks.append(asyncio.create_task(self.human_generator.context_builder.run()))
+        memory_config = self.config.memory_config or {}
+        self.background_tasks.append(asyncio.create_task(self.human_generator.memory.run_expiry(
+            interval=memory_config.get('expiry_interval', 60.0),
+            budget=memory_config.get('expiry_budget_ms', 5) / 1000.0
+        )))
+        if self.human_generator.response_pool:
+            self.background_tasks.append(asyncio.create_task(self.human_generator.response_pool.run()))
     
     async def connect(self):
         """Établit la connexion au serveur IRC"""
@@ -57,6 +118,8 @@ class IrcHumanizerBot:
                 
                 # Mettre à jour le nickname dans la config pour les logs
                 self.config.nickname = personality_nickname
+                if self.state_file:
+                    self.persona_nickname = personality_nickname
                 
                 self.logger.info(f"Identité personnalisée: {personality_nickname} ({personality_realname})")
             else:
@@ -122,6 +185,9 @@ class IrcHumanizerBot:
         
         if len(parts) < 2:
             return
+        
+        command = parts[0] if parts[0] == 'PING' else parts[1]
+        self.inbound_by_command[command] += 1
             
         # Gérer PING pour maintenir la connexion
         if parts[0] == 'PING':
@@ -140,17 +206,21 @@ class IrcHumanizerBot:
     
     async def handle_privmsg(self, raw_message: str):
         """Traite les messages privés et de salon"""
+        latency = self.latency
+        started = latency.start()
+        
         # Parser le message IRC
         # Format: :nickname!user@host PRIVMSG #channel :message
-        parts = raw_message.split(' ', 3)
-        
-        if len(parts) < 4:
-            return
+        with latency.span("privmsg.parse"):
+            parts = raw_message.split(' ', 3)
             
-        sender_info = parts[0][1:]  # Enlever le ':' initial
-        sender = sender_info.split('!')[0] if '!' in sender_info else sender_info
-        target = parts[2]
-        message = parts[3][1:]  # Enlever le ':' initial
+            if len(parts) < 4:
+                return
+                
+            sender_info = parts[0][1:]  # Enlever le ':' initial
+            sender = sender_info.split('!')[0] if '!' in sender_info else sender_info
+            target = parts[2]
+            message = parts[3][1:]  # Enlever le ':' initial
         
         # Ignorer ses propres messages
         if sender == self.config.nickname:
@@ -159,96 +229,121 @@ class IrcHumanizerBot:
         self.logger.info(f"[{target}] <{sender}> {message}")
         
         # Vérifier si on simule une absence
-        absence_reason = self.activity_manager.simulate_random_absence()
+        with latency.span("privmsg.activity"):
+            absence_reason = self.activity_manager.simulate_random_absence()
         if absence_reason:
             await self.send_action(target, absence_reason)
             self.logger.info(f"[{target}] * {self.config.nickname} {absence_reason}")
+            self._record_outcome("absence", started)
             return
         
         # Vérifier si on revient d'absence
-        return_message = self.activity_manager.get_return_message()
+        with latency.span("privmsg.activity"):
+            return_message = self.activity_manager.get_return_message()
         if return_message:
             await self.send_message(target, return_message)
             self.logger.info(f"[{target}] <{self.config.nickname}> {return_message}")
+            self._record_outcome("return", started)
             return
         
         # Mettre à jour l'humeur du bot
-        self.human_generator.personality.update_mood()
+        with latency.span("privmsg.mood"):
+            self.human_generator.personality.update_mood()
         
         # Vérifier si le bot fait une action spontanée
-        action = self.human_generator.personality.get_irc_action()
+        with latency.span("privmsg.spontaneous"):
+            action = self.human_generator.personality.get_irc_action()
         if action:
-            action_delay = random.uniform(1.0, 6.0)
-            await asyncio.sleep(action_delay)
+            action_delay = self.rng.uniform(1.0, 6.0)
+            with latency.span("privmsg.delay"):
+                await self.clock.sleep(action_delay)
             await self.send_action(target, action)
             self.logger.info(f"[{target}] * {self.config.nickname} {action}")
+            self._record_outcome("action", started)
             return  # Action au lieu de réponse
         
         # Vérifier si le bot fait une interruption spontanée
-        interruption = self.human_generator.get_spontaneous_interruption()
+        with latency.span("privmsg.spontaneous"):
+            interruption = self.human_generator.get_spontaneous_interruption()
         if interruption:
-            interruption_delay = random.uniform(2.0, 8.0)
-            await asyncio.sleep(interruption_delay)
-            adapted_interruption = self.human_generator.personality.adapt_response_style(interruption)
-            adapted_interruption = self.human_generator._add_human_touches(adapted_interruption)
+            interruption_delay = self.rng.uniform(2.0, 8.0)
+            with latency.span("privmsg.delay"):
+                await self.clock.sleep(interruption_delay)
+            with latency.span("styling"):
+                adapted_interruption = self.human_generator.personality.adapt_response_style(interruption)
+                adapted_interruption = self.human_generator._add_human_touches(adapted_interruption)
             await self.send_message(target, adapted_interruption)
             self.logger.info(f"[{target}] <{self.config.nickname}> [INTERRUPTION] {adapted_interruption}")
+            self._record_outcome("interruption", started)
             return
 
         # Vérifier si le bot pose une question spontanée (très rare, channels seulement)
         if target.startswith('#'):
-            spontaneous_question = self.human_generator.get_spontaneous_question(target)
+            with latency.span("privmsg.spontaneous"):
+                spontaneous_question = self.human_generator.get_spontaneous_question(target)
             if spontaneous_question:
                 # Délai plus long pour les questions spontanées (paraître naturel)
-                question_delay = random.uniform(5.0, 18.0)
-                await asyncio.sleep(question_delay)
+                question_delay = self.rng.uniform(5.0, 18.0)
+                with latency.span("privmsg.delay"):
+                    await self.clock.sleep(question_delay)
                 
                 # Adapter la question selon la personnalité
-                adapted_question = self.human_generator.personality.adapt_response_style(spontaneous_question)
-                adapted_question = self.human_generator.personality.adapt_response_with_mood(adapted_question)
-                adapted_question = self.human_generator._add_human_touches(adapted_question)
+                with latency.span("styling"):
+                    adapted_question = self.human_generator.personality.adapt_response_style(spontaneous_question)
+                    adapted_question = self.human_generator.personality.adapt_response_with_mood(adapted_question)
+                    adapted_question = self.human_generator._add_human_touches(adapted_question)
                 
                 await self.send_message(target, adapted_question)
                 self.activity_manager.record_response()  # Compter comme une réponse
                 self.logger.info(f"[{target}] <{self.config.nickname}> [QUESTION] {adapted_question}")
+                self._record_outcome("question", started)
                 return  # Question au lieu de réponse normale
         
         # Vérifier si le bot poste un status spontané (très rare, channels seulement)
         if target.startswith('#'):
-            spontaneous_status = self.activity_manager.get_spontaneous_status()
+            with latency.span("privmsg.spontaneous"):
+                spontaneous_status = self.activity_manager.get_spontaneous_status()
             if spontaneous_status:
                 # Délai moyen pour les status (paraître naturel)
-                status_delay = random.uniform(3.0, 12.0)
-                await asyncio.sleep(status_delay)
+                status_delay = self.rng.uniform(3.0, 12.0)
+                with latency.span("privmsg.delay"):
+                    await self.clock.sleep(status_delay)
                 
                 # Adapter le status selon la personnalité
-                adapted_status = self.human_generator.personality.adapt_response_style(spontaneous_status)
-                adapted_status = self.human_generator.personality.adapt_response_with_mood(adapted_status) 
-                adapted_status = self.human_generator._add_human_touches(adapted_status)
+                with latency.span("styling"):
+                    adapted_status = self.human_generator.personality.adapt_response_style(spontaneous_status)
+                    adapted_status = self.human_generator.personality.adapt_response_with_mood(adapted_status) 
+                    adapted_status = self.human_generator._add_human_touches(adapted_status)
                 
                 await self.send_message(target, adapted_status)
                 self.activity_manager.record_response()  # Compter comme une réponse
                 self.logger.info(f"[{target}] <{self.config.nickname}> [STATUS] {adapted_status}")
+                self._record_outcome("status", started)
                 return  # Status au lieu de réponse normale
         
-        # Vérifier si le bot est mentionné (réaction prioritaire)
-        is_mentioned = self._is_bot_mentioned(message)
-        
-        # Décider si on doit répondre (probabilité modifiée par humeur + activité)
-        mood_modifier = self.human_generator.personality.get_mood_modifier()
-        base_probability = self.config.response_probability * mood_modifier
-        
-        # Si mentionné, probabilité beaucoup plus élevée (80%)
-        if is_mentioned:
-            base_probability = 0.8 * mood_modifier
-        
-        activity_level = self.activity_manager.get_activity_level()
+        with latency.span("privmsg.decision"):
+            # Vérifier si le bot est mentionné (réaction prioritaire)
+            is_mentioned = self._is_bot_mentioned(message)
+            
+            # Décider si on doit répondre (probabilité modifiée par humeur + activité)
+            mood_modifier = self.human_generator.personality.get_mood_modifier()
+            base_probability = self.config.response_probability * mood_modifier
+            
+            # Si mentionné, probabilité beaucoup plus élevée (80%)
+            if is_mentioned:
+                base_probability = 0.8 * mood_modifier
+            
+            activity_level = self.activity_manager.get_activity_level()
+            
+            should_respond = self.activity_manager.should_respond(base_probability)
         
-        if not self.activity_manager.should_respond(base_probability):
+        if not should_respond:
+            self._record_outcome("lurk", started)
             return
         
         # Générer une réponse humaine d'abord (avec contexte mention si applicable)
-        response = await self.human_generator.generate_response(message, sender, target, is_mentioned)
+        with latency.span("privmsg.generate"):
+            response = await self.human_generator.generate_response(message, sender, target, is_mentioned)
         
         if response:
             # Calculer le délai de lecture du message reçu
@@ -265,10 +360,15 @@ class IrcHumanizerBot:
             
             # Combiner délai de lecture + frappe + activité
             final_delay = reading_delay + max(typing_delay, activity_delay * 0.3)
-            await asyncio.sleep(final_delay)
-            await self.send_message(target, response)
+            with latency.span("privmsg.delay"):
+                await self.clock.sleep(final_delay)
+            with latency.span("privmsg.send"):
+                await self.send_message(target, response)
             self.activity_manager.record_response()  # Enregistrer pour anti-détection
             self.logger.info(f"[{target}] <{self.config.nickname}> {response}")
+            self._record_outcome(self.human_generator.last_branch or "canned", started)
+        else:
+            self._record_outcome("silent", started)
     
     def _is_bot_mentioned(self, message: str) -> bool:
         """Vérifie si le bot est mentionné dans le message"""
@@ -305,6 +405,9 @@ class IrcHumanizerBot:
         """Génère un nickname IRC basé sur la personnalité du bot"""
         profile = self.human_generator.personality.profile
         
+        if self.persona_nickname:
+            return self.persona_nickname
+        
         # Si un nickname personnalisé est défini ET qu'il correspond au genre, on l'utilise
         if hasattr(self.config, 'nickname') and self.config.nickname != "MonHumain":
             # Vérifier si le nickname correspond au genre de la personnalité
@@ -315,7 +418,6 @@ class IrcHumanizerBot:
         base_name = self._remove_accents(profile.name)
         
         # Variations possibles du prénom pour IRC
-        import random
         variations = [
             base_name,                           # Sarah
             f"{base_name}_{profile.age}",       # Sarah_24
@@ -323,7 +425,7 @@ class IrcHumanizerBot:
             f"{base_name}_{profile.location['region']}", # Sarah_69
         ]
         
-        return random.choice(variations)
+        return self.rng.choice(variations)
     
     def _remove_accents(self, text: str) -> str:
         """Supprime les accents pour compatibilité IRC"""
@@ -369,7 +471,6 @@ class IrcHumanizerBot:
     
     def _get_gender_appropriate_name(self, gender: str) -> str:
         """Retourne un prénom approprié au genre"""
-        import random
         
         male_names = [
             "Alexandre", "Pierre", "Paul", "Jean", "Michel", "Nicolas", 
@@ -393,9 +494,9 @@ class IrcHumanizerBot:
         ]
         
         if gender == "M":
-            return random.choice(male_names)
+            return self.rng.choice(male_names)
         else:  # "F"
-            return random.choice(female_names)
+            return self.rng.choice(female_names)
     
     def _generate_personality_realname(self) -> str:
         """Génère un realname IRC basé sur la personnalité du bot"""
@@ -425,10 +526,50 @@ class IrcHumanizerBot:
         
         return f"{profile.age} {gender_display} {city_abbrev}"
     
+    def _record_outcome(self, branch: str, started: float):
+        """Compte l'issue du traitement d'un message et enregistre sa latence totale"""
+        if branch in ("lurk", "silent"):
+            self.ignored_by_reason[branch] += 1
+        else:
+            self.replies_by_branch[branch] += 1
+        self.latency.record_branch(branch, started)
+    
+    def dump_latency(self):
+        """Écrit le rapport des latences dans les logs (à la demande)"""
+        self.logger.info(self.latency.format_report("Latences du pipeline:"))
+    
+    def save_state(self):
+        """Enregistre la persona courante pour le prochain démarrage (redémarrage à chaud)"""
+        self.state_file.save({
+            "saved_at": self.clock.now().isoformat(),
+            "nickname": self.persona_nickname,
+            "profile": asdict(self.human_generator.personality.profile),
+            "activity": self.activity_manager.get_state(),
+            "memory": self.human_generator.memory.export_state()
+        })
+    
     async def disconnect(self):
         """Ferme la connexion"""
-        # Sauvegarder la mémoire avant de fermer
-        self.human_generator.memory.save_memory()
+        # Arrêter les tâches de fond d'abord: elles ne doivent plus toucher la mémoire pendant la sauvegarde
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        self.background_tasks = []
+        
+        # Sauvegarder la mémoire avant de fermer (écriture hors de la boucle asyncio)
+        await asyncio.get_running_loop().run_in_executor(None, self.human_generator.memory.close)
+        if self.human_generator.archive:
+            await asyncio.get_running_loop().run_in_executor(None, self.human_generator.archive.close)
+        if self.human_generator.retrieval:
+            await asyncio.get_running_loop().run_in_executor(None, self.human_generator.retrieval.flush_history)
+        if self.state_file:
+            await asyncio.get_running_loop().run_in_executor(None, self.save_state)
+        
+        if self.latency.enabled:
+            self.logger.info(self.latency.format_report("Latences du pipeline:"))
+        
+        if self.metrics_server:
+            await self.metrics_server.stop()
         
         if self.writer:
             self.writer.close()
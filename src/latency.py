@@ -0,0 +1,141 @@
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+# Bornes supérieures des buckets en millisecondes (le dernier bucket est +inf)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+              1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Histogramme à buckets fixes (millisecondes)"""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p: float) -> float:
+        """Borne supérieure du bucket contenant le percentile p (0-100), plafonnée au max observé"""
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100.0
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(BUCKETS_MS[index], round(self.max_ms, 3)) if index < len(BUCKETS_MS) else round(self.max_ms, 3)
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class _Span:
+    """Mesure une étape entre __enter__ et __exit__"""
+
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: LatencyHistogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.perf_counter() - self.started) * 1000.0)
+        return False
+
+
+class _NullSpan:
+    """Span sans effet quand la mesure est désactivée"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class LatencyRecorder:
+    """Latences par étape du pipeline et par branche de comportement"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.branches: Dict[str, LatencyHistogram] = {}
+
+    @staticmethod
+    def _histogram(histograms: Dict[str, LatencyHistogram], name: str) -> LatencyHistogram:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = LatencyHistogram()
+        return histogram
+
+    def span(self, stage: str):
+        """Context manager mesurant une étape (no-op si désactivé)"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self._histogram(self.stages, stage))
+
+    def start(self) -> float:
+        """Début d'un traitement complet (à passer à record_branch)"""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def record_branch(self, branch: str, started: float):
+        """Enregistre la durée totale d'un traitement selon la branche prise"""
+        if self.enabled:
+            self._histogram(self.branches, branch).observe((time.perf_counter() - started) * 1000.0)
+
+    def reset(self):
+        self.stages.clear()
+        self.branches.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "stages": {name: hist.to_dict() for name, hist in sorted(self.stages.items())},
+            "branches": {name: hist.to_dict() for name, hist in sorted(self.branches.items())},
+        }
+
+    def format_report(self, title: Optional[str] = None) -> str:
+        """Rapport texte des latences (étapes puis branches)"""
+        if not self.enabled:
+            return "Mesure des latences désactivée"
+
+        lines: List[str] = [title] if title else []
+        for label, histograms in (("Étapes", self.stages), ("Branches", self.branches)):
+            lines.append(f"{label}:")
+            if not histograms:
+                lines.append("  (aucune mesure)")
+            for name, hist in sorted(histograms.items()):
+                stats = hist.to_dict()
+                lines.append(
+                    f"  {name:<24} n={stats['count']:<7} moy={stats['avg_ms']:.3f}ms "
+                    f"p50<={stats['p50_ms']}ms p95<={stats['p95_ms']}ms "
+                    f"p99<={stats['p99_ms']}ms max={stats['max_ms']}ms"
+                )
+        return "\n".join(lines)
@@ -1,28 +1,222 @@
-import json
-import os
+import asyncio
+import heapq
+import random
+import re
+import sys
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from collections import defaultdict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from collections import OrderedDict, deque
 import logging
+from .clock import Clock, REAL_CLOCK
+from .memory_store import BackgroundWriter, JsonMemoryStore, MemoryMessage, MemoryStore
+from .user_facts import SharedUserFacts
+
+# Marqueurs de style décontracté (comparés au message en minuscules)
+CASUAL_INDICATORS = ("mdr", "lol", "ptdr", "xD", "^^", ":)", ":(", "jsp", "bcp")
+
+
+# Extraction d'infos personnelles: expressions compilées une seule fois. Les mots déclencheurs
+# écartent sans regex les messages qui ne peuvent pas correspondre (la grande majorité)
+NAME_TRIGGERS = ("appel", "nom c'est", "je suis", "moi c'est")
+NAME_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"je m'appelle (\w+)",
+    r"mon nom c'est (\w+)",
+    r"je suis (\w+)",
+    r"moi c'est (\w+)",
+    r"appelez-moi (\w+)"
+))
+# Mots communs à ne pas prendre pour un prénom
+COMMON_WORDS = frozenset({"bien", "là", "ici", "pas", "très", "super", "content", "triste"})
+
+AGE_TRIGGERS = ("ans", "j'ai")
+AGE_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"j'ai (\d{1,2}) ans",
+    r"(\d{1,2}) ans",
+    r"j'ai (\d{1,2})a",  # j'ai 25a
+))
+
+# Villes françaises communes, par ordre de priorité
+FRENCH_CITIES = (
+    "paris", "lyon", "marseille", "toulouse", "nice", "nantes",
+    "strasbourg", "montpellier", "bordeaux", "lille", "rennes",
+    "reims", "toulon", "grenoble", "dijon", "angers", "nîmes",
+    "clermont", "aix", "brest", "tours", "limoges", "besançon",
+    "metz", "perpignan", "orléans", "mulhouse", "caen", "boulogne",
+    "rouen", "nancy", "saint-étienne", "le havre", "avignon"
+)
+CITY_RANK = {city: rank for rank, city in enumerate(FRENCH_CITIES)}
+# "je suis de X", "j'habite à X", "j'viens de X"... se ramènent tous à "de X" ou "à X"
+LOCATION_PATTERN = re.compile(
+    r"(?:de|à) (" + "|".join(re.escape(city) for city in sorted(FRENCH_CITIES, key=len, reverse=True)) + ")"
+)
+
+INTEREST_KEYWORDS = {
+    "gaming": ("jeu", "jeux", "console", "pc", "ps5", "xbox", "steam", "valorant", "lol", "cs"),
+    "music": ("musique", "écoute", "concert", "groupe", "album", "chanson", "spotify"),
+    "movies": ("film", "cinéma", "netflix", "serie", "série", "regarder"),
+    "sport": ("sport", "foot", "football", "tennis", "basket", "gym", "course", "vélo"),
+    "tech": ("tech", "code", "dev", "programmation", "ordi", "pc", "smartphone"),
+    "travel": ("voyage", "vacances", "pays", "avion", "hotel"),
+    "food": ("bouffe", "restaurant", "cuisine", "manger", "plat", "recette")
+}
+
+# Champs déjà connus d'un utilisateur (plus besoin de les chercher)
+FIELD_NAME, FIELD_AGE, FIELD_LOCATION, FIELD_INTERESTS = 1, 2, 4, 8
+ALL_FIELDS = FIELD_NAME | FIELD_AGE | FIELD_LOCATION | FIELD_INTERESTS
+
+# Champs simples: (clé, date de mention, FIELD_*)
+FACT_FIELDS = (
+    ("first_name", "name_mentioned_at", FIELD_NAME),
+    ("age", "age_mentioned_at", FIELD_AGE),
+    ("location", "location_mentioned_at", FIELD_LOCATION),
+)
+
+# Taille approximative d'un message en mémoire vive: enregistrement et emplacements de deque
+# (message et ligne formatée), plus le texte et la ligne formatée eux-mêmes
+_RECORD_BYTES = sys.getsizeof(MemoryMessage(0.0, "", "")) + 2 * 8
+_CONTEXT_BYTES = 2 * sys.getsizeof(deque(maxlen=1))
+
+
+def _message_size(msg: MemoryMessage) -> int:
+    text_bytes = sys.getsizeof(msg.message)
+    return _RECORD_BYTES + 2 * text_bytes + len(msg.sender) + 2
+
+
+class _UserStyle:
+    """Agrégats du style d'un utilisateur sur les messages en mémoire courte"""
+    
+    __slots__ = ("total_messages", "total_length", "casual_count", "questions_count", "samples")
+    
+    def __init__(self):
+        self.total_messages = 0
+        self.total_length = 0
+        self.casual_count = 0
+        self.questions_count = 0
+        self.samples = deque(maxlen=3)
+    
+    @staticmethod
+    def _casual_hits(message: str) -> int:
+        message_lower = message.lower()
+        return sum(1 for indicator in CASUAL_INDICATORS if indicator in message_lower)
+    
+    def add(self, message: str):
+        self.total_messages += 1
+        self.total_length += len(message)
+        self.casual_count += self._casual_hits(message)
+        if "?" in message:
+            self.questions_count += 1
+        self.samples.append(message)
+    
+    def remove(self, message: str):
+        """Retire un message sorti de la mémoire (les exemples récents sont conservés)"""
+        self.total_messages -= 1
+        self.total_length -= len(message)
+        self.casual_count -= self._casual_hits(message)
+        if "?" in message:
+            self.questions_count -= 1
+    
+    def to_state(self) -> list:
+        return [self.total_messages, self.total_length, self.casual_count, self.questions_count, list(self.samples)]
+    
+    @classmethod
+    def from_state(cls, state: list) -> '_UserStyle':
+        style = cls()
+        style.total_messages, style.total_length, style.casual_count, style.questions_count, samples = state
+        style.samples.extend(samples)
+        return style
+    
+    def to_dict(self) -> Dict[str, any]:
+        total = self.total_messages
+        return {
+            "total_messages": total,
+            "avg_message_length": self.total_length / total,
+            "casualness_score": self.casual_count / total,
+            "question_ratio": self.questions_count / total,
+            "sample_messages": list(self.samples)
+        }
+
 
 class ConversationMemory:
     """Gestionnaire de mémoire conversationnelle par contexte"""
     
-    def __init__(self, max_messages_per_context: int = 50, memory_file: str = "bot_memory.json"):
+    def __init__(self, max_messages_per_context: int = 50, memory_file: str = "bot_memory.json",
+                 rng: Optional[random.Random] = None, clock: Optional[Clock] = None,
+                 store: Optional[MemoryStore] = None, save_every: int = 10,
+                 background_save: bool = False, save_delay: float = 2.0, max_age_days: float = 7,
+                 max_contexts: Optional[int] = None, max_users: Optional[int] = None, fresh: bool = True,
+                 shared_facts: Optional[SharedUserFacts] = None):
         self.logger = logging.getLogger(__name__)
+        self.rng = rng or random.Random()
+        self.clock = clock or REAL_CLOCK
         self.max_messages = max_messages_per_context
-        self.memory_file = memory_file
+        self.max_age_days = max_age_days
+        
+        # Limites de la mémoire vive (None = illimité): au-delà, les plus inactifs sont évincés
+        self.max_contexts = max_contexts
+        self.max_users = max_users
+        
+        # Stockage persistant (fichier JSON complet par défaut)
+        self.store = store or JsonMemoryStore(memory_file)
+        self.memory_file = self.store.path
+        self.save_every = save_every
+        
+        if (max_contexts or max_users) and not self.store.can_reload:
+            # L'instantané complet suivant effacerait du disque tout ce qui a été évincé
+            raise ValueError(f"{type(self.store).__name__} ne relit pas un contexte seul: "
+                             f"max_contexts et max_users demandent le stockage sqlite")
+        
+        # Éléments pas encore écrits (stockages incrémentaux)
+        self._pending_messages: List[Tuple[str, Dict]] = []
+        self._dirty_users = set()
+        self._unsaved_count = 0
         
-        # Structure: {context_id: deque([message_dict, ...])}
+        # Écritures dans un thread (la boucle asyncio ne touche jamais le disque)
+        self.writer = BackgroundWriter(self.store, delay=save_delay) if background_save else None
+        
+        # Structure: {context_id: deque([MemoryMessage, ...])}, du moins au plus récemment utilisé
         # context_id = "channel:#francophonie" ou "private:username"
-        self.conversations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.max_messages))
+        self.conversations: Dict[str, deque] = OrderedDict()
+        
+        # Mémoire des utilisateurs: {username: {infos personnelles}}, du moins au plus récemment utilisé
+        self.users_info: Dict[str, Dict] = OrderedDict()
+        
+        # Contextes et utilisateurs évincés vers le stockage, rechargés au prochain accès
+        self._spilled_contexts = set()
+        self._spilled_users = set()
+        self.spills = 0
+        self.reloads = 0
+        
+        # Tas (plus ancien timestamp, contexte): les contextes à expirer en premier sont en tête
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._in_expiry_heap = set()
+        
+        # Taille approximative des messages en mémoire vive
+        self._message_bytes = 0
+        
+        # Faits utilisateur partagés entre les personas d'un réseau (extraction faite une seule fois)
+        self.shared_facts = shared_facts
+        
+        # Champs déjà trouvés par utilisateur (FIELD_*), recalculés depuis users_info si absents
+        self._fields_done: Dict[str, int] = {}
+        
+        # Style de chaque utilisateur, tenu à jour à chaque message entrant ou sortant
+        self.user_styles: Dict[str, _UserStyle] = {}
+        
+        # Fonctions appelées avec (context_id, message) quand un message sort de la mémoire courte
+        self.eviction_listeners: List[Callable[[str, MemoryMessage], None]] = []
         
-        # Mémoire des utilisateurs: {username: {infos personnelles}}
-        self.users_info: Dict[str, Dict] = defaultdict(dict)
+        # Fonctions appelées avec context_id quand un contexte inactif quitte la mémoire vive
+        self.spill_listeners: List[Callable[[str], None]] = []
         
-        # NOUVELLE PERSONNALITÉ = NOUVELLE MÉMOIRE (éviter détection bot)
-        self.clear_memory()
-        self.logger.info("Mémoire effacée - nouvelle personnalité, nouveaux souvenirs")
+        if fresh:
+            # NOUVELLE PERSONNALITÉ = NOUVELLE MÉMOIRE (éviter détection bot)
+            self.clear_memory()
+            self.logger.info("Mémoire effacée - nouvelle personnalité, nouveaux souvenirs")
+        else:
+            # Même persona qu'avant l'arrêt (redémarrage à chaud): l'appelant reprend les souvenirs
+            # avec restore_state() ou load_memory()
+            self.logger.info("Mémoire conservée - même personnalité")
     
     def _get_context_id(self, target: str, is_private: bool = False) -> str:
         """Génère un ID de contexte unique"""
@@ -35,188 +229,427 @@ class ConversationMemory:
         """Ajoute un message à la mémoire du contexte"""
         context_id = self._get_context_id(target, is_private)
         
-        message_data = {
-            "timestamp": datetime.now().isoformat(),
-            "sender": sender,
-            "message": message,
-            "is_bot": is_bot
-        }
+        message_data = MemoryMessage(self.clock.time(), sender, message, is_bot)
+        
+        conversation = self._get_conversation(context_id, create=True)
+        if len(conversation) == conversation.maxlen:
+            evicted = conversation[0]
+            self._forget_message(evicted)
+            if self.eviction_listeners:
+                self._notify_eviction(context_id, evicted)
         
-        self.conversations[context_id].append(message_data)
+        conversation.append(message_data)
+        self._track_message(message_data)
+        if context_id not in self._in_expiry_heap:
+            self._schedule_expiry(context_id, conversation[0].ts)
+        if self.store.incremental:
+            self._pending_messages.append((context_id, message_data))
         
         # Extraire infos personnelles si ce n'est pas le bot
         if not is_bot and sender != "System":
             self._extract_user_info(sender, message)
         
-        # Sauvegarder périodiquement
-        if len(self.conversations[context_id]) % 10 == 0:
+        # Sauvegarder périodiquement (tous les save_every messages)
+        self._unsaved_count += 1
+        if self._unsaved_count >= self.save_every:
+            self.save_memory()
+    
+    def _get_conversation(self, context_id: str, create: bool = False) -> Optional[deque]:
+        """Deque d'un contexte, rechargé s'il a été évincé, marqué comme récemment utilisé"""
+        conversation = self.conversations.get(context_id)
+        if conversation is not None:
+            self.conversations.move_to_end(context_id)
+            return conversation
+        
+        if context_id in self._spilled_contexts:
+            conversation = self._reload_context(context_id)
+        elif create:
+            conversation = deque(maxlen=self.max_messages)
+        else:
+            return None
+        
+        self._install_conversation(context_id, conversation)
+        return conversation
+    
+    def _install_conversation(self, context_id: str, conversation: deque):
+        self.conversations[context_id] = conversation
+        if conversation and context_id not in self._in_expiry_heap:
+            self._schedule_expiry(context_id, conversation[0].ts)
+        self._enforce_context_limit()
+    
+    def _reload_context(self, context_id: str, messages: Optional[List[MemoryMessage]] = None) -> deque:
+        self._spilled_contexts.discard(context_id)
+        if messages is None:
+            messages = self._read_context(context_id)
+        
+        conversation = deque(messages, maxlen=self.max_messages)
+        for msg in conversation:
+            self._track_message(msg)
+        self.reloads += 1
+        return conversation
+    
+    def _wait_for_writes(self):
+        """Attend que les écritures en attente soient sur disque (avant une relecture)"""
+        if self.writer and self.writer.pending:
+            self.writer.flush()
+    
+    def _read_context(self, context_id: str) -> List[MemoryMessage]:
+        """Relit un contexte évincé (entrées/sorties seulement, utilisable hors de la boucle asyncio)"""
+        self._wait_for_writes()
+        try:
+            return self.store.load_context(context_id, self.max_messages)
+        except Exception as e:
+            self.logger.error(f"Erreur lors du rechargement du contexte {context_id}: {e}")
+            return []
+    
+    def _read_user(self, username: str) -> Dict:
+        """Relit un utilisateur évincé (entrées/sorties seulement, utilisable hors de la boucle asyncio)"""
+        self._wait_for_writes()
+        try:
+            return self.store.load_user(username) or {}
+        except Exception as e:
+            self.logger.error(f"Erreur lors du rechargement de l'utilisateur {username}: {e}")
+            return {}
+    
+    def _read_spilled(self, context_id: Optional[str], usernames: List[str]) -> Tuple[Optional[List[MemoryMessage]], Dict[str, Dict]]:
+        messages = self._read_context(context_id) if context_id else None
+        return messages, {username: self._read_user(username) for username in usernames}
+    
+    async def preload(self, target: str, is_private: bool = False, usernames: Iterable[str] = ()):
+        """Relit dans un thread le contexte et les utilisateurs évincés avant leur usage
+
+        Sans cela, le premier accès les relit de façon synchrone (attente des
+        écritures puis requêtes SQLite) sur la boucle asyncio.
+        """
+        context_id = self._get_context_id(target, is_private)
+        if context_id not in self._spilled_contexts:
+            context_id = None
+        spilled_users = [username for username in usernames if username in self._spilled_users]
+        if context_id is None and not spilled_users:
+            return
+        
+        messages, users = await asyncio.get_running_loop().run_in_executor(
+            None, self._read_spilled, context_id, spilled_users)
+        
+        # Un accès pendant la lecture a pu les recharger entre-temps
+        if context_id in self._spilled_contexts:
+            self._install_conversation(context_id, self._reload_context(context_id, messages))
+        for username, info in users.items():
+            if username in self._spilled_users:
+                self._spilled_users.discard(username)
+                self.reloads += 1
+                self.users_info[username] = self._ingest_user(username, info)
+                self._enforce_user_limit()
+    
+    @staticmethod
+    def _shrink_target(limit: int) -> int:
+        """Taille visée après éviction (marge de 10% pour ne pas évincer à chaque ajout)"""
+        return max(1, limit - max(1, limit // 10))
+    
+    def _enforce_context_limit(self):
+        if not self.max_contexts or len(self.conversations) <= self.max_contexts:
+            return
+        
+        # Les messages pas encore écrits doivent l'être avant de pouvoir être relus
+        if self._pending_messages or self._dirty_users:
             self.save_memory()
+        
+        target = self._shrink_target(self.max_contexts)
+        while len(self.conversations) > target:
+            context_id, conversation = self.conversations.popitem(last=False)
+            for msg in conversation:
+                self._forget_message(msg)
+            if conversation:
+                self._spilled_contexts.add(context_id)
+            self.spills += 1
+            
+            for listener in self.spill_listeners:
+                try:
+                    listener(context_id)
+                except Exception as e:
+                    self.logger.error(f"Erreur lors de l'éviction d'un contexte: {e}")
+    
+    def _get_user(self, username: str, create: bool = False) -> Optional[Dict]:
+        """Infos d'un utilisateur, rechargées si elles ont été évincées, marquées comme récemment utilisées"""
+        info = self.users_info.get(username)
+        if info is not None:
+            self.users_info.move_to_end(username)
+            return info
+        
+        if username in self._spilled_users:
+            self._spilled_users.discard(username)
+            info = self._ingest_user(username, self._read_user(username))
+            self.reloads += 1
+        elif create:
+            info = {}
+        else:
+            return None
+        
+        self.users_info[username] = info
+        self._enforce_user_limit()
+        return info
     
-    def get_context_history(self, target: str, is_private: bool = False, limit: int = 10) -> List[Dict]:
+    def _enforce_user_limit(self):
+        if not self.max_users or len(self.users_info) <= self.max_users:
+            return
+        
+        if self._pending_messages or self._dirty_users:
+            self.save_memory()
+        
+        target = self._shrink_target(self.max_users)
+        while len(self.users_info) > target:
+            username, info = self.users_info.popitem(last=False)
+            self._fields_done.pop(username, None)
+            if any(value for value in info.values()):
+                self._spilled_users.add(username)
+            self.spills += 1
+    
+    def _schedule_expiry(self, context_id: str, oldest_ts: float):
+        heapq.heappush(self._expiry_heap, (oldest_ts, context_id))
+        self._in_expiry_heap.add(context_id)
+    
+    def _track_message(self, msg: MemoryMessage):
+        self._message_bytes += _message_size(msg)
+        if msg.is_bot:
+            return
+        style = self.user_styles.get(msg.sender)
+        if style is None:
+            style = self.user_styles[msg.sender] = _UserStyle()
+        style.add(msg.message)
+    
+    def _forget_message(self, msg: MemoryMessage):
+        self._message_bytes -= _message_size(msg)
+        if msg.is_bot:
+            return
+        style = self.user_styles.get(msg.sender)
+        if style is None:
+            return
+        style.remove(msg.message)
+        if not style.total_messages:
+            del self.user_styles[msg.sender]
+    
+    def _rebuild_message_stats(self):
+        """Recalcule styles et taille mémoire depuis les conversations (chargement)"""
+        self.user_styles = {}
+        self._message_bytes = 0
+        for messages in self.conversations.values():
+            for msg in messages:
+                self._track_message(msg)
+    
+    def _notify_eviction(self, context_id: str, msg: MemoryMessage):
+        """Prévient les abonnés qu'un message sort de la mémoire courte"""
+        for listener in self.eviction_listeners:
+            try:
+                listener(context_id, msg)
+            except Exception as e:
+                self.logger.error(f"Erreur lors de l'éviction d'un message: {e}")
+    
+    def get_context_history(self, target: str, is_private: bool = False, limit: int = 10) -> List[MemoryMessage]:
         """Récupère l'historique d'un contexte"""
         context_id = self._get_context_id(target, is_private)
-        messages = list(self.conversations[context_id])
+        messages = self._get_conversation(context_id)
         
-        # Retourner les derniers messages
-        return messages[-limit:] if messages else []
+        if not messages or limit <= 0:
+            return []
+        
+        # Retourner les derniers messages sans copier tout le deque
+        count = len(messages)
+        return [messages[i] for i in range(max(0, count - limit), count)]
     
-    def get_conversation_with_user(self, username: str, limit: int = 10) -> List[Dict]:
+    def get_conversation_with_user(self, username: str, limit: int = 10) -> List[MemoryMessage]:
         """Récupère l'historique privé avec un utilisateur spécifique"""
         return self.get_context_history(username, is_private=True, limit=limit)
     
     def format_history_for_ai(self, target: str, is_private: bool = False, limit: int = 8) -> str:
         """Formate l'historique pour l'envoyer à l'IA"""
-        history = self.get_context_history(target, is_private, limit)
+        context_id = self._get_context_id(target, is_private)
+        messages = self._get_conversation(context_id)
         
-        if not history:
+        if not messages or limit <= 0:
             return ""
         
-        formatted_lines = []
-        
-        for msg in history:
-            sender = msg["sender"]
-            content = msg["message"]
-            
-            # Format naturel comme vrais messages IRC
-            formatted_lines.append(f"{sender}: {content}")
-        
-        return "\n".join(formatted_lines)
+        # Ne formater que la fin du deque
+        count = len(messages)
+        return "\n".join(self._format_line(messages[i]) for i in range(max(0, count - limit), count))
+    
+    def get_formatted_lines(self, context_id: str) -> List[str]:
+        """Lignes formatées d'un contexte, calculées à la demande (rechargé s'il a été évincé)"""
+        messages = self._get_conversation(context_id)
+        if not messages:
+            return []
+        return [self._format_line(msg) for msg in messages]
+    
+    @staticmethod
+    def _format_line(msg: MemoryMessage) -> str:
+        """Format naturel comme vrais messages IRC"""
+        return f"{msg.sender}: {msg.message}"
     
     def get_user_personality(self, username: str) -> Dict[str, any]:
         """Analyse la personnalité d'un utilisateur basée sur ses messages"""
-        # Récupérer tous les messages de cet utilisateur dans tous les contextes
-        user_messages = []
-        
-        for context_id, messages in self.conversations.items():
-            for msg in messages:
-                if msg["sender"] == username and not msg["is_bot"]:
-                    user_messages.append(msg["message"])
+        style = self.user_styles.get(username)
+        return style.to_dict() if style else {}
+    
+    @staticmethod
+    def _completed_fields(info: Dict) -> int:
+        done = 0
+        if info.get("first_name"):
+            done |= FIELD_NAME
+        if info.get("age"):
+            done |= FIELD_AGE
+        if info.get("location"):
+            done |= FIELD_LOCATION
+        if len(info.get("interests") or ()) >= len(INTEREST_KEYWORDS):
+            done |= FIELD_INTERESTS
+        return done
+    
+    def _user_view(self, username: str, info: Optional[Dict]) -> Dict:
+        """Infos d'un utilisateur telles que cette persona les connaît (copie)
         
-        if not user_messages:
+        Avec des faits partagés, users_info ne garde que les dates de mention
+        et les intérêts entendus: les valeurs sont lues dans shared_facts, pour
+        les seuls champs dits à cette persona.
+        """
+        if not info:
             return {}
+        if self.shared_facts is None:
+            return self._copy_user_info(info)
+        
+        shared = self.shared_facts.get(username)
+        view = {}
+        for field, mentioned_at, _ in FACT_FIELDS:
+            if mentioned_at in info and field in shared:
+                view[field] = shared[field]
+                view[mentioned_at] = info[mentioned_at]
+        if "interests" in info:
+            view["interests"] = list(info["interests"])
+        return view
+    
+    def _ingest_user(self, username: str, info: Dict) -> Dict:
+        """Infos relues du stockage ou d'un instantané, réduites aux champs entendus si les faits sont partagés"""
+        if self.shared_facts is None or not info:
+            return info
         
-        # Analyse basique
-        total_messages = len(user_messages)
-        avg_length = sum(len(msg) for msg in user_messages) / total_messages
+        known = {field: info[field] for field, _, _ in FACT_FIELDS if info.get(field)}
+        if info.get("interests"):
+            known["interests"] = info["interests"]
+        if known:
+            self.shared_facts.seed(username, known)
+        
+        # Les fiches enregistrées avant le partage n'ont pas toujours de date de mention
+        now = self.clock.now().isoformat()
+        heard = {mentioned_at: info.get(mentioned_at) or now
+                 for field, mentioned_at, _ in FACT_FIELDS if field in known}
+        if "interests" in info:
+            heard["interests"] = list(info["interests"])
+        return heard
+    
+    def _extract_user_info(self, username: str, message: str):
+        """Extrait automatiquement des infos personnelles des messages"""
+        info = self._get_user(username, create=True)
+        done = self._fields_done.get(username)
+        if done is None:
+            done = self._completed_fields(self._user_view(username, info))
+        if done == ALL_FIELDS:
+            self._fields_done[username] = done
+            return
         
-        # Détection de style
-        casual_indicators = ["mdr", "lol", "ptdr", "xD", "^^", ":)", ":(", "jsp", "bcp"]
-        casual_count = sum(1 for msg in user_messages 
-                          for indicator in casual_indicators 
-                          if indicator in msg.lower())
+        interests = info.get("interests")
+        if interests is None:
+            interests = info["interests"] = []
         
-        questions_count = sum(1 for msg in user_messages if "?" in msg)
+        if self.shared_facts is not None:
+            # Extraction complète faite une seule fois par ligne pour toutes les personas du réseau,
+            # chacune ne retient ensuite que les champs qui lui manquent
+            found = self.shared_facts.extract(username, message, self._find_facts)
+        else:
+            found = self._find_facts(message, done, interests)
+        if found:
+            done = self._learn_facts(username, info, found, done)
         
-        return {
-            "total_messages": total_messages,
-            "avg_message_length": avg_length,
-            "casualness_score": casual_count / total_messages if total_messages > 0 else 0,
-            "question_ratio": questions_count / total_messages if total_messages > 0 else 0,
-            "sample_messages": user_messages[-3:] if user_messages else []
-        }
+        self._fields_done[username] = done
     
-    def _extract_user_info(self, username: str, message: str):
-        """Extrait automatiquement des infos personnelles des messages"""
+    def _find_facts(self, message: str, done: int = 0, known_interests: Iterable[str] = ()) -> Dict[str, any]:
+        """Infos personnelles présentes dans un message (les champs de done ne sont pas cherchés)"""
+        found = {}
         message_lower = message.lower()
         
         # Extraction de prénom
-        if not self.users_info[username].get("first_name"):
-            # Patterns: "je m'appelle X", "mon nom c'est X", "je suis X"
-            import re
-            name_patterns = [
-                r"je m'appelle (\w+)",
-                r"mon nom c'est (\w+)",  
-                r"je suis (\w+)",
-                r"moi c'est (\w+)",
-                r"appelez-moi (\w+)"
-            ]
-            
-            for pattern in name_patterns:
-                match = re.search(pattern, message_lower)
+        if not done & FIELD_NAME and any(trigger in message_lower for trigger in NAME_TRIGGERS):
+            for pattern in NAME_PATTERNS:
+                match = pattern.search(message_lower)
                 if match:
                     name = match.group(1).capitalize()
-                    # Éviter les mots communs
-                    common_words = {"bien", "là", "ici", "pas", "très", "super", "content", "triste"}
-                    if name.lower() not in common_words and len(name) > 2:
-                        self.users_info[username]["first_name"] = name
-                        self.users_info[username]["name_mentioned_at"] = datetime.now().isoformat()
+                    if name.lower() not in COMMON_WORDS and len(name) > 2:
+                        found["first_name"] = name
                         break
         
         # Extraction d'âge
-        if not self.users_info[username].get("age"):
-            age_patterns = [
-                r"j'ai (\d{1,2}) ans",
-                r"(\d{1,2}) ans",
-                r"j'ai (\d{1,2})a",  # j'ai 25a
-            ]
-            
-            for pattern in age_patterns:
-                match = re.search(pattern, message_lower)
+        if not done & FIELD_AGE and any(trigger in message_lower for trigger in AGE_TRIGGERS):
+            for pattern in AGE_PATTERNS:
+                match = pattern.search(message_lower)
                 if match:
                     age = int(match.group(1))
                     if 13 <= age <= 99:  # Age raisonnable
-                        self.users_info[username]["age"] = age
-                        self.users_info[username]["age_mentioned_at"] = datetime.now().isoformat()
+                        found["age"] = age
                         break
         
-        # Extraction de ville/région
-        if not self.users_info[username].get("location"):
-            # Villes françaises communes
-            french_cities = [
-                "paris", "lyon", "marseille", "toulouse", "nice", "nantes", 
-                "strasbourg", "montpellier", "bordeaux", "lille", "rennes",
-                "reims", "toulon", "grenoble", "dijon", "angers", "nîmes",
-                "clermont", "aix", "brest", "tours", "limoges", "besançon",
-                "metz", "perpignan", "orléans", "mulhouse", "caen", "boulogne",
-                "rouen", "nancy", "saint-étienne", "le havre", "avignon"
-            ]
-            
-            location_patterns = [
-                r"je suis de (\w+)",
-                r"j'habite à (\w+)", 
-                r"je vis à (\w+)",
-                r"j'viens de (\w+)",
-                r"de (\w+)",
-                r"à (\w+)"
-            ]
-            
-            for city in french_cities:
-                if city in message_lower:
-                    # Vérifier le contexte avec patterns
-                    for pattern in location_patterns:
-                        if re.search(pattern.replace(r"(\w+)", city), message_lower):
-                            self.users_info[username]["location"] = city.capitalize()
-                            self.users_info[username]["location_mentioned_at"] = datetime.now().isoformat()
-                            return
+        # Extraction de ville/région (la ville la plus prioritaire parmi celles citées)
+        if not done & FIELD_LOCATION:
+            cities = [match.group(1) for match in LOCATION_PATTERN.finditer(message_lower)]
+            if cities:
+                found["location"] = min(cities, key=CITY_RANK.__getitem__).capitalize()
         
         # Extraction d'intérêts/hobbies
-        interests_keywords = {
-            "gaming": ["jeu", "jeux", "console", "pc", "ps5", "xbox", "steam", "valorant", "lol", "cs"],
-            "music": ["musique", "écoute", "concert", "groupe", "album", "chanson", "spotify"],
-            "movies": ["film", "cinéma", "netflix", "serie", "série", "regarder"],
-            "sport": ["sport", "foot", "football", "tennis", "basket", "gym", "course", "vélo"],
-            "tech": ["tech", "code", "dev", "programmation", "ordi", "pc", "smartphone"],
-            "travel": ["voyage", "vacances", "pays", "avion", "hotel"],
-            "food": ["bouffe", "restaurant", "cuisine", "manger", "plat", "recette"]
-        }
-        
-        if "interests" not in self.users_info[username]:
-            self.users_info[username]["interests"] = []
-            
-        for interest, keywords in interests_keywords.items():
-            if interest not in self.users_info[username]["interests"]:
-                for keyword in keywords:
-                    if keyword in message_lower:
-                        self.users_info[username]["interests"].append(interest)
-                        break
+        if not done & FIELD_INTERESTS:
+            interests = []
+            for interest, keywords in INTEREST_KEYWORDS.items():
+                if interest not in known_interests:
+                    for keyword in keywords:
+                        if keyword in message_lower:
+                            interests.append(interest)
+                            break
+            if interests:
+                found["interests"] = interests
+        
+        return found
+    
+    def _learn_facts(self, username: str, info: Dict, found: Dict[str, any], done: int) -> int:
+        """Retient les infos trouvées encore inconnues de cette persona, retourne les champs complétés"""
+        changed = False
+        shared = self.shared_facts is not None
+        
+        # Une ville apprise dans ce message: ses intérêts ne sont pas retenus (comportement d'origine)
+        new_location = "location" in found and not done & FIELD_LOCATION
+        
+        for field, mentioned_at, flag in FACT_FIELDS:
+            if field in found and not done & flag:
+                if not shared:
+                    info[field] = found[field]
+                info[mentioned_at] = self.clock.now().isoformat()
+                done |= flag
+                changed = True
+        
+        # Les intérêts sont leurs propres valeurs: chaque persona garde la liste de ceux qu'elle a entendus
+        if "interests" in found and not done & FIELD_INTERESTS and not new_location:
+            interests = info["interests"]
+            for interest in found["interests"]:
+                if interest not in interests:
+                    interests.append(interest)
+                    changed = True
+            if len(interests) >= len(INTEREST_KEYWORDS):
+                done |= FIELD_INTERESTS
+        
+        if changed:
+            self._dirty_users.add(username)
+        return done
     
     def get_user_info(self, username: str) -> Dict[str, any]:
         """Récupère les infos connues sur un utilisateur"""
-        return dict(self.users_info.get(username, {}))
+        return self._user_view(username, self._get_user(username))
     
     def get_friendly_greeting(self, username: str) -> Optional[str]:
         """Génère un salut personnalisé selon les infos de l'utilisateur"""
-        info = self.users_info.get(username, {})
+        info = self._user_view(username, self._get_user(username))
         
         if not info:
             return None
@@ -259,68 +692,155 @@ class ConversationMemory:
                 f"Yo de {location} !"
             ])
         
-        import random
-        return random.choice(greetings) if greetings else None
+        return self.rng.choice(greetings) if greetings else None
     
-    def clean_old_messages(self, days_old: int = 7):
-        """Nettoie les messages anciens"""
-        cutoff_date = datetime.now() - timedelta(days=days_old)
-        
-        for context_id in list(self.conversations.keys()):
-            messages = self.conversations[context_id]
-            # Filtrer les messages récents
-            recent_messages = deque([
-                msg for msg in messages 
-                if datetime.fromisoformat(msg["timestamp"]) > cutoff_date
-            ], maxlen=self.max_messages)
+    def expire_old_messages(self, days_old: Optional[float] = None, budget: Optional[float] = None) -> int:
+        """Retire les messages plus vieux que days_old jours, contexte le plus ancien d'abord
+        
+        Les deques sont chronologiques: on dépile par la gauche jusqu'à la limite.
+        Avec un budget (secondes), s'arrête une fois le budget écoulé; le reste
+        sera traité au passage suivant. Retourne le nombre de messages retirés.
+        """
+        days = self.max_age_days if days_old is None else days_old
+        cutoff = self.clock.time() - days * 86400
+        deadline = time.perf_counter() + budget if budget is not None else None
+        heap = self._expiry_heap
+        expired = 0
+        
+        while heap and heap[0][0] <= cutoff:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            
+            _, context_id = heapq.heappop(heap)
+            self._in_expiry_heap.discard(context_id)
+            messages = self.conversations.get(context_id)
+            if messages is None:
+                continue
             
-            if recent_messages:
-                self.conversations[context_id] = recent_messages
+            while messages and messages[0].ts <= cutoff:
+                msg = messages.popleft()
+                self._forget_message(msg)
+                if self.eviction_listeners:
+                    self._notify_eviction(context_id, msg)
+                expired += 1
+            
+            if messages:
+                self._schedule_expiry(context_id, messages[0].ts)
             else:
                 # Supprimer le contexte s'il n'y a plus de messages
                 del self.conversations[context_id]
+        
+        return expired
+    
+    def _has_expired(self, days_old: float) -> bool:
+        return bool(self._expiry_heap) and self._expiry_heap[0][0] <= self.clock.time() - days_old * 86400
+    
+    def _rebuild_expiry_heap(self):
+        self._expiry_heap = [(messages[0].ts, context_id)
+                             for context_id, messages in self.conversations.items() if messages]
+        heapq.heapify(self._expiry_heap)
+        self._in_expiry_heap = {context_id for _, context_id in self._expiry_heap}
+    
+    def prune_store(self, cutoff: datetime):
+        """Supprime du stockage les messages antérieurs à cutoff (dans le thread d'écriture s'il existe)"""
+        if self.writer:
+            self.writer.prune(cutoff)
+            return
+        try:
+            self.store.prune(cutoff)
+        except Exception as e:
+            self.logger.error(f"Erreur lors du nettoyage du stockage: {e}")
+    
+    def clean_old_messages(self, days_old: Optional[float] = None):
+        """Nettoie les messages anciens (mémoire et stockage)"""
+        days = self.max_age_days if days_old is None else days_old
+        self.expire_old_messages(days)
+        self.prune_store(self.clock.now() - timedelta(days=days))
+    
+    async def run_expiry(self, interval: float = 60.0, budget: float = 0.005):
+        """Tâche de fond: expire les vieux messages par tranches de budget secondes"""
+        while True:
+            try:
+                self.expire_old_messages(budget=budget)
+                backlog = self._has_expired(self.max_age_days)
+                if not backlog:
+                    self.prune_store(self.clock.now() - timedelta(days=self.max_age_days))
+            except Exception as e:
+                self.logger.error(f"Erreur lors de l'expiration des messages: {e}")
+                backlog = False
+            # Reprendre aussitôt (après avoir rendu la main) s'il reste des messages expirés
+            await self.clock.sleep(0 if backlog else interval)
+    
+    @staticmethod
+    def _copy_user_info(info: Dict) -> Dict:
+        """Copie figée des infos d'un utilisateur (les listes sont modifiées sur place)"""
+        return {key: list(value) if isinstance(value, list) else value for key, value in info.items()}
     
     def save_memory(self):
-        """Sauvegarde la mémoire sur disque"""
+        """Sauvegarde la mémoire sur disque (en arrière-plan si un writer est actif)"""
+        pending, self._pending_messages = self._pending_messages, []
+        dirty_users = {username: self._user_view(username, self.users_info[username])
+                       for username in self._dirty_users if username in self.users_info}
+        self._dirty_users = set()
+        self._unsaved_count = 0
+        
+        # Instantané figé seulement si le stockage en a besoin (les messages ne sont jamais modifiés)
+        snapshot = None
+        if self.store.wants_snapshot():
+            snapshot = (
+                {context_id: tuple(messages) for context_id, messages in self.conversations.items()},
+                {username: self._user_view(username, info) for username, info in self.users_info.items()}
+            )
+        
+        if self.writer:
+            self.writer.submit(pending, dirty_users, snapshot)
+            return
+        
         try:
-            # Convertir les deques en listes pour la sérialisation JSON
-            serializable_data = {
-                "conversations": {
-                    context_id: list(messages) 
-                    for context_id, messages in self.conversations.items()
-                },
-                "users_info": dict(self.users_info)
-            }
-            
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(serializable_data, f, ensure_ascii=False, indent=2)
-                
+            conversations, users_info = snapshot or (None, None)
+            self.store.save(conversations, users_info, pending, dirty_users)
             self.logger.debug(f"Mémoire sauvegardée dans {self.memory_file}")
         except Exception as e:
             self.logger.error(f"Erreur lors de la sauvegarde: {e}")
     
+    def flush(self, timeout: Optional[float] = None):
+        """Écrit tout ce qui n'est pas encore sur disque et attend la fin (arrêt du bot)"""
+        self.save_memory()
+        if self.writer:
+            if not self.writer.flush(timeout):
+                self.logger.warning("Sauvegarde de la mémoire non terminée dans le délai")
+    
+    def close(self):
+        """Vide les écritures en attente et ferme le stockage"""
+        self.flush()
+        if self.shared_facts is not None:
+            # Partagés avec les autres personas: écrits mais pas fermés
+            self.shared_facts.flush()
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        self.store.close()
+    
     def load_memory(self):
         """Charge la mémoire depuis le disque"""
-        if not os.path.exists(self.memory_file):
-            self.logger.info("Aucun fichier de mémoire trouvé, démarrage avec mémoire vide")
-            return
-        
         try:
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            conversations_data, users_info = self.store.load(self.max_messages)
+            if not conversations_data and not users_info:
+                self.logger.info("Aucune mémoire enregistrée, démarrage avec mémoire vide")
+                return
             
-            # Support ancien format (sans structure)
-            if "conversations" in data:
-                conversations_data = data["conversations"]
-                self.users_info = defaultdict(dict, data.get("users_info", {}))
-            else:
-                # Ancien format - tout est conversations
-                conversations_data = data
-                self.users_info = defaultdict(dict)
+            self.users_info = OrderedDict((username, self._ingest_user(username, info))
+                                          for username, info in users_info.items())
+            self._fields_done = {}
             
-            # Convertir les listes en deques
-            for context_id, messages in conversations_data.items():
+            # Convertir les listes en deques, du contexte le moins au plus récemment actif
+            by_activity = sorted(conversations_data.items(), key=lambda item: item[1][-1].ts if item[1] else 0.0)
+            for context_id, messages in by_activity:
                 self.conversations[context_id] = deque(messages, maxlen=self.max_messages)
+            self._rebuild_message_stats()
+            self._rebuild_expiry_heap()
+            self._enforce_context_limit()
+            self._enforce_user_limit()
             
             total_contexts = len(self.conversations)
             total_messages = sum(len(messages) for messages in self.conversations.values())
@@ -333,19 +853,77 @@ class ConversationMemory:
             
         except Exception as e:
             self.logger.error(f"Erreur lors du chargement de la mémoire: {e}")
-            self.conversations = defaultdict(lambda: deque(maxlen=self.max_messages))
+            self.conversations = OrderedDict()
+            self.user_styles = {}
+            self._message_bytes = 0
+            self._expiry_heap = []
+            self._in_expiry_heap = set()
+    
+    def export_state(self) -> Dict[str, any]:
+        """Mémoire vive complète, agrégats compris (redémarrage à chaud)"""
+        return {
+            "max_messages": self.max_messages,
+            "conversations": {context_id: [msg.to_row() for msg in messages]
+                              for context_id, messages in self.conversations.items()},
+            "users_info": {username: self._user_view(username, info) for username, info in self.users_info.items()},
+            "user_styles": {username: style.to_state() for username, style in self.user_styles.items()},
+            "message_bytes": self._message_bytes,
+            "spilled_contexts": sorted(self._spilled_contexts),
+            "spilled_users": sorted(self._spilled_users)
+        }
+    
+    def restore_state(self, state: Dict[str, any]):
+        """Reprend l'état exporté par export_state(), sans relire le stockage ni recalculer les styles"""
+        try:
+            self.conversations = OrderedDict(
+                (context_id, deque((MemoryMessage.from_data(row) for row in rows), maxlen=self.max_messages))
+                for context_id, rows in state["conversations"].items()
+            )
+            self.users_info = OrderedDict((username, self._ingest_user(username, info))
+                                          for username, info in state["users_info"].items())
+            self._fields_done = {}
+            self._spilled_contexts = set(state.get("spilled_contexts", ()))
+            self._spilled_users = set(state.get("spilled_users", ()))
+            
+            if state.get("max_messages") == self.max_messages:
+                self.user_styles = {username: _UserStyle.from_state(style)
+                                    for username, style in state["user_styles"].items()}
+                self._message_bytes = state["message_bytes"]
+            else:
+                # Taille des contextes changée depuis l'arrêt: les agrégats ne correspondent plus
+                self._rebuild_message_stats()
+            
+            self._rebuild_expiry_heap()
+            self._enforce_context_limit()
+            self._enforce_user_limit()
+            self.logger.info(f"Mémoire reprise: {len(self.conversations)} contextes, {len(self.users_info)} utilisateurs")
+        except (KeyError, TypeError, ValueError) as e:
+            self.logger.error(f"Instantané de mémoire invalide, relecture du stockage: {e}")
+            self.conversations = OrderedDict()
+            self.users_info = OrderedDict()
+            self.load_memory()
     
     def clear_memory(self):
         """Efface complètement la mémoire (nouvelle personnalité = nouveau départ)"""
         try:
-            # Supprimer le fichier de mémoire s'il existe
-            if os.path.exists(self.memory_file):
-                os.remove(self.memory_file)
-                self.logger.info(f"Fichier de mémoire {self.memory_file} supprimé")
+            # Abandonner les écritures en attente puis supprimer le stockage persistant
+            if self.writer:
+                self.writer.discard()
+            self.store.clear()
             
             # Réinitialiser les structures en mémoire
             self.conversations.clear()
             self.users_info.clear()
+            self.user_styles.clear()
+            self._fields_done.clear()
+            self._message_bytes = 0
+            self._spilled_contexts.clear()
+            self._spilled_users.clear()
+            self._expiry_heap = []
+            self._in_expiry_heap = set()
+            self._pending_messages = []
+            self._dirty_users = set()
+            self._unsaved_count = 0
             
         except Exception as e:
             self.logger.error(f"Erreur lors de l'effacement de la mémoire: {e}")
@@ -363,5 +941,12 @@ class ConversationMemory:
             "total_messages": total_messages,
             "channel_contexts": channel_contexts,
             "private_contexts": private_contexts,
-            "memory_file_size": os.path.getsize(self.memory_file) if os.path.exists(self.memory_file) else 0
+            "memory_file_size": self.store.size_bytes(),
+            "storage_backend": type(self.store).__name__,
+            "spilled_contexts": len(self._spilled_contexts),
+            "users": len(self.users_info),
+            "spilled_users": len(self._spilled_users),
+            "spills": self.spills,
+            "reloads": self.reloads,
+            "approx_memory_bytes": self._message_bytes + total_contexts * _CONTEXT_BYTES
         }
\ No newline at end of file
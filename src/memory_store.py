@@ -0,0 +1,663 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .clock import Clock, REAL_CLOCK
+
+
+class MemoryMessage:
+    """Message en mémoire: timestamp epoch, expéditeur internalisé, drapeau bot"""
+
+    __slots__ = ("ts", "sender", "message", "is_bot")
+
+    def __init__(self, ts: float, sender: str, message: str, is_bot: bool = False):
+        self.ts = ts
+        # Les mêmes pseudos reviennent sans cesse: une seule chaîne partagée par pseudo
+        self.sender = sys.intern(sender)
+        self.message = message
+        self.is_bot = is_bot
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.ts)
+
+    def to_row(self) -> List[Any]:
+        """Forme compacte pour la sérialisation JSON"""
+        return [self.ts, self.sender, self.message, self.is_bot]
+
+    @classmethod
+    def from_data(cls, data) -> 'MemoryMessage':
+        """Depuis une ligne compacte ou l'ancien format dict (timestamp ISO)"""
+        if isinstance(data, dict):
+            return cls(datetime.fromisoformat(data["timestamp"]).timestamp(), data["sender"],
+                       data["message"], bool(data.get("is_bot", False)))
+        ts, sender, message, is_bot = data
+        return cls(ts, sender, message, bool(is_bot))
+
+    def __repr__(self) -> str:
+        return f"MemoryMessage({self.ts!r}, {self.sender!r}, {self.message!r}, {self.is_bot!r})"
+
+
+# (contexte, message) en attente d'écriture
+PendingMessage = Tuple[str, MemoryMessage]
+
+
+class MemoryStore:
+    """Persistance de ConversationMemory"""
+
+    # True si le stockage reçoit les nouveaux messages un par un plutôt qu'un instantané complet
+    incremental = False
+
+    # True si un contexte ou un utilisateur évincé de la mémoire vive peut être relu seul
+    can_reload = False
+
+    def __init__(self, path: str):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+
+    def load(self, max_messages: int) -> Tuple[Dict[str, List[MemoryMessage]], Dict[str, Dict]]:
+        """Retourne (conversations, users_info)"""
+        raise NotImplementedError
+
+    def wants_snapshot(self) -> bool:
+        """True si la prochaine sauvegarde a besoin d'une copie complète de l'état"""
+        return not self.incremental
+
+    def save(self, conversations: Optional[Dict[str, Iterable[MemoryMessage]]], users_info: Optional[Dict[str, Dict]],
+             new_messages: List[PendingMessage], dirty_users: Dict[str, Dict]):
+        """Écrit l'état courant (instantané complet et/ou nouveaux éléments)"""
+        raise NotImplementedError
+
+    def load_context(self, context_id: str, max_messages: int) -> List[MemoryMessage]:
+        """Derniers messages enregistrés d'un contexte"""
+        return []
+
+    def load_user(self, username: str) -> Optional[Dict]:
+        """Infos enregistrées d'un utilisateur"""
+        return None
+
+    def iter_messages(self) -> Iterator[PendingMessage]:
+        """Tous les messages enregistrés, sans rien modifier (outils d'inspection; charge tout par défaut)"""
+        conversations, _ = self.load(sys.maxsize)
+        for context_id, messages in conversations.items():
+            for msg in messages:
+                yield context_id, msg
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict]]:
+        """Toutes les infos utilisateur enregistrées, sans rien modifier"""
+        _, users_info = self.load(1)
+        yield from users_info.items()
+
+    def prune(self, cutoff: datetime):
+        """Supprime du stockage les messages antérieurs à cutoff"""
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            self.logger.info(f"Fichier de mémoire {self.path} supprimé")
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def close(self):
+        pass
+
+
+class JsonMemoryStore(MemoryStore):
+    """Fichier JSON unique réécrit à chaque sauvegarde"""
+
+    def __init__(self, path: str = "bot_memory.json"):
+        super().__init__(path)
+
+    def load(self, max_messages: int) -> Tuple[Dict[str, List[MemoryMessage]], Dict[str, Dict]]:
+        if not os.path.exists(self.path):
+            return {}, {}
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        # Support ancien format (sans structure)
+        if "conversations" in data:
+            conversations, users_info = data["conversations"], data.get("users_info", {})
+        else:
+            conversations, users_info = data, {}
+        return {context_id: [MemoryMessage.from_data(msg) for msg in messages[-max_messages:]]
+                for context_id, messages in conversations.items()}, users_info
+
+    def save(self, conversations: Optional[Dict[str, Iterable[MemoryMessage]]], users_info: Optional[Dict[str, Dict]],
+             new_messages: List[PendingMessage], dirty_users: Dict[str, Dict]):
+        # Messages en lignes compactes [ts, sender, message, is_bot]
+        serializable_data = {
+            "version": 2,
+            "conversations": {
+                context_id: [msg.to_row() for msg in messages]
+                for context_id, messages in conversations.items()
+            },
+            "users_info": dict(users_info)
+        }
+
+        # Écriture atomique: un arrêt pendant l'écriture ne corrompt pas le fichier existant
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(serializable_data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+
+class SqliteMemoryStore(MemoryStore):
+    """Stockage SQLite (mode WAL): écritures incrémentales groupées, lectures ciblées"""
+
+    incremental = True
+    can_reload = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            context TEXT NOT NULL,
+            ts REAL NOT NULL,
+            sender TEXT NOT NULL,
+            message TEXT NOT NULL,
+            is_bot INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_context_ts ON messages (context, ts);
+        CREATE INDEX IF NOT EXISTS idx_messages_sender_ts ON messages (sender, ts);
+        CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts);
+        CREATE TABLE IF NOT EXISTS user_facts (
+            username TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (username, field)
+        );
+    """
+
+    def __init__(self, path: str = "bot_memory.db", read_only: bool = False, clock: Optional[Clock] = None):
+        super().__init__(path)
+        self.read_only = read_only
+        self.clock = clock or REAL_CLOCK
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reader_conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None and self.read_only:
+            # Inspection: ni création de schéma ni changement de mode, toute écriture échoue. Base fermée
+            # proprement (pas de -wal): immuable, pour ne pas laisser de fichiers -wal/-shm vides
+            immutable = "&immutable=1" if not os.path.exists(f"{self.path}-wal") else ""
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro{immutable}", uri=True, check_same_thread=False)
+        if self._conn is None:
+            # Les écritures peuvent venir d'un thread d'arrière-plan (un seul écrivain à la fois)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    @property
+    def reader(self) -> sqlite3.Connection:
+        """Connexion de lecture séparée (WAL: ne bloque pas le thread d'écriture)"""
+        if self.read_only:
+            return self.conn
+        if self._reader_conn is None:
+            self.conn  # crée la base et le schéma si besoin
+            self._reader_conn = sqlite3.connect(self.path, check_same_thread=False)
+        return self._reader_conn
+
+    @staticmethod
+    def _row_to_message(ts: float, sender: str, message: str, is_bot: int) -> MemoryMessage:
+        return MemoryMessage(ts, sender, message, bool(is_bot))
+
+    def load(self, max_messages: int) -> Tuple[Dict[str, List[MemoryMessage]], Dict[str, Dict]]:
+        if not os.path.exists(self.path):
+            return {}, {}
+
+        conversations: Dict[str, List[MemoryMessage]] = {}
+        rows = self.conn.execute("""
+            SELECT context, ts, sender, message, is_bot FROM (
+                SELECT context, ts, sender, message, is_bot, id,
+                       ROW_NUMBER() OVER (PARTITION BY context ORDER BY ts DESC, id DESC) AS recent_rank
+                FROM messages
+            ) WHERE recent_rank <= ? ORDER BY context, ts, id
+        """, (max_messages,))
+        for context_id, ts, sender, message, is_bot in rows:
+            conversations.setdefault(context_id, []).append(self._row_to_message(ts, sender, message, is_bot))
+
+        users_info: Dict[str, Dict] = {}
+        for username, field, value in self.conn.execute("SELECT username, field, value FROM user_facts"):
+            users_info.setdefault(username, {})[field] = json.loads(value)
+
+        return conversations, users_info
+
+    def save(self, conversations: Optional[Dict[str, Iterable[MemoryMessage]]], users_info: Optional[Dict[str, Dict]],
+             new_messages: List[PendingMessage], dirty_users: Dict[str, Dict]):
+        """Insère les nouveaux messages et faits utilisateur dans une seule transaction"""
+        if not new_messages and not dirty_users:
+            return
+
+        now = self.clock.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO messages (context, ts, sender, message, is_bot) VALUES (?, ?, ?, ?, ?)",
+                [(context_id, msg.ts, msg.sender, msg.message, int(msg.is_bot))
+                 for context_id, msg in new_messages]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO user_facts (username, field, value, updated_at) VALUES (?, ?, ?, ?)",
+                [(username, field, json.dumps(value, ensure_ascii=False), now)
+                 for username, info in dirty_users.items()
+                 for field, value in info.items()]
+            )
+
+    def prune(self, cutoff: datetime):
+        with self.conn:
+            self.conn.execute("DELETE FROM messages WHERE ts < ?", (cutoff.timestamp(),))
+
+    def query_messages(self, context_id: Optional[str] = None, sender: Optional[str] = None,
+                       since: Optional[datetime] = None, limit: int = 100) -> List[MemoryMessage]:
+        """Lecture ciblée (par contexte et/ou expéditeur), messages les plus récents en dernier"""
+        clauses, params = [], []
+        if context_id is not None:
+            clauses.append("context = ?")
+            params.append(context_id)
+        if sender is not None:
+            clauses.append("sender = ?")
+            params.append(sender)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since.timestamp())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.reader.execute(
+            f"SELECT ts, sender, message, is_bot FROM messages {where} ORDER BY ts DESC, id DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [self._row_to_message(*row) for row in reversed(rows)]
+
+    def load_context(self, context_id: str, max_messages: int) -> List[MemoryMessage]:
+        return self.query_messages(context_id=context_id, limit=max_messages)
+
+    def load_user(self, username: str) -> Optional[Dict]:
+        rows = self.reader.execute("SELECT field, value FROM user_facts WHERE username = ?", (username,)).fetchall()
+        return {field: json.loads(value) for field, value in rows} if rows else None
+
+    def iter_messages(self) -> Iterator[PendingMessage]:
+        """Parcours en flux de la table (curseur, mémoire constante)"""
+        if not os.path.exists(self.path):
+            return
+        for context_id, ts, sender, message, is_bot in self.reader.execute(
+                "SELECT context, ts, sender, message, is_bot FROM messages"):
+            yield context_id, self._row_to_message(ts, sender, message, is_bot)
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict]]:
+        if not os.path.exists(self.path):
+            return
+        username, info = None, {}
+        for row_username, field, value in self.reader.execute(
+                "SELECT username, field, value FROM user_facts ORDER BY username"):
+            if row_username != username:
+                if info:
+                    yield username, info
+                username, info = row_username, {}
+            info[field] = json.loads(value)
+        if info:
+            yield username, info
+
+    def clear(self):
+        self.close()
+        for path in (self.path, f"{self.path}-wal", f"{self.path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        self.logger.info(f"Base de mémoire {self.path} supprimée")
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.path, f"{self.path}-wal")
+                   if os.path.exists(path))
+
+    def close(self):
+        if self._reader_conn is not None:
+            self._reader_conn.close()
+            self._reader_conn = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class JournalMemoryStore(MemoryStore):
+    """Journal JSONL en ajout seul + instantané compacté en arrière-plan
+
+    Chaque sauvegarde ajoute les nouveaux événements (messages, faits utilisateur)
+    au segment courant du journal avec un seul fsync. Quand le journal dépasse
+    le seuil, un nouveau segment est ouvert et un thread écrit l'instantané de
+    l'état courant puis supprime les segments qu'il couvre. Le chargement lit
+    l'instantané puis rejoue les segments plus récents.
+    """
+
+    incremental = True
+
+    def __init__(self, path: str = "bot_memory.journal", compact_threshold: int = 8 * 1024 * 1024,
+                 fsync: bool = True):
+        super().__init__(path)
+        self.snapshot_path = f"{path}.snapshot"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self.generation = self._latest_generation()
+        self._compaction: Optional[threading.Thread] = None
+        self.compactions = 0
+
+    def _segment_path(self, generation: int) -> str:
+        return f"{self.path}.{generation}"
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        """Segments du journal présents sur disque, du plus ancien au plus récent"""
+        directory = os.path.dirname(self.path) or "."
+        pattern = re.compile(re.escape(os.path.basename(self.path)) + r"\.(\d+)$")
+        segments = []
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                match = pattern.match(name)
+                if match:
+                    segments.append((int(match.group(1)), os.path.join(directory, name)))
+        return sorted(segments)
+
+    def _latest_generation(self) -> int:
+        segments = self._segments()
+        return segments[-1][0] if segments else 0
+
+    def load(self, max_messages: int) -> Tuple[Dict[str, List[MemoryMessage]], Dict[str, Dict]]:
+        self.wait_for_compaction()
+        conversations: Dict[str, List] = {}
+        users_info: Dict[str, Dict] = {}
+        covered = -1
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            covered = snapshot.get("generation", -1)
+            conversations = snapshot.get("conversations", {})
+            users_info = snapshot.get("users_info", {})
+
+        # Rejouer la fin du journal (segments non couverts par l'instantané)
+        for generation, segment_path in self._segments():
+            if generation <= covered:
+                continue
+            with open(segment_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Dernière ligne tronquée par un arrêt brutal
+                        continue
+                    if event.get("type") == "message":
+                        messages = conversations.setdefault(event["context"], [])
+                        messages.append(event["data"])
+                        if len(messages) > 2 * max_messages:
+                            del messages[:-max_messages]
+                    elif event.get("type") == "user":
+                        users_info[event["username"]] = event["data"]
+
+        conversations = {context_id: [MemoryMessage.from_data(msg) for msg in messages[-max_messages:]]
+                         for context_id, messages in conversations.items()}
+        return conversations, users_info
+
+    def save(self, conversations: Optional[Dict[str, Iterable[MemoryMessage]]], users_info: Optional[Dict[str, Dict]],
+             new_messages: List[PendingMessage], dirty_users: Dict[str, Dict]):
+        """Ajoute les nouveaux événements au journal (un seul fsync par lot)"""
+        if not new_messages and not dirty_users:
+            return
+
+        lines = [json.dumps({"type": "message", "context": context_id, "data": msg.to_row()}, ensure_ascii=False)
+                 for context_id, msg in new_messages]
+        lines.extend(json.dumps({"type": "user", "username": username, "data": info}, ensure_ascii=False)
+                     for username, info in dirty_users.items())
+
+        segment_path = self._segment_path(self.generation)
+        with open(segment_path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+        if conversations is not None and os.path.getsize(segment_path) >= self.compact_threshold:
+            self.compact(conversations, users_info)
+
+    def _iter_events(self) -> Iterator[Dict]:
+        """Instantané puis segments non couverts, ligne par ligne"""
+        covered = -1
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            covered = snapshot.get("generation", -1)
+            for context_id, messages in snapshot.get("conversations", {}).items():
+                for msg in messages:
+                    yield {"type": "message", "context": context_id, "data": msg}
+            for username, info in snapshot.get("users_info", {}).items():
+                yield {"type": "user", "username": username, "data": info}
+            del snapshot
+
+        for generation, segment_path in self._segments():
+            if generation <= covered:
+                continue
+            with open(segment_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+    def iter_messages(self) -> Iterator[PendingMessage]:
+        """Parcours en flux (l'instantané compacté est borné par la mémoire vive du bot)"""
+        for event in self._iter_events():
+            if event.get("type") == "message":
+                yield event["context"], MemoryMessage.from_data(event["data"])
+
+    def iter_users(self) -> Iterator[Tuple[str, Dict]]:
+        users_info: Dict[str, Dict] = {}
+        for event in self._iter_events():
+            if event.get("type") == "user":
+                users_info[event["username"]] = event["data"]
+        yield from users_info.items()
+
+    def wants_snapshot(self) -> bool:
+        segment_path = self._segment_path(self.generation)
+        return os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.compact_threshold
+
+    def compact(self, conversations: Dict[str, Iterable[MemoryMessage]], users_info: Dict[str, Dict], wait: bool = False):
+        """Écrit l'instantané de l'état courant en arrière-plan et supprime le journal qu'il couvre"""
+        if self._compaction and self._compaction.is_alive():
+            return
+
+        # Copie figée de l'état: les messages ne sont jamais modifiés après leur ajout
+        snapshot = {
+            "generation": self.generation,
+            "conversations": {context_id: [msg.to_row() for msg in messages]
+                              for context_id, messages in conversations.items()},
+            "users_info": {username: {key: list(value) if isinstance(value, list) else value
+                                      for key, value in info.items()}
+                           for username, info in users_info.items()}
+        }
+
+        # Les prochains événements vont dans un nouveau segment
+        self.generation += 1
+
+        self._compaction = threading.Thread(target=self._write_snapshot, args=(snapshot,),
+                                            name="memory-compaction", daemon=True)
+        self._compaction.start()
+        if wait:
+            self.wait_for_compaction()
+
+    def _write_snapshot(self, snapshot: Dict):
+        try:
+            temp_path = f"{self.snapshot_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+
+            for generation, segment_path in self._segments():
+                if generation <= snapshot["generation"]:
+                    os.remove(segment_path)
+            self.compactions += 1
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la compaction du journal: {e}")
+
+    def wait_for_compaction(self):
+        if self._compaction:
+            self._compaction.join()
+            self._compaction = None
+
+    def clear(self):
+        self.wait_for_compaction()
+        paths = [segment_path for _, segment_path in self._segments()] + [self.snapshot_path]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.generation = 0
+        self.logger.info(f"Journal de mémoire {self.path} supprimé")
+
+    def size_bytes(self) -> int:
+        paths = [segment_path for _, segment_path in self._segments()] + [self.snapshot_path]
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def close(self):
+        self.wait_for_compaction()
+
+
+class BackgroundWriter:
+    """Écrit la mémoire depuis un thread, en regroupant les demandes sur un court délai
+
+    La boucle asyncio ne fait que déposer des copies figées (nouveaux messages,
+    faits modifiés, instantané éventuel); le thread les écrit après `delay`
+    secondes ou immédiatement sur flush().
+    """
+
+    def __init__(self, store: MemoryStore, delay: float = 2.0):
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+        self.delay = delay
+
+        self._condition = threading.Condition()
+        self._messages: List[PendingMessage] = []
+        self._users: Dict[str, Dict] = {}
+        self._snapshot: Optional[Tuple[Dict, Dict]] = None
+        self._prune_cutoff: Optional[datetime] = None
+        self._pending = False
+        self._busy = False
+        self._flush_requested = False
+        self._closed = False
+
+        self.writes = 0
+        self.errors = 0
+        self.last_write_ms = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, new_messages: List[PendingMessage], dirty_users: Dict[str, Dict],
+               snapshot: Optional[Tuple[Dict, Dict]] = None):
+        """Dépose une sauvegarde (fusionnée avec celles encore en attente)"""
+        with self._condition:
+            self._messages.extend(new_messages)
+            self._users.update(dirty_users)
+            if snapshot is not None:
+                self._snapshot = snapshot
+            self._pending = True
+            self._condition.notify_all()
+
+    def prune(self, cutoff: datetime):
+        """Dépose une suppression des messages antérieurs à cutoff (après les écritures en attente)"""
+        with self._condition:
+            self._prune_cutoff = cutoff
+            self._pending = True
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+                # Regrouper les demandes arrivant pendant le délai
+                deadline = time.monotonic() + self.delay
+                while not self._flush_requested and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                messages, self._messages = self._messages, []
+                users, self._users = self._users, {}
+                snapshot, self._snapshot = self._snapshot, None
+                prune_cutoff, self._prune_cutoff = self._prune_cutoff, None
+                self._pending = False
+                self._flush_requested = False
+                self._busy = True
+
+            started = time.perf_counter()
+            try:
+                if messages or users or snapshot:
+                    conversations, users_info = snapshot or (None, None)
+                    self.store.save(conversations, users_info, messages, users)
+                    self.writes += 1
+                if prune_cutoff is not None:
+                    self.store.prune(prune_cutoff)
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Erreur lors de la sauvegarde en arrière-plan: {e}")
+            finally:
+                self.last_write_ms = (time.perf_counter() - started) * 1000.0
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Écrit immédiatement ce qui est en attente et attend la fin de l'écriture"""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def discard(self):
+        """Abandonne les écritures en attente (attend celle en cours)"""
+        with self._condition:
+            self._messages, self._users, self._snapshot, self._prune_cutoff = [], {}, None, None
+            self._pending = False
+            self._condition.wait_for(lambda: not self._busy)
+
+    @property
+    def pending(self) -> bool:
+        return self._pending or self._busy
+
+    def close(self, timeout: Optional[float] = None):
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+
+def create_memory_store(config_data: Optional[Dict] = None, read_only: bool = False,
+                        clock: Optional[Clock] = None) -> MemoryStore:
+    """Crée le stockage depuis la section 'memory' de la config YAML"""
+    config_data = config_data or {}
+    backend = config_data.get('backend', 'json')
+
+    if backend == 'sqlite':
+        return SqliteMemoryStore(config_data.get('file', "bot_memory.db"), read_only=read_only, clock=clock)
+    if backend == 'journal':
+        return JournalMemoryStore(
+            config_data.get('file', "bot_memory.journal"),
+            compact_threshold=int(config_data.get('compact_threshold_mb', 8) * 1024 * 1024),
+            fsync=config_data.get('fsync', True)
+        )
+    if backend == 'json':
+        return JsonMemoryStore(config_data.get('file', "bot_memory.json"))
+    raise ValueError(f"Stockage mémoire inconnu: {backend}")
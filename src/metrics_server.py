@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from .latency import BUCKETS_MS, LatencyHistogram
+
+PREFIX = "irchumanizer"
+
+
+def process_rss_bytes() -> int:
+    """Mémoire résidente du processus (pic si /proc n'est pas disponible, 0 hors POSIX)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Windows: ni /proc ni resource
+        return 0
+    # ru_maxrss est en Ko sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _MetricsWriter:
+    """Construit une page au format texte Prometheus"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def metric(self, name: str, kind: str, help_text: str, samples: Dict[str, float], label: Optional[str] = None):
+        full_name = f"{PREFIX}_{name}"
+        self.lines.append(f"# HELP {full_name} {help_text}")
+        self.lines.append(f"# TYPE {full_name} {kind}")
+        for label_value, value in samples.items():
+            if label is None:
+                self.lines.append(f"{full_name} {float(value)}")
+            else:
+                self.lines.append(f'{full_name}{{{label}="{_escape(label_value)}"}} {float(value)}')
+
+    def value(self, name: str, kind: str, help_text: str, value: float):
+        self.metric(name, kind, help_text, {"": value})
+
+    def histograms(self, name: str, help_text: str, histograms: Dict[str, LatencyHistogram], label: str):
+        full_name = f"{PREFIX}_{name}"
+        self.lines.append(f"# HELP {full_name} {help_text}")
+        self.lines.append(f"# TYPE {full_name} histogram")
+        for label_value, histogram in sorted(histograms.items()):
+            escaped = _escape(label_value)
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS, histogram.counts):
+                cumulative += count
+                self.lines.append(f'{full_name}_bucket{{{label}="{escaped}",le="{bound / 1000.0}"}} {cumulative}')
+            self.lines.append(f'{full_name}_bucket{{{label}="{escaped}",le="+Inf"}} {histogram.count}')
+            self.lines.append(f'{full_name}_sum{{{label}="{escaped}"}} {histogram.total_ms / 1000.0}')
+            self.lines.append(f'{full_name}_count{{{label}="{escaped}"}} {histogram.count}')
+
+    def stats(self, name: str, help_text: str, stats: Dict):
+        """Exporte les valeurs numériques d'un dictionnaire get_stats() en jauges"""
+        for key, value in stats.items():
+            if isinstance(value, (bool, int, float)):
+                self.value(f"{name}_{key}", "gauge", f"{help_text} ({key})", value)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+class _ErrorCounter(logging.Handler):
+    """Compte les erreurs journalisées par composant (nom du logger), quelle que soit leur origine"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.counts: Dict[str, int] = {}
+
+    def emit(self, record: logging.LogRecord):
+        component = record.name.rsplit(".", 1)[-1]
+        self.counts[component] = self.counts.get(component, 0) + 1
+
+
+class MetricsServer:
+    """Point d'accès HTTP local: /metrics (texte Prometheus) et /health"""
+
+    def __init__(self, bot, host: str = "127.0.0.1", port: int = 9108, lag_interval: float = 1.0):
+        self.logger = logging.getLogger(__name__)
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.lag_interval = lag_interval
+
+        self.started_at = time.monotonic()
+        self.loop_lag = 0.0
+        self.max_loop_lag = 0.0
+        self.error_counter = _ErrorCounter()
+
+        self._runner: Optional[web.AppRunner] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.handle_metrics)
+        self.app.router.add_get("/health", self.handle_health)
+
+    @classmethod
+    def from_config(cls, bot, config_data: Optional[Dict] = None) -> 'MetricsServer':
+        """Crée le serveur depuis la section 'monitoring.http' de la config YAML"""
+        config_data = config_data or {}
+        return cls(
+            bot,
+            host=config_data.get('host', "127.0.0.1"),
+            port=config_data.get('port', 9108),
+            lag_interval=config_data.get('lag_interval', 1.0)
+        )
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logging.getLogger().addHandler(self.error_counter)
+        self._lag_task = asyncio.create_task(self._monitor_loop_lag())
+        self.logger.info(f"Métriques disponibles sur http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        logging.getLogger().removeHandler(self.error_counter)
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _monitor_loop_lag(self):
+        """Mesure le retard de la boucle asyncio (temps réel, indépendant de l'horloge du bot)"""
+        while True:
+            expected = time.monotonic() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.loop_lag = max(0.0, time.monotonic() - expected)
+            self.max_loop_lag = max(self.max_loop_lag, self.loop_lag)
+
+    def render_metrics(self) -> str:
+        bot = self.bot
+        generator = bot.human_generator
+        writer = _MetricsWriter()
+
+        writer.value("up", "gauge", "Connecté au serveur IRC", bot.connected)
+        writer.value("uptime_seconds", "gauge", "Durée depuis le démarrage", time.monotonic() - self.started_at)
+        writer.value("process_resident_memory_bytes", "gauge", "Mémoire résidente du processus", process_rss_bytes())
+        writer.value("event_loop_lag_seconds", "gauge", "Retard de la boucle asyncio", self.loop_lag)
+        writer.value("event_loop_lag_max_seconds", "gauge", "Retard maximum observé de la boucle asyncio", self.max_loop_lag)
+
+        writer.metric("inbound_lines_total", "counter", "Lignes IRC reçues par commande",
+                      bot.inbound_by_command, label="command")
+        writer.metric("replies_total", "counter", "Messages envoyés par branche de comportement",
+                      bot.replies_by_branch, label="branch")
+        writer.metric("ignored_total", "counter", "Messages reçus sans réponse par raison",
+                      bot.ignored_by_reason, label="reason")
+        writer.metric("errors_total", "counter", "Erreurs journalisées par composant",
+                      dict(self.error_counter.counts), label="component")
+
+        # Appels IA (passerelle)
+        gateway = generator.ai_gateway
+        if gateway:
+            writer.value("ai_requests_total", "counter", "Demandes de génération IA", gateway.requests)
+            writer.value("ai_completed_total", "counter", "Générations IA terminées", gateway.completed)
+            writer.value("ai_errors_total", "counter", "Erreurs d'appel IA", gateway.errors)
+            writer.value("ai_api_calls_total", "counter", "Appels réels à l'API IA", gateway.api_calls)
+            writer.value("ai_call_seconds_sum", "counter", "Durée cumulée des appels IA", gateway.total_latency)
+            writer.value("ai_queue_wait_seconds_sum", "counter", "Attente cumulée avant envoi IA", gateway.total_wait)
+
+        # Files d'attente
+        queues = {"context_summaries": generator.context_builder.queue_depth}
+        if gateway:
+            queues["ai_gateway"] = gateway.queue_depth
+        if generator.response_pool:
+            queues["response_pool"] = generator.response_pool.size()
+        writer.metric("queue_depth", "gauge", "Éléments en attente par file", queues, label="queue")
+
+        writer.stats("memory", "Mémoire conversationnelle", generator.memory.get_stats())
+        if generator.archive:
+            writer.stats("archive", "Archive long terme", generator.archive.get_stats())
+        if generator.memory.shared_facts:
+            writer.stats("shared_users", "Faits utilisateur partagés", generator.memory.shared_facts.get_stats())
+        # Instantané sans tirage aléatoire: une lecture ne doit pas changer les décisions du bot
+        writer.stats("activity", "Gestionnaire d'activité", bot.activity_manager.get_snapshot())
+
+        # Latences par étape et par branche (si la mesure est activée)
+        latency = generator.latency
+        if latency.enabled:
+            writer.histograms("stage_latency_seconds", "Latence par étape du pipeline", latency.stages, "stage")
+            writer.histograms("branch_latency_seconds", "Latence totale par branche", latency.branches, "branch")
+
+        return writer.render()
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render_metrics(), content_type="text/plain", charset="utf-8")
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        healthy = self.bot.connected
+        return web.json_response({
+            "status": "ok" if healthy else "disconnected",
+            "connected": self.bot.connected,
+            "nickname": self.bot.config.nickname,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "event_loop_lag_ms": round(self.loop_lag * 1000, 2),
+        }, status=200 if healthy else 503)
@@ -1,7 +1,7 @@
 import random
 import datetime
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 
 @dataclass
@@ -39,7 +39,21 @@ class PersonalityProfile:
 class PersonalityManager:
     """Gestionnaire de personnalité du bot"""
     
-    def __init__(self, custom_profile: Optional[PersonalityProfile] = None, config_data: Optional[Dict] = None):
+    MOODS = ["good", "normal", "bad", "tired", "excited"]
+    MOOD_CHANGE_PROBABILITY = 0.05  # 5% de chance par message
+    MOOD_MODIFIERS = {
+        "good": 1.2,     # Plus de réponses positives
+        "normal": 1.0,   # Comportement normal
+        "bad": 0.7,      # Moins de réponses, plus bref
+        "tired": 0.8,    # Réponses plus courtes
+        "excited": 1.3   # Plus de réponses, plus d'émojis
+    }
+    ACTION_PROBABILITY = 0.02       # 2% de chance d'action spontanée
+    
+    def __init__(self, custom_profile: Optional[PersonalityProfile] = None, config_data: Optional[Dict] = None,
+                 rng: Optional[random.Random] = None):
+        self.rng = rng or random.Random()
+        
         if custom_profile:
             self.profile = custom_profile
         elif config_data:
@@ -47,6 +61,12 @@ class PersonalityManager:
         else:
             self.profile = self._generate_random_profile()
         
+        # Fonctions appelées avec (ancienne humeur, nouvelle humeur) à chaque changement d'humeur
+        self.mood_listeners = []
+        
+        # Cache du contexte de personnalité: (signature du profil, texte)
+        self._context_cache: Optional[Tuple[tuple, str]] = None
+        
         # Styles d'écriture par niveau
         self.writing_patterns = {
             "sms": {
@@ -131,11 +151,11 @@ class PersonalityManager:
         # Extraction des valeurs de config avec fallbacks
         gender = config_data.get('gender', '').upper()
         if gender not in ['M', 'F']:
-            gender = random.choices(['M', 'F'], weights=[20, 80])[0]  # 80% féminin, 20% masculin
+            gender = self.rng.choices(['M', 'F'], weights=[20, 80])[0]  # 80% féminin, 20% masculin
         
         age = config_data.get('age', 0)
         if age <= 0:
-            age = random.randint(18, 45)
+            age = self.rng.randint(18, 45)
         
         # Gestion de la localisation
         config_city = config_data.get('city', '').strip()
@@ -144,7 +164,7 @@ class PersonalityManager:
         if config_city and config_region:
             location = {"city": config_city, "region": config_region, "country": "France"}
         else:
-            location = random.choice(french_locations)
+            location = self.rng.choice(french_locations)
         
         # Noms selon le genre
         if gender == "M":
@@ -154,29 +174,29 @@ class PersonalityManager:
         
         name = config_data.get('name', '').strip()
         if not name:
-            name = random.choice(names)
+            name = self.rng.choice(names)
         
         # Traits de personnalité
         humor_level = float(config_data.get('humor_level', 0))
         if humor_level <= 0:
-            humor_level = random.uniform(0.3, 0.9)
+            humor_level = self.rng.uniform(0.3, 0.9)
         
         casualness = float(config_data.get('casualness', 0))
         if casualness <= 0:
-            casualness = random.uniform(0.4, 1.0)
+            casualness = self.rng.uniform(0.4, 1.0)
         
         friendliness = float(config_data.get('friendliness', 0))
         if friendliness <= 0:
-            friendliness = random.uniform(0.5, 0.9)
+            friendliness = self.rng.uniform(0.5, 0.9)
         
         geek_level = float(config_data.get('geek_level', 0))
         if geek_level <= 0:
-            geek_level = random.uniform(0.2, 0.8)
+            geek_level = self.rng.uniform(0.2, 0.8)
         
         # Styles d'écriture
         writing_styles = config_data.get('writing_styles', [])
         if not writing_styles:
-            writing_styles = random.sample(["sms", "correct", "argot", "old_school"], k=random.randint(1, 3))
+            writing_styles = self.rng.sample(["sms", "correct", "argot", "old_school"], k=self.rng.randint(1, 3))
         
         # Intérêts
         interests = config_data.get('interests', [])
@@ -187,7 +207,7 @@ class PersonalityManager:
                 "guitare", "piano", "foot", "basket", "tennis", "natation", "randonnée",
                 "politique", "sciences", "histoire", "philo", "art", "mode", "déco"
             ]
-            interests = random.sample(interests_pool, k=random.randint(3, 8))
+            interests = self.rng.sample(interests_pool, k=self.rng.randint(3, 8))
         
         return PersonalityProfile(
             name=name,
@@ -245,7 +265,7 @@ class PersonalityManager:
             {"city": "Le Havre", "region": "76", "country": "France"}
         ]
         
-        gender = random.choices(["M", "F"], weights=[20, 80])[0]  # 80% féminin, 20% masculin
+        gender = self.rng.choices(["M", "F"], weights=[20, 80])[0]  # 80% féminin, 20% masculin
         
         # Noms selon le genre
         if gender == "M":
@@ -261,20 +281,20 @@ class PersonalityManager:
         ]
         
         return PersonalityProfile(
-            name=random.choice(names),
+            name=self.rng.choice(names),
             gender=gender,
-            age=random.randint(18, 45),
-            location=random.choice(french_locations),
+            age=self.rng.randint(18, 45),
+            location=self.rng.choice(french_locations),
             
-            humor_level=random.uniform(0.3, 0.9),
-            casualness=random.uniform(0.4, 1.0),
-            friendliness=random.uniform(0.5, 0.9),
-            geek_level=random.uniform(0.2, 0.8),
+            humor_level=self.rng.uniform(0.3, 0.9),
+            casualness=self.rng.uniform(0.4, 1.0),
+            friendliness=self.rng.uniform(0.5, 0.9),
+            geek_level=self.rng.uniform(0.2, 0.8),
             
-            writing_styles=random.sample(["sms", "correct", "argot", "old_school"], k=random.randint(1, 3)),
+            writing_styles=self.rng.sample(["sms", "correct", "argot", "old_school"], k=self.rng.randint(1, 3)),
             preferred_emojis=["😂", "😊", "🙄", "👍", "🤔", "😅", "🥰", "😎", "🔥", "💯"],
             
-            interests=random.sample(interests_pool, k=random.randint(3, 8)),
+            interests=self.rng.sample(interests_pool, k=self.rng.randint(3, 8)),
             dislikes=["spam", "drama", "politique extrême", "trolls"],
             
             expressions=[
@@ -289,8 +309,21 @@ class PersonalityManager:
             ]
         )
     
+    def get_profile_signature(self) -> tuple:
+        """Retourne une signature du profil (change si le profil change, pas avec l'humeur)"""
+        p = self.profile
+        return (
+            p.name, p.gender, p.age, p.location.get('city'), p.location.get('region'),
+            p.humor_level, p.casualness, p.friendliness, p.geek_level,
+            tuple(p.interests[:5]), tuple(p.dislikes), tuple(p.writing_styles)
+        )
+    
     def get_personality_context(self) -> str:
-        """Génère le contexte de personnalité pour l'IA"""
+        """Génère le contexte de personnalité pour l'IA (mis en cache tant que le profil ne change pas)"""
+        signature = self.get_profile_signature()
+        if self._context_cache and self._context_cache[0] == signature:
+            return self._context_cache[1]
+        
         p = self.profile
         
         gender_text = {
@@ -312,29 +345,43 @@ Tu n'aimes pas: {', '.join(p.dislikes)}
 
 Style d'écriture préféré: {', '.join(p.writing_styles)}
 """
+        self._context_cache = (signature, context)
         return context
     
-    def adapt_response_style(self, text: str) -> str:
+    def get_mood_context(self) -> str:
+        """Humeur du moment, hors du contexte mis en cache (elle change en cours de journée)"""
+        mood_text = {
+            "good": "de bonne humeur",
+            "normal": "d'humeur normale",
+            "bad": "de mauvaise humeur",
+            "tired": "fatigué(e)",
+            "excited": "surexcité(e)"
+        }.get(self.profile.current_mood, "d'humeur normale")
+        return f"En ce moment tu es {mood_text}."
+    
+    def adapt_response_style(self, text: str, rng: Optional[random.Random] = None) -> str:
         """Adapte le texte selon le style de personnalité"""
+        rng = rng or self.rng
         result = text
         
         # Appliquer les styles dans l'ordre de préférence
         for style in self.profile.writing_styles:
-            if random.random() < 0.4:  # 40% de chance d'appliquer le style
-                result = self._apply_writing_style(result, style)
+            if rng.random() < 0.4:  # 40% de chance d'appliquer le style
+                result = self._apply_writing_style(result, style, rng)
         
         # Ajouter parfois un emoji selon la personnalité (réduit pour naturel)
-        if random.random() < (self.profile.humor_level * 0.1):
-            emoji = random.choice(self.profile.preferred_emojis)
-            if random.random() < 0.5:
+        if rng.random() < (self.profile.humor_level * 0.1):
+            emoji = rng.choice(self.profile.preferred_emojis)
+            if rng.random() < 0.5:
                 result = f"{result} {emoji}"
             else:
                 result = f"{emoji} {result}"
         
         return result
     
-    def _apply_writing_style(self, text: str, style: str) -> str:
+    def _apply_writing_style(self, text: str, style: str, rng: Optional[random.Random] = None) -> str:
         """Applique un style d'écriture spécifique"""
+        rng = rng or self.rng
         if style not in self.writing_patterns:
             return text
         
@@ -345,21 +392,21 @@ Style d'écriture préféré: {', '.join(p.writing_styles)}
         if "replacements" in pattern:
             for original, alternatives in pattern["replacements"].items():
                 if original in result:
-                    if random.random() < 0.6:  # 60% de chance de remplacer
-                        replacement = random.choice(alternatives)
+                    if rng.random() < 0.6:  # 60% de chance de remplacer
+                        replacement = rng.choice(alternatives)
                         result = result.replace(original, replacement)
         
         # Ajouter des expressions du style
-        if "expressions" in pattern and random.random() < 0.2:
-            expression = random.choice(pattern["expressions"])
-            if random.random() < 0.5:
+        if "expressions" in pattern and rng.random() < 0.2:
+            expression = rng.choice(pattern["expressions"])
+            if rng.random() < 0.5:
                 result = f"{expression} {result}"
             else:
                 result = f"{result} {expression}"
         
         # Ajouter des raccourcis SMS
-        if style == "sms" and "shortcuts" in pattern and random.random() < 0.3:
-            shortcut = random.choice(pattern["shortcuts"])
+        if style == "sms" and "shortcuts" in pattern and rng.random() < 0.3:
+            shortcut = rng.choice(pattern["shortcuts"])
             result = f"{result} {shortcut}"
         
         return result
@@ -392,7 +439,7 @@ Style d'écriture préféré: {', '.join(p.writing_styles)}
                     f"yo {p.location['city']} ici",
                     f"présent, {p.location['city']} ftw"
                 ]
-                return random.choice(responses)
+                return self.rng.choice(responses)
         
         return None
     
@@ -410,27 +457,23 @@ Style d'écriture préféré: {', '.join(p.writing_styles)}
     
     def update_mood(self):
         """Met à jour l'humeur du bot de façon aléatoire"""
-        # Changement d'humeur aléatoire (5% de chance)
-        if random.random() < 0.05:
-            moods = ["good", "normal", "bad", "tired", "excited"]
-            self.profile.current_mood = random.choice(moods)
-            self.profile.mood_intensity = random.uniform(0.3, 1.0)
+        # Changement d'humeur aléatoire
+        if self.rng.random() < self.MOOD_CHANGE_PROBABILITY:
+            previous_mood = self.profile.current_mood
+            self.profile.current_mood = self.rng.choice(self.MOODS)
+            self.profile.mood_intensity = self.rng.uniform(0.3, 1.0)
+            
+            for listener in self.mood_listeners:
+                listener(previous_mood, self.profile.current_mood)
     
     def get_mood_modifier(self) -> float:
         """Retourne un modificateur basé sur l'humeur actuelle"""
-        mood_modifiers = {
-            "good": 1.2,     # Plus de réponses positives
-            "normal": 1.0,   # Comportement normal
-            "bad": 0.7,      # Moins de réponses, plus bref
-            "tired": 0.8,    # Réponses plus courtes
-            "excited": 1.3   # Plus de réponses, plus d'émojis
-        }
-        base_modifier = mood_modifiers.get(self.profile.current_mood, 1.0)
+        base_modifier = self.MOOD_MODIFIERS.get(self.profile.current_mood, 1.0)
         return base_modifier * self.profile.mood_intensity
     
     def get_irc_action(self) -> Optional[str]:
         """Génère une action IRC aléatoire (/me) selon l'humeur"""
-        if random.random() > 0.98:  # 2% de chance d'action spontanée
+        if self.rng.random() > 1 - self.ACTION_PROBABILITY:
             actions_by_mood = {
                 "good": [
                     "sourit",
@@ -470,39 +513,41 @@ Style d'écriture préféré: {', '.join(p.writing_styles)}
             }
             
             mood_actions = actions_by_mood.get(self.profile.current_mood, actions_by_mood["normal"])
-            return random.choice(mood_actions)
+            return self.rng.choice(mood_actions)
         
         return None
     
-    def adapt_response_with_mood(self, text: str) -> str:
-        """Adapte une réponse selon l'humeur actuelle"""
-        mood_modifier = self.get_mood_modifier()
+    def adapt_response_with_mood(self, text: str, mood: Optional[str] = None,
+                                 rng: Optional[random.Random] = None) -> str:
+        """Adapte une réponse selon l'humeur actuelle (ou l'humeur donnée)"""
+        rng = rng or self.rng
+        mood = mood or self.profile.current_mood
         result = text
         
         # Appliquer les effets de l'humeur
-        if self.profile.current_mood == "bad":
+        if mood == "bad":
             # Plus bref, moins d'émojis
-            if len(result) > 20 and random.random() < 0.3:
+            if len(result) > 20 and rng.random() < 0.3:
                 words = result.split()
                 result = " ".join(words[:len(words)//2]) if len(words) > 3 else result
         
-        elif self.profile.current_mood == "excited":
+        elif mood == "excited":
             # Plus d'émojis et de ponctuation (réduit)
-            if random.random() < 0.2:
+            if rng.random() < 0.2:
                 excited_emojis = ["!", "!!", " 🔥", " 💯", " 😎", " ✨"]
-                result += random.choice(excited_emojis)
+                result += rng.choice(excited_emojis)
         
-        elif self.profile.current_mood == "tired":
+        elif mood == "tired":
             # Plus de points de suspension, moins énergique
-            if random.random() < 0.3:
+            if rng.random() < 0.3:
                 result = result.replace("!", ".").replace("?", "...")
                 if not result.endswith("..."):
                     result += "..."
         
-        elif self.profile.current_mood == "good":
+        elif mood == "good":
             # Plus positif, émojis positifs
-            if random.random() < 0.3:
+            if rng.random() < 0.3:
                 good_emojis = [" 😊", " 🙂", " 👍", " ✌️"]
-                result += random.choice(good_emojis)
+                result += rng.choice(good_emojis)
         
         return result
\ No newline at end of file
@@ -0,0 +1,131 @@
+import logging
+import random
+from collections import defaultdict, deque
+from typing import Callable, Dict, Optional
+
+MOODS = ["good", "normal", "bad", "tired", "excited"]
+
+
+class ResponsePool:
+    """Réserve de réponses prédéfinies déjà stylisées, remplie pendant les temps morts
+
+    Une réserve par humeur et par source (casual, question, réaction...).
+    Le chemin chaud prend une variante prête; si la réserve est vide, la réponse
+    est stylisée normalement et la source est remplie plus tard. Seules les
+    réponses indépendantes de l'interlocuteur sont préparées: les salutations
+    contiennent son pseudo, stylisé avec le reste, et ne passent pas par ici.
+
+    Le remplissage tire dans son propre flux aléatoire: il tourne à des moments
+    qui dépendent du minutage et ne doit pas décaler les flux des décisions.
+    """
+
+    def __init__(self, generator, pool_size: int = 4, reaction_pool_size: int = 1,
+                 idle_seconds: float = 2.0, interval: float = 1.0, items_per_tick: int = 8,
+                 rng: Optional[random.Random] = None):
+        self.logger = logging.getLogger(__name__)
+        self.generator = generator
+        self.personality = generator.personality
+        self.rng = rng or random.Random()
+        self.pool_size = pool_size
+        self.reaction_pool_size = reaction_pool_size
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.items_per_tick = items_per_tick
+
+        # {humeur: {clé: deque de variantes}}
+        self.pools: Dict[str, Dict[str, deque]] = {mood: defaultdict(deque) for mood in MOODS}
+
+        # {clé: fonction retournant le texte de base à styliser}
+        self.sources: Dict[str, Callable[[], str]] = {
+            "casual": lambda: self.rng.choice(generator.casual_responses),
+            "question": lambda: self.rng.choice(generator.question_responses),
+        }
+
+        # Signature du profil (hors humeur) pour tout invalider si la personnalité change
+        self._profile_signature = self._signature()
+
+        self.hits = 0
+        self.misses = 0
+
+        self.personality.mood_listeners.append(self._on_mood_change)
+
+    def _signature(self) -> tuple:
+        return self.personality.get_profile_signature()
+
+    def _on_mood_change(self, previous_mood: str, new_mood: str):
+        """Humeur quittée: sa réserve est périmée, celle de la nouvelle humeur reste valable
+
+        Le style ne dépend que du nom de l'humeur (pas de l'intensité): les
+        variantes déjà prêtes pour la nouvelle humeur sont servies tout de suite.
+        """
+        if previous_mood != new_mood:
+            self.invalidate(previous_mood)
+
+    def invalidate(self, mood: Optional[str] = None):
+        """Vide la réserve d'une humeur (ou toutes)"""
+        if mood is None:
+            for pools in self.pools.values():
+                pools.clear()
+        elif mood in self.pools:
+            self.pools[mood].clear()
+
+    def _target_size(self, key: str) -> int:
+        return self.reaction_pool_size if key.startswith("reaction:") else self.pool_size
+
+    def take(self, key: str, recent_context: str = "") -> Optional[str]:
+        """Retourne une variante prête pour l'humeur courante, ou None"""
+        if self._profile_signature != self._signature():
+            self._profile_signature = self._signature()
+            self.invalidate()
+
+        # Les variantes sont préparées hors contexte tendu: ne pas les utiliser dans ce cas
+        if recent_context and self.generator._is_tense(recent_context):
+            return None
+
+        if key.startswith("reaction:") and key not in self.sources:
+            base = key[len("reaction:"):]
+            self.sources[key] = lambda: base
+
+        pool = self.pools[self.personality.profile.current_mood].get(key)
+        if pool:
+            self.hits += 1
+            return pool.popleft()
+
+        self.misses += 1
+        return None
+
+    def refill(self, max_items: int) -> int:
+        """Prépare jusqu'à max_items variantes, humeur courante en priorité"""
+        current_mood = self.personality.profile.current_mood
+        moods = [current_mood] + [mood for mood in MOODS if mood != current_mood]
+        produced = 0
+
+        for mood in moods:
+            pools = self.pools[mood]
+            for key, source in list(self.sources.items()):
+                pool = pools[key]
+                while len(pool) < self._target_size(key):
+                    if produced >= max_items:
+                        return produced
+                    pool.append(self.generator._style_canned(source(), mood=mood, rng=self.rng))
+                    produced += 1
+
+        return produced
+
+    def size(self) -> int:
+        return sum(len(pool) for pools in self.pools.values() for pool in pools.values())
+
+    async def run(self):
+        """Tâche de fond: remplit les réserves quand le bot est inactif"""
+        clock = self.generator.clock
+        while True:
+            try:
+                idle_for = clock.monotonic() - self.generator.last_activity
+                if idle_for >= self.idle_seconds:
+                    self.refill(self.items_per_tick)
+            except Exception as e:
+                self.logger.error(f"Erreur lors du remplissage des réponses préparées: {e}")
+            await clock.sleep(self.interval)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"size": self.size(), "hits": self.hits, "misses": self.misses}
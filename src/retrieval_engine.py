@@ -0,0 +1,417 @@
+import json
+import math
+import mmap
+import os
+import random
+import re
+import struct
+import logging
+from bisect import bisect_left
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+# Format du fichier d'index (à côté du corpus, extension .idx):
+#   en-tête | offsets des lignes (uint64) | longueurs des messages (uint16) | postings (uint32)
+#   | vocabulaire trié: fins des tokens (uint32) | début des postings (uint32) | nb postings (uint32) | tokens UTF-8
+INDEX_MAGIC = b"IRHRIDX2"
+# magic, taille corpus, mtime corpus, nb paires, nb postings, offset vocabulaire, nb tokens
+INDEX_HEADER = struct.Struct("<8sQqQQQQ")
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Mots trop fréquents pour discriminer une réponse
+STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "de", "du", "et", "a", "à", "en",
+    "je", "tu", "il", "on", "ce", "ca", "ça", "est", "que", "qui", "pas", "ne",
+    "me", "te", "se", "y", "au", "aux", "pour", "sur", "dans", "avec", "mais",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un message en tokens normalisés"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class RetrievalEngine:
+    """Moteur de réponses par recherche dans un corpus d'échanges IRC réels (message → réponse)"""
+
+    def __init__(self, corpus_file: Optional[str] = None, history_file: Optional[str] = None,
+                 min_score: float = 0.35, max_candidates: int = 5, max_learned_pairs: int = 5000,
+                 max_postings: int = 64, scan_budget: int = 4096, history_flush_every: int = 50,
+                 rng: Optional[random.Random] = None):
+        self.logger = logging.getLogger(__name__)
+        self.rng = rng or random.Random()
+        self.corpus_file = corpus_file
+        self.history_file = history_file
+        self.min_score = min_score
+        self.max_candidates = max_candidates
+        # Postings parcourus en entier par recherche (mots rares d'abord); au-delà, un mot n'apporte
+        # que ses max_postings paires les plus récentes comme candidates, mais note toutes les autres
+        self.max_postings = max_postings
+        self.scan_budget = scan_budget
+        self.history_flush_every = history_flush_every
+
+        # Index disque (memory-mappé, vocabulaire compris: rien n'est chargé en RAM)
+        self._corpus_mm: Optional[mmap.mmap] = None
+        self._index_mm: Optional[mmap.mmap] = None
+        self._offsets = None
+        self._doc_lengths = None
+        self._postings = None
+        self._token_ends = None
+        self._token_starts = None
+        self._token_counts = None
+        self._tokens = None
+        self.vocabulary_size = 0
+        self.disk_pairs = 0
+
+        # Échanges appris pas encore écrits dans l'historique
+        self._pending_history: List[str] = []
+
+        # Paires apprises de l'historique du bot (index en mémoire, borné)
+        self.max_learned_pairs = max_learned_pairs
+        self._learned_pairs: deque = deque()
+        self._learned_index: Dict[str, List[int]] = defaultdict(list)
+        self._learned_base = 0  # Identifiant de la plus ancienne paire apprise encore présente
+
+        if corpus_file and os.path.exists(corpus_file):
+            self._open_index()
+        elif corpus_file:
+            self.logger.warning(f"Corpus de réponses introuvable: {corpus_file}")
+
+        if history_file and os.path.exists(history_file):
+            self._load_history()
+
+    @classmethod
+    def from_config(cls, config_data: Dict, rng: Optional[random.Random] = None) -> 'RetrievalEngine':
+        """Crée le moteur depuis la section 'retrieval' de la config YAML"""
+        return cls(
+            corpus_file=config_data.get('corpus_file'),
+            history_file=config_data.get('history_file') if config_data.get('learn_from_history', True) else None,
+            min_score=config_data.get('min_score', 0.35),
+            max_candidates=config_data.get('max_candidates', 5),
+            max_learned_pairs=config_data.get('max_learned_pairs', 5000),
+            max_postings=config_data.get('max_postings', 64),
+            scan_budget=config_data.get('scan_budget', 4096),
+            rng=rng
+        )
+
+    @property
+    def total_pairs(self) -> int:
+        return self.disk_pairs + len(self._learned_pairs)
+
+    # --- Index disque ---
+
+    def _index_path(self) -> str:
+        return f"{self.corpus_file}.idx"
+
+    def _open_index(self):
+        """Ouvre l'index memory-mappé du corpus, en le reconstruisant s'il est absent ou périmé"""
+        corpus_stat = os.stat(self.corpus_file)
+        if corpus_stat.st_size == 0:
+            return
+
+        index_path = self._index_path()
+        if not self._index_is_fresh(index_path, corpus_stat):
+            self.build_index(self.corpus_file, index_path)
+
+        with open(self.corpus_file, 'rb') as f:
+            self._corpus_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(index_path, 'rb') as f:
+            self._index_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        _, _, _, pair_count, postings_count, vocab_offset, vocab_count = INDEX_HEADER.unpack_from(self._index_mm, 0)
+        view = memoryview(self._index_mm)
+
+        position = INDEX_HEADER.size
+        self._offsets = view[position:position + pair_count * 8].cast('Q')
+        position += pair_count * 8
+        self._doc_lengths = view[position:position + pair_count * 2].cast('H')
+        position += pair_count * 2
+        position += (-position) % 4
+        self._postings = view[position:position + postings_count * 4].cast('I')
+
+        position = vocab_offset
+        self._token_ends = view[position:position + vocab_count * 4].cast('I')
+        position += vocab_count * 4
+        self._token_starts = view[position:position + vocab_count * 4].cast('I')
+        position += vocab_count * 4
+        self._token_counts = view[position:position + vocab_count * 4].cast('I')
+        position += vocab_count * 4
+        self._tokens = view[position:]
+
+        self.vocabulary_size = vocab_count
+        self.disk_pairs = pair_count
+        self.logger.info(f"Corpus de réponses chargé: {pair_count} paires, {vocab_count} tokens")
+
+    def _index_is_fresh(self, index_path: str, corpus_stat: os.stat_result) -> bool:
+        """Vérifie que l'index correspond encore au corpus"""
+        if not os.path.exists(index_path):
+            return False
+        try:
+            with open(index_path, 'rb') as f:
+                header = f.read(INDEX_HEADER.size)
+            magic, corpus_size, corpus_mtime, _, _, _, _ = INDEX_HEADER.unpack(header)
+        except (OSError, struct.error):
+            return False
+        return magic == INDEX_MAGIC and corpus_size == corpus_stat.st_size and corpus_mtime == corpus_stat.st_mtime_ns
+
+    @staticmethod
+    def build_index(corpus_file: str, index_path: Optional[str] = None):
+        """Construit l'index inversé d'un corpus JSONL ({"message": ..., "reply": ...} par ligne)"""
+        logger = logging.getLogger(__name__)
+        index_path = index_path or f"{corpus_file}.idx"
+        corpus_stat = os.stat(corpus_file)
+
+        offsets = []
+        doc_lengths = []
+        token_postings: Dict[str, List[int]] = defaultdict(list)
+
+        with open(corpus_file, 'rb') as f:
+            offset = 0
+            for line in f:
+                line_offset = offset
+                offset += len(line)
+                try:
+                    pair = json.loads(line)
+                    tokens = set(tokenize(pair["message"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if not tokens or not pair.get("reply"):
+                    continue
+
+                pair_id = len(offsets)
+                offsets.append(line_offset)
+                doc_lengths.append(min(len(tokens), 0xFFFF))
+                for token in tokens:
+                    token_postings[token].append(pair_id)
+
+        # Vocabulaire trié par octets UTF-8 (recherche dichotomique directement dans le fichier)
+        vocabulary = sorted((token.encode('utf-8'), postings) for token, postings in token_postings.items())
+        token_ends, token_starts, token_counts = [], [], []
+        token_end = 0
+        postings_count = 0
+        for token, postings in vocabulary:
+            token_end += len(token)
+            token_ends.append(token_end)
+            token_starts.append(postings_count)
+            token_counts.append(len(postings))
+            postings_count += len(postings)
+
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(b"\0" * INDEX_HEADER.size)
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+            f.write(struct.pack(f"<{len(doc_lengths)}H", *doc_lengths))
+            f.write(b"\0" * ((-f.tell()) % 4))
+            for _, postings in vocabulary:
+                f.write(struct.pack(f"<{len(postings)}I", *postings))
+            vocab_offset = f.tell()
+            for table in (token_ends, token_starts, token_counts):
+                f.write(struct.pack(f"<{len(table)}I", *table))
+            f.write(b"".join(token for token, _ in vocabulary))
+            f.seek(0)
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, corpus_stat.st_size, corpus_stat.st_mtime_ns,
+                                      len(offsets), postings_count, vocab_offset, len(vocabulary)))
+        os.replace(tmp_path, index_path)
+
+        logger.info(f"Index du corpus construit: {len(offsets)} paires, {len(vocabulary)} tokens")
+
+    def _lookup_token(self, token: str) -> Optional[Tuple[int, int]]:
+        """(début, nombre) des postings d'un token, par recherche dichotomique dans le vocabulaire mappé"""
+        if not self.vocabulary_size:
+            return None
+        wanted = token.encode('utf-8')
+        ends, tokens = self._token_ends, self._tokens
+        low, high = 0, self.vocabulary_size
+        while low < high:
+            middle = (low + high) // 2
+            start = ends[middle - 1] if middle else 0
+            current = bytes(tokens[start:ends[middle]])
+            if current < wanted:
+                low = middle + 1
+            elif current > wanted:
+                high = middle
+            else:
+                return self._token_starts[middle], self._token_counts[middle]
+        return None
+
+    def _read_disk_pair(self, pair_id: int) -> Optional[Dict]:
+        """Lit une paire du corpus directement depuis le fichier memory-mappé"""
+        start = self._offsets[pair_id]
+        end = self._corpus_mm.find(b"\n", start)
+        if end == -1:
+            end = len(self._corpus_mm)
+        try:
+            return json.loads(self._corpus_mm[start:end])
+        except ValueError:
+            return None
+
+    # --- Paires apprises ---
+
+    def _load_history(self):
+        """Recharge les dernières paires apprises de l'historique du bot"""
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                recent_lines = deque(f, maxlen=self.max_learned_pairs)
+            for line in recent_lines:
+                pair = json.loads(line)
+                self._index_learned_pair(pair["message"], pair["reply"])
+            self.logger.info(f"{len(self._learned_pairs)} paires apprises rechargées")
+        except Exception as e:
+            self.logger.error(f"Erreur lors du chargement de l'historique de réponses: {e}")
+
+    def _index_learned_pair(self, message: str, reply: str):
+        tokens = set(tokenize(message))
+        if not tokens:
+            return
+
+        pair_id = self._learned_base + len(self._learned_pairs)
+        self._learned_pairs.append((message, reply, len(tokens)))
+        for token in tokens:
+            self._learned_index[token].append(pair_id)
+
+        # Borner la mémoire: on oublie la moitié la plus ancienne d'un coup
+        if len(self._learned_pairs) > self.max_learned_pairs:
+            self._drop_oldest_learned(len(self._learned_pairs) // 2)
+
+    def _drop_oldest_learned(self, count: int):
+        for _ in range(count):
+            self._learned_pairs.popleft()
+        self._learned_base += count
+        for token in list(self._learned_index.keys()):
+            postings = [pid for pid in self._learned_index[token] if pid >= self._learned_base]
+            if postings:
+                self._learned_index[token] = postings
+            else:
+                del self._learned_index[token]
+
+    def add_pair(self, message: str, reply: str):
+        """Apprend un échange réel (message → réponse) observé dans un salon"""
+        if not message or not reply or message == reply:
+            return
+
+        self._index_learned_pair(message, reply)
+
+        if self.history_file:
+            # Écriture groupée: un seul ajout au fichier tous les history_flush_every échanges
+            self._pending_history.append(json.dumps({"message": message, "reply": reply}, ensure_ascii=False))
+            if len(self._pending_history) >= self.history_flush_every:
+                self.flush_history()
+
+    def flush_history(self):
+        """Écrit les échanges appris en attente dans l'historique (aussi à l'arrêt)"""
+        pending, self._pending_history = self._pending_history, []
+        if not pending or not self.history_file:
+            return
+        try:
+            with open(self.history_file, 'a', encoding='utf-8') as f:
+                f.write("\n".join(pending) + "\n")
+        except OSError as e:
+            self.logger.error(f"Erreur lors de l'écriture de l'historique de réponses: {e}")
+
+    # --- Recherche ---
+
+    def find_reply(self, message: str) -> Optional[str]:
+        """Retourne la meilleure réponse connue pour un message, ou None si rien de pertinent"""
+        query_tokens = set(tokenize(message))
+        if not query_tokens or self.total_pairs == 0:
+            return None
+
+        total = self.total_pairs
+
+        # Postings de chaque token de la requête: (df, idf, postings disque, postings appris)
+        terms = []
+        query_weight = 0.0
+        for token in query_tokens:
+            disk_entry = self._lookup_token(token)
+            disk_postings = self._postings[disk_entry[0]:disk_entry[0] + disk_entry[1]] if disk_entry else ()
+            learned_postings = self._learned_index.get(token, ())
+            df = len(disk_postings) + len(learned_postings)
+
+            idf = math.log(1 + total / (1 + df))
+            query_weight += idf
+            if df:
+                terms.append((df, idf, disk_postings, learned_postings))
+
+        # Accumulation des scores: {("d"|"l", id): [poids idf des tokens communs, nb tokens communs]}
+        scores: Dict[Tuple[str, int], List[float]] = {}
+
+        # Mots les plus rares d'abord, parcourus en entier tant que le budget le permet
+        budget = self.scan_budget
+        capped = []
+        for df, idf, disk_postings, learned_postings in sorted(terms, key=lambda term: term[0]):
+            if df > self.max_postings and df > budget:
+                capped.append((idf, disk_postings, learned_postings))
+                continue
+            budget -= df
+            for source, postings in (("d", disk_postings), ("l", learned_postings)):
+                for pair_id in postings:
+                    entry = scores.setdefault((source, pair_id), [0.0, 0])
+                    entry[0] += idf
+                    entry[1] += 1
+
+        # Mots trop fréquents: leurs paires les plus récentes deviennent candidates, puis chaque
+        # candidate est comparée à leurs listes complètes (triées, recherche dichotomique)
+        for _, disk_postings, learned_postings in capped:
+            learned_tail = learned_postings[-self.max_postings:]
+            disk_tail = disk_postings[max(0, len(disk_postings) - self.max_postings + len(learned_tail)):]
+            for source, postings in (("d", disk_tail), ("l", learned_tail)):
+                for pair_id in postings:
+                    scores.setdefault((source, pair_id), [0.0, 0])
+        for idf, disk_postings, learned_postings in capped:
+            for (source, pair_id), entry in scores.items():
+                if self._contains(disk_postings if source == "d" else learned_postings, pair_id):
+                    entry[0] += idf
+                    entry[1] += 1
+
+        if not scores or query_weight == 0:
+            return None
+
+        ranked = []
+        for key, (matched_weight, matched_count) in scores.items():
+            doc_length = self._doc_length(key)
+            score = (matched_weight / query_weight) * math.sqrt(matched_count / max(doc_length, 1))
+            if score >= self.min_score:
+                ranked.append((score, key))
+
+        if not ranked:
+            return None
+
+        # Varier parmi les meilleurs candidats pour ne pas toujours répéter la même chose
+        ranked.sort(reverse=True)
+        best_score = ranked[0][0]
+        candidates = [key for score, key in ranked[:self.max_candidates] if score >= best_score * 0.9]
+        self.rng.shuffle(candidates)
+
+        for key in candidates:
+            reply = self._get_reply(key)
+            if reply and reply.strip().lower() != message.strip().lower():
+                return reply
+
+        return None
+
+    @staticmethod
+    def _contains(postings, pair_id: int) -> bool:
+        position = bisect_left(postings, pair_id)
+        return position < len(postings) and postings[position] == pair_id
+
+    def _doc_length(self, key: Tuple[str, int]) -> int:
+        source, pair_id = key
+        if source == "d":
+            return self._doc_lengths[pair_id]
+        return self._learned_pairs[pair_id - self._learned_base][2]
+
+    def _get_reply(self, key: Tuple[str, int]) -> Optional[str]:
+        source, pair_id = key
+        if source == "d":
+            pair = self._read_disk_pair(pair_id)
+            return pair.get("reply") if pair else None
+        return self._learned_pairs[pair_id - self._learned_base][1]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Retourne des statistiques sur le corpus indexé"""
+        return {
+            "disk_pairs": self.disk_pairs,
+            "learned_pairs": len(self._learned_pairs),
+            "vocabulary_size": self.vocabulary_size,
+        }
@@ -0,0 +1,13 @@
+import random
+from typing import Optional
+
+
+def make_rng(seed: Optional[int], *components: str) -> random.Random:
+    """Crée un générateur aléatoire propre à un composant (reproductible si une graine est fixée)
+
+    Chaque persona et chaque sous-système reçoit son propre flux: avec la même
+    graine et les mêmes entrées, les décisions sont identiques d'un lancement à l'autre.
+    """
+    if seed is None:
+        return random.Random()
+    return random.Random(":".join((str(seed),) + components))
@@ -0,0 +1,50 @@
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+STATE_VERSION = 1
+
+
+class RuntimeStateFile:
+    """Instantané de l'état d'une persona (profil, humeur, pseudo, activité, mémoire vive) pour un redémarrage à chaud
+
+    La mémoire vive y est aussi (export_state: conversations, utilisateurs et
+    agrégats de style) pour repartir sans relire le stockage ni recalculer les
+    styles; le stockage de la mémoire, écrit à l'arrêt, reste la référence si
+    cette partie manque.
+    """
+
+    def __init__(self, path: str = "bot_state.json"):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        """État enregistré au dernier arrêt (None si absent, illisible ou d'une autre version)"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"État de redémarrage illisible ({self.path}): {e}")
+            return None
+        if state.get("version") != STATE_VERSION:
+            self.logger.warning(f"État de redémarrage ignoré: version {state.get('version')}")
+            return None
+        return state
+
+    def save(self, state: Dict):
+        """Écrit l'état (écriture atomique, comme la mémoire)"""
+        state = dict(state, version=STATE_VERSION)
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.logger.error(f"Erreur lors de l'enregistrement de l'état ({self.path}): {e}")
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
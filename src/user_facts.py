@@ -0,0 +1,252 @@
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .clock import Clock, REAL_CLOCK
+
+# Infos trouvées dans un message: {"first_name": ..., "age": ..., "location": ..., "interests": [...]}
+Facts = Dict[str, Any]
+
+
+class SharedUserFacts:
+    """Faits utilisateur partagés par les personas d'un même réseau (objet du processus)
+
+    Plusieurs personas sur un même salon voient la même ligne: l'extraction
+    n'est faite que par la première, les suivantes reprennent le résultat mis
+    en cache par (expéditeur, message). Les valeurs ne sont gardées qu'ici:
+    chaque persona retient seulement quels champs on lui a dits et les lit ici.
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self.logger = logging.getLogger(__name__)
+        self.cache_size = cache_size
+
+        # Résultats d'extraction récents: {(expéditeur, message): faits trouvés}
+        self._extracted: Dict[Tuple[str, str], Facts] = OrderedDict()
+
+        # Faits connus sur le réseau: {username: {champ: valeur}}
+        self.facts: Dict[str, Facts] = {}
+        self._lock = threading.Lock()
+
+        self.extractions = 0
+        self.cache_hits = 0
+
+    def extract(self, username: str, message: str, find: Callable[[str], Facts]) -> Facts:
+        """Faits présents dans la ligne (résultat partagé, à ne pas modifier)"""
+        key = (username, message)
+        found = self._extracted.get(key)
+        if found is not None:
+            self._extracted.move_to_end(key)
+            self.cache_hits += 1
+            return found
+
+        found = find(message)
+        self.extractions += 1
+        if found:
+            self._record(username, found)
+
+        self._extracted[key] = found
+        if len(self._extracted) > self.cache_size:
+            self._extracted.popitem(last=False)
+        return found
+
+    def _record(self, username: str, found: Facts):
+        with self._lock:
+            self._merge(self.facts.setdefault(username, {}), found)
+
+    def seed(self, username: str, known: Facts):
+        """Reprend les faits enregistrés par une persona (au chargement de sa mémoire)"""
+        self._record(username, known)
+
+    @staticmethod
+    def _merge(facts: Facts, found: Facts):
+        """Ajoute les faits trouvés: la première valeur d'un champ reste, les intérêts s'accumulent"""
+        for field, value in found.items():
+            if field == "interests":
+                interests = facts.setdefault("interests", [])
+                interests.extend(interest for interest in value if interest not in interests)
+            else:
+                facts.setdefault(field, value)
+
+    def get(self, username: str) -> Facts:
+        """Faits connus sur un utilisateur, toutes personas confondues (copie)"""
+        with self._lock:
+            facts = self.facts.get(username)
+            if not facts:
+                return {}
+            return {field: list(value) if isinstance(value, list) else value for field, value in facts.items()}
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self.facts),
+            "extractions": self.extractions,
+            "cache_hits": self.cache_hits,
+            "cached_lines": len(self._extracted),
+        }
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteUserFacts(SharedUserFacts):
+    """Faits utilisateur partagés entre processus via un fichier SQLite (mode WAL)
+
+    La boucle asyncio ne touche jamais au fichier: les faits sont lus dans la
+    copie du processus, un thread écrit les champs modifiés et relit ceux des
+    autres processus (numéro seq croissant) toutes les refresh_interval
+    secondes. Chaque processus analyse lui-même les lignes qu'il reçoit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS facts (
+            username TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (username, field)
+        );
+        CREATE INDEX IF NOT EXISTS idx_facts_seq ON facts (seq);
+    """
+
+    def __init__(self, path: str = "shared_users.db", cache_size: int = 4096, refresh_interval: float = 2.0,
+                 clock: Optional[Clock] = None):
+        super().__init__(cache_size)
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.clock = clock or REAL_CLOCK
+
+        # Champs modifiés pas encore écrits: {username: {champ}}
+        self._dirty: Dict[str, set] = {}
+        self._wakeup = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()
+        self._closed = False
+        self._last_seq = 0
+        self.writes = 0
+        self.errors = 0
+
+        # Chargement complet au démarrage (avant la boucle de messages), le thread ne relit ensuite que les nouveautés
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._refresh()
+
+        self._thread = threading.Thread(target=self._run, name="shared-user-facts", daemon=True)
+        self._thread.start()
+
+    def _record(self, username: str, found: Facts):
+        with self._wakeup:
+            self._merge(self.facts.setdefault(username, {}), found)
+            self._dirty.setdefault(username, set()).update(found)
+            self._wakeup.notify()
+
+    def _run(self):
+        """Thread de synchronisation: écrit les champs modifiés puis relit ceux des autres processus"""
+        while True:
+            with self._wakeup:
+                if not self._closed and not self._dirty:
+                    self._wakeup.wait(self.refresh_interval)
+                closed = self._closed
+            self._sync()
+            if closed:
+                return
+
+    def _sync(self):
+        with self._io_lock:
+            try:
+                self._write_dirty()
+                self._refresh()
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.logger.error(f"Erreur lors de la synchronisation des faits partagés: {e}")
+
+    def _write_dirty(self):
+        with self._wakeup:
+            dirty, self._dirty = self._dirty, {}
+            rows = [(username, field, list(value) if isinstance(value, list) else value)
+                    for username, fields in dirty.items() for field in fields
+                    for value in (self.facts.get(username, {}).get(field),) if value is not None]
+        if not rows:
+            return
+        now = self.clock.time()
+        with self.conn:
+            # Verrou d'écriture dès la lecture du dernier numéro: deux processus ne prennent pas le même
+            self.conn.execute("BEGIN IMMEDIATE")
+            seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM facts").fetchone()[0]
+            for username, field, value in rows:
+                row = self.conn.execute("SELECT value FROM facts WHERE username = ? AND field = ?",
+                                        (username, field)).fetchone()
+                if row is not None:
+                    # Même règle qu'en mémoire: la valeur d'un autre processus reste, les intérêts s'accumulent
+                    stored = {field: json.loads(row[0])}
+                    self._merge(stored, {field: value})
+                    if stored[field] == json.loads(row[0]):
+                        continue
+                    value = stored[field]
+                seq += 1
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO facts (username, field, value, updated_at, seq) VALUES (?, ?, ?, ?, ?)",
+                    (username, field, json.dumps(value, ensure_ascii=False), now, seq)
+                )
+                self.writes += 1
+
+    def _refresh(self):
+        """Relit les faits écrits depuis le dernier passage (y compris les siens, déjà connus)"""
+        rows = self.conn.execute("SELECT username, field, value, seq FROM facts WHERE seq > ? ORDER BY seq",
+                                 (self._last_seq,)).fetchall()
+        if not rows:
+            return
+        with self._wakeup:
+            for username, field, value, _ in rows:
+                self._merge(self.facts.setdefault(username, {}), {field: json.loads(value)})
+            self._last_seq = rows[-1][3]
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = super().get_stats()
+        stats["writes"] = self.writes
+        stats["errors"] = self.errors
+        return stats
+
+    def flush(self):
+        """Écrit tout de suite les faits en attente (entrées/sorties: hors de la boucle asyncio)"""
+        self._sync()
+
+    def close(self):
+        """Écrit les derniers faits et arrête le thread"""
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        self.conn.close()
+
+
+# Une instance par réseau (ou par fichier) dans le processus, partagée par toutes les personas
+_SHARED: Dict[Tuple[str, str], SharedUserFacts] = {}
+
+
+def create_shared_user_facts(config_data: Optional[Dict] = None, network: str = "",
+                             clock: Optional[Clock] = None) -> SharedUserFacts:
+    """Faits partagés depuis la section 'memory.shared_users' de la config YAML"""
+    config_data = config_data or {}
+    backend = config_data.get('backend', 'process')
+    cache_size = config_data.get('cache_size', 4096)
+
+    if backend == 'sqlite':
+        key = (backend, config_data.get('file', "shared_users.db"))
+        if key not in _SHARED:
+            _SHARED[key] = SqliteUserFacts(key[1], cache_size=cache_size,
+                                           refresh_interval=config_data.get('refresh_interval', 2.0), clock=clock)
+        return _SHARED[key]
+    if backend == 'process':
+        key = (backend, network)
+        if key not in _SHARED:
+            _SHARED[key] = SharedUserFacts(cache_size=cache_size)
+        return _SHARED[key]
+    raise ValueError(f"Partage des faits utilisateur inconnu: {backend}")